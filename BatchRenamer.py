@@ -1,539 +1,1348 @@
-import os
-import tkinter as tk
-import ttkbootstrap as ttk
-from tkinter import filedialog, messagebox
-from datetime import datetime
-
-
-class BatchFileRenamer:
-    """
-       A GUI application for batch renaming files in a selected folder using various methods.
-
-       Attributes:
-           master (tk.Tk): The main window of the application.
-           folder_label (ttk.Label): Label displaying the selected folder path.
-           select_folder_button (ttk.Button): Button to open the folder selection dialog.
-           list_frame (ttk.Frame): Frame containing the Treeview for displaying files.
-           file_treeview (ttk.Treeview): Treeview for displaying the list of files in the selected folder.
-           sort_column (str): Column name by which the file list is currently sorted.
-           scrollbar (ttk.Scrollbar): Scrollbar for the Treeview.
-           select_all_button (ttk.Button): Button to select all files in the Treeview.
-           deselect_all_button (ttk.Button): Button to deselect all files in the Treeview.
-           replace_section_label (ttk.Label): Label for the replace section.
-           replace_label (ttk.Label): Label for the replace field.
-           replace_entry (ttk.Entry): Entry for the text to be replaced.
-           new_label (ttk.Label): Label for the new text field.
-           new_entry (ttk.Entry): Entry for the new text.
-           rename_button (ttk.Button): Button to apply the replace rename operation.
-           case_rename_button (ttk.Button): Button to apply the case conversion rename operation.
-           titlecase_radio (ttk.Radiobutton): Radiobutton to select title case conversion.
-           uppercase_radio (ttk.Radiobutton): Radiobutton to select upper case conversion.
-           lowercase_radio (ttk.Radiobutton): Radiobutton to select lower case conversion.
-           case_label (ttk.Label): Label for the case conversion section.
-           case_conversion_var (tk.StringVar): Variable to store the selected case conversion option.
-           none_radio (ttk.Radiobutton): Radiobutton to select no case conversion.
-           prefix_suffix_label (ttk.Label): Label for the prefix/suffix section.
-           suffix_label (ttk.Label): Label for the suffix field.
-           prefix_entry (ttk.Entry): Entry for the prefix text.
-           suffix_entry (ttk.Entry): Entry for the suffix text.
-           prefix_label (ttk.Label): Label for the prefix field.
-           prefix_suffix_button (ttk.Button): Button to apply the prefix/suffix rename operation.
-           sort_ascending (bool): Boolean indicating if the file list is sorted in ascending order.
-           selected_files (list): List of selected files for renaming.
-       """
-
-    def __init__(self, master):
-        """
-        Initialize the BatchFileRenamer class.
-
-        Args:
-            master (tk.Tk): The root window or parent frame.
-        """
-        self.master = master
-        self.master.title("Bulk File Renamer")
-        self.folder_label = None
-        self.select_folder_button = None
-        self.list_frame = None
-        self.file_treeview = None
-        self.sort_column = None
-        self.scrollbar = None
-        self.select_all_button = None
-        self.deselect_all_button = None
-        self.replace_section_label = None
-        self.replace_label = None
-        self.replace_entry = None
-        self.new_label = None
-        self.new_entry = None
-        self.rename_button = None
-        self.case_rename_button = None
-        self.titlecase_radio = None
-        self.uppercase_radio = None
-        self.lowercase_radio = None
-        self.case_label = None
-        self.case_conversion_var = None
-        self.none_radio = None
-        self.prefix_suffix_label = None
-        self.suffix_label = None
-        self.prefix_entry = None
-        self.suffix_entry = None
-        self.prefix_label = None
-        self.prefix_suffix_button = None
-        self.sort_ascending = None
-        self.selected_files = []
-
-        self.app_interface()
-
-    def app_interface(self):
-        """
-        Set up the user interface for the application.
-
-        This includes creating buttons, labels, entries, and the file list Treeview.
-        """
-        # Folder Selection
-        self.select_folder_button = ttk.Button(self.master, text="Open Folder", command=self.select_folder,
-                                               bootstyle="success")
-        self.select_folder_button.grid(row=0, column=1, columnspan=2, padx=10, pady=10, sticky="ew")
-
-        self.folder_label = ttk.Label(self.master, text="Selected Folder: ")
-        self.folder_label.grid(row=1, column=0, columnspan=5, padx=10, pady=10, sticky="w")
-
-        # File List
-        self.list_frame = ttk.Frame(self.master)
-        self.list_frame.grid(row=2, column=0, columnspan=5, padx=10, pady=10, sticky="nsew")
-
-        self.file_treeview = ttk.Treeview(self.list_frame, columns=("Name", "Preview", "Date Modified"),
-                                          show="headings")
-        self.file_treeview.heading("Name", text="Name", command=lambda: self.on_column_click("Name"))
-        self.file_treeview.heading("Preview", text="Preview")
-        self.file_treeview.heading("Date Modified", text="Date Modified",
-                                   command=lambda: self.on_column_click("Date Modified"))
-        self.file_treeview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        self.scrollbar = ttk.Scrollbar(self.list_frame, orient=tk.VERTICAL, command=self.file_treeview.yview,
-                                       bootstyle="round")
-        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.file_treeview.configure(yscrollcommand=self.scrollbar.set)
-
-        # Mouse select
-        self.file_treeview.bind("<Control-Button-1>", self.on_mouse_press)
-        self.file_treeview.bind("<ButtonPress-1>", self.on_mouse_press)
-        self.file_treeview.bind("<B1-Motion>", self.on_mouse_drag)
-        self.file_treeview.bind("<<TreeviewSelect>>", self.update_preview_on_selection_change)
-
-        # Select all / Deselect all
-        self.select_all_button = ttk.Button(self.master, text="Select All", command=self.select_all,
-                                            bootstyle="secondary")
-        self.select_all_button.grid(row=3, column=0, columnspan=2, padx=(15, 10), pady=10, sticky="ew")
-
-        self.deselect_all_button = ttk.Button(self.master, text="Deselect All", command=self.deselect_all,
-                                              bootstyle="secondary")
-        self.deselect_all_button.grid(row=3, column=2, columnspan=3, padx=(10, 15), pady=10, sticky="ew")
-
-        ttk.Separator(self.master, orient='horizontal').grid(row=4, column=0, columnspan=5, padx=10, pady=10,
-                                                             sticky="ew")
-        # Replace Section
-        self.replace_section_label = ttk.Label(self.master, text="Replace character(s)")
-        self.replace_section_label.grid(row=5, column=0, padx=10, sticky="w")
-        self.replace_label = ttk.Label(self.master, text="Replace:")
-        self.replace_label.grid(row=6, column=0, padx=10, sticky="w")
-        self.replace_entry = ttk.Entry(self.master)
-        self.replace_entry.grid(row=6, column=1, columnspan=2, pady=5, sticky="ew")
-        self.replace_entry.bind("<FocusIn>", self.save_file_selection)
-        self.replace_entry.bind("<FocusOut>", self.restore_file_selection)
-        self.replace_entry.bind("<KeyRelease>", self.update_preview)
-
-        self.new_label = ttk.Label(self.master, text="With:")
-        self.new_label.grid(row=7, column=0, padx=10, sticky="w")
-        self.new_entry = ttk.Entry(self.master)
-        self.new_entry.grid(row=7, column=1, columnspan=2, pady=5, sticky="ew")
-        self.new_entry.bind("<FocusIn>", self.save_file_selection)
-        self.new_entry.bind("<FocusOut>", self.restore_file_selection)
-        self.new_entry.bind("<KeyRelease>", self.update_preview)
-
-        self.rename_button = ttk.Button(self.master, text="Replace character(s)", command=self.rename_files,
-                                        bootstyle="primary")
-        self.rename_button.grid(row=6, column=3, rowspan=2, padx=5)
-
-        ttk.Separator(self.master, orient='horizontal').grid(row=8, column=0, columnspan=5, padx=10, pady=10,
-                                                             sticky="ew")
-
-        # Case Conversion Section
-        self.case_label = ttk.Label(self.master, text="Case Conversion:")
-        self.case_label.grid(row=10, column=0, rowspan=2, padx=10, sticky="w")
-        self.case_conversion_var = tk.StringVar(value="none")
-        self.none_radio = ttk.Radiobutton(self.master, text="None", variable=self.case_conversion_var,
-                                          value="none", command=self.update_preview)
-        self.none_radio.grid(row=10, column=1, pady=5, sticky="w")
-        self.lowercase_radio = ttk.Radiobutton(self.master, text="Lowercase", variable=self.case_conversion_var,
-                                               value="lowercase", command=self.update_preview)
-        self.lowercase_radio.grid(row=10, column=2, pady=5, sticky="w")
-        self.uppercase_radio = ttk.Radiobutton(self.master, text="Uppercase", variable=self.case_conversion_var,
-                                               value="uppercase", command=self.update_preview)
-        self.uppercase_radio.grid(row=11, column=1, pady=5, sticky="w")
-        self.titlecase_radio = ttk.Radiobutton(self.master, text="Titlecase", variable=self.case_conversion_var,
-                                               value="titlecase", command=self.update_preview)
-        self.titlecase_radio.grid(row=11, column=2, pady=5, sticky="w")
-        self.case_rename_button = ttk.Button(self.master, text="Change Case", command=self.rename_case)
-        self.case_rename_button.grid(row=10, rowspan=2, column=3, sticky="w")
-
-        # Prefix/Suffix Section
-        ttk.Separator(self.master, orient='horizontal').grid(row=12, column=0, columnspan=5, padx=10, pady=10,
-                                                             sticky="ew")
-        self.prefix_suffix_label = ttk.Label(self.master, text="Add Prefix/Suffix:")
-        self.prefix_suffix_label.grid(row=13, column=0, padx=10, sticky="w")
-
-        self.prefix_label = ttk.Label(self.master, text="Prefix:")
-        self.prefix_label.grid(row=14, column=0, padx=10, pady=5, sticky="w")
-        self.prefix_entry = ttk.Entry(self.master)
-        self.prefix_entry.grid(row=14, column=1, pady=5, sticky="ew")
-        self.prefix_entry.bind("<KeyRelease>", self.update_preview)
-
-        self.suffix_label = ttk.Label(self.master, text="Suffix:")
-        self.suffix_label.grid(row=15, column=0, padx=10, pady=5, sticky="w")
-        self.suffix_entry = ttk.Entry(self.master)
-        self.suffix_entry.grid(row=15, column=1, pady=5, sticky="ew")
-        self.suffix_entry.bind("<KeyRelease>", self.update_preview)
-
-        self.prefix_suffix_button = ttk.Button(self.master, text="Rename Prefix/Suffix",
-                                               command=self.rename_prefix_suffix)
-        self.prefix_suffix_button.grid(row=14, column=2, rowspan=2, pady=5)
-
-        self.sort_column = None
-        self.sort_ascending = True
-
-    def select_folder(self):
-        """
-        Open a dialog to select a folder and list its files in the Treeview.
-        """
-        folder_path = filedialog.askdirectory()
-        if folder_path:
-            self.folder_label.config(text="Selected Folder: " + folder_path)
-            self.load_file_list(folder_path)
-
-    def load_file_list(self, folder_path):
-        """
-       List all files in the selected folder in the Treeview.
-
-       Args:
-           folder_path (str): The path to the selected folder.
-       """
-        self.file_treeview.delete(*self.file_treeview.get_children())
-        files = os.listdir(folder_path)
-        for file_name in files:
-            file_path = os.path.join(folder_path, file_name)
-            if os.path.isfile(file_path):
-                last_modified = os.path.getmtime(file_path)
-                last_modified_date = datetime.fromtimestamp(last_modified).strftime('%Y-%m-%d %H:%M:%S')
-                self.file_treeview.insert("", tk.END, values=(file_name, "", last_modified_date))
-
-    def get_file_info(self, item):
-        """
-        Fetch file information from Treeview item.
-
-        Args:
-            item: The Treeview item.
-
-        Returns:
-            original_file_name (str): The original file name.
-            original_file_path (str): The full file path.
-            name_part (str): The name part of the file.
-            extension_part (str): The extension part of the file.
-        """
-        file_info = self.file_treeview.item(item, 'values')
-        original_file_name = file_info[0]
-        original_file_path = os.path.join(self.folder_label.cget("text").replace("Selected Folder: ", ""),
-                                          original_file_name)
-        name_part, extension_part = os.path.splitext(original_file_name)
-
-        return original_file_name, original_file_path, name_part, extension_part
-
-    def sort_column(self, column, reverse):
-        data = [(self.file_treeview.set(item, column), item) for item in self.file_treeview.get_children()]
-        data.sort(reverse=reverse)
-
-        for index, (value, item) in enumerate(data):
-            self.file_treeview.move(item, "", index)
-
-    def on_column_click(self, column):
-        """
-        Handle the column header click for sorting the files.
-
-        Args:
-            column (str): The column name by which to sort.
-        """
-        if self.sort_column == column:
-            self.sort_ascending = not self.sort_ascending
-        else:
-            self.sort_column = column
-            self.sort_ascending = True
-
-        items = [(self.file_treeview.set(k, column), k) for k in self.file_treeview.get_children('')]
-
-        if column == "Name":
-            items.sort(key=lambda t: t[0].lower(), reverse=not self.sort_ascending)
-        elif column == "Date Modified":
-            items.sort(key=lambda t: datetime.strptime(t[0], '%Y-%m-%d %H:%M:%S'), reverse=not self.sort_ascending)
-
-        for index, (val, k) in enumerate(items):
-            self.file_treeview.move(k, '', index)
-
-        self.file_treeview.heading(column, text=column + (" ↑" if self.sort_ascending else " ↓"))
-
-    def select_all(self):
-        """
-        Select all files in the Treeview.
-        """
-        self.file_treeview.selection_set(self.file_treeview.get_children())
-
-    def deselect_all(self):
-        """
-        Deselect all files in the Treeview.
-        """
-        self.file_treeview.selection_remove(self.file_treeview.get_children())
-
-    def save_file_selection(self, event):
-        self.selected_files = self.file_treeview.selection()
-
-    def restore_file_selection(self, event):
-        for item in self.selected_files:
-            if self.file_treeview.exists(item):
-                self.file_treeview.selection_add(item)
-
-    def on_mouse_press(self, event):
-        """
-        Handle mouse press events to select or deselect files.
-
-        Args:
-            event (tk.Event): The mouse press event.
-        """
-        ctrl_pressed = (event.state & 0x4) != 0
-        shift_pressed = (event.state & 0x1) != 0
-
-        item = self.file_treeview.identify_row(event.y)
-        if item:
-            if ctrl_pressed:
-                if item in self.file_treeview.selection():
-                    self.file_treeview.selection_remove(item)
-                else:
-                    self.file_treeview.selection_add(item)
-            elif shift_pressed:
-                selection = self.file_treeview.selection()
-                if selection:
-                    last_selected = selection[-1]
-                    start_idx = self.file_treeview.index(last_selected)
-                    end_idx = self.file_treeview.index(item)
-                    if start_idx < end_idx:
-                        items_to_select = self.file_treeview.get_children()[start_idx:end_idx + 1]
-                    else:
-                        items_to_select = self.file_treeview.get_children()[end_idx:start_idx + 1]
-                    self.file_treeview.selection_set(items_to_select)
-                else:
-                    self.file_treeview.selection_set(item)
-            else:
-                self.file_treeview.selection_set(item)
-        else:
-            self.file_treeview.selection_remove(self.file_treeview.selection())
-        self.master.config(cursor="")
-
-    def on_mouse_drag(self, event):
-        item = self.file_treeview.identify_row(event.y)
-        if item:
-            self.file_treeview.selection_set(self.file_treeview.selection() + (item,))
-
-    @staticmethod
-    def check_invalid_characters(text):
-        invalid_characters = ["<", ">", ":", "\"", "/", "\\", "|", "?", "*"]
-        for character in invalid_characters:
-            if character in text:
-                return character
-
-    def rename_files(self):
-        """
-        Perform the renaming of the selected files based on the user's input.
-        """
-        replace_text = self.replace_entry.get()
-        new_text = self.new_entry.get()
-        folder_path = self.folder_label.cget("text").replace("Selected Folder: ", "")
-
-        if not self.file_treeview.selection():
-            messagebox.showwarning("Nothing selected!", "Please select at least one file.")
-            return
-
-        invalid_char = self.check_invalid_characters(new_text)
-        if invalid_char:
-            messagebox.showwarning("Invalid character", f"You can't use '{invalid_char}' in the file name")
-            return
-
-        matched_files = []
-        existing_files = set(os.listdir(folder_path))
-
-        for item in self.file_treeview.selection():
-            original_file_name = self.file_treeview.item(item, "values")[0]
-            name_part, extension_part = os.path.splitext(original_file_name)
-
-            if replace_text in name_part:
-                matched_files.append(original_file_name)
-
-        if not matched_files:
-            if len(self.file_treeview.selection()) == 1:
-                messagebox.showwarning("Not found", "No file name matches your input.")
-            else:
-                messagebox.showwarning("Not found", "No file names match your input. Nothing was renamed.")
-            return
-
-        renamed_count = 0
-        for original_file_name in matched_files:
-            name_part, extension_part = os.path.splitext(original_file_name)
-            new_file_name = name_part.replace(replace_text, new_text) + extension_part
-
-            if new_file_name in existing_files:
-                messagebox.showwarning("Name already exists",
-                                       f"A file named '{new_file_name}' already exists. Nothing was renamed.")
-                return
-
-            original_file_path = os.path.join(folder_path, original_file_name)
-            new_file_path = os.path.join(folder_path, new_file_name)
-            os.rename(original_file_path, new_file_path)
-            renamed_count += 1
-
-            existing_files.remove(original_file_name)
-            existing_files.add(new_file_name)
-
-        self.load_file_list(folder_path)
-        messagebox.showinfo("Success",
-                            f"{renamed_count} file{'s' if renamed_count > 1 else ''} ha{'ve' if renamed_count > 1 else 's'} been renamed successfully.")
-
-    def rename_case(self):
-        """
-        Apply the selected case conversion to the selected files' names.
-        """
-        case_conversion = self.case_conversion_var.get()
-        if not case_conversion:
-            messagebox.showwarning("Input Error", "Please select a case conversion option.")
-            return
-
-        selected_items = self.file_treeview.selection()
-        if not selected_items:
-            messagebox.showwarning("Selection Error", "No files selected.")
-            return
-
-        folder_path = self.folder_label.cget("text").replace("Selected Folder: ", "")
-
-        renamed_count = 0
-        for item in selected_items:
-            original_file_name, original_file_path, name_part, extension_part = self.get_file_info(item)
-            new_name_part = name_part
-
-            if case_conversion == "lowercase":
-                new_name_part = name_part.lower()
-            elif case_conversion == "uppercase":
-                new_name_part = name_part.upper()
-            elif case_conversion == "titlecase":
-                new_name_part = name_part.title()
-            elif case_conversion == "none":
-                new_name_part = name_part
-
-            new_file_name = f"{new_name_part}{extension_part}"
-            new_file_path = os.path.join(folder_path, new_file_name)
-
-            try:
-                os.rename(original_file_path, new_file_path)
-                renamed_count += 1
-            except OSError as e:
-                messagebox.showerror("Error", f"Failed to rename {original_file_name} to {new_file_name}. Error: {e}")
-                return
-
-        self.load_file_list(folder_path)
-        messagebox.showinfo("Success",
-                            f"{renamed_count} file{'s' if renamed_count > 1 else ''} ha{'ve' if renamed_count > 1 else 's'} been renamed successfully.")
-
-    def rename_prefix_suffix(self):
-        """
-        Add specified prefix and/or suffix to the selected files' names and rename them.
-        """
-        folder_path = self.folder_label.cget("text").replace("Selected Folder: ", "")
-        if not self.file_treeview.selection():
-            messagebox.showwarning("Nothing selected", "Please select at least one file.")
-            return
-
-        prefix_text = self.prefix_entry.get()
-        suffix_text = self.suffix_entry.get()
-        renamed_count = 0
-
-        for item in self.file_treeview.selection():
-            original_file_name, original_file_path, name_part, extension_part = self.get_file_info(item)
-
-            new_file_name = f"{prefix_text}{name_part}{suffix_text}{extension_part}"
-            new_file_path = os.path.join(folder_path, new_file_name)
-
-            try:
-                os.rename(original_file_path, new_file_path)
-                renamed_count += 1
-            except OSError as e:
-                messagebox.showerror("Error", f"Failed to rename {original_file_name} to {new_file_name}. Error: {e}")
-                return
-
-        self.load_file_list(folder_path)
-        messagebox.showinfo("Success",
-                            f"{renamed_count} file{'s' if renamed_count > 1 else ''} ha{'ve' if renamed_count > 1 else 's'} been renamed successfully.")
-
-    def update_preview(self, event=None):
-        """
-        Update the preview of the renamed files in the Treeview based on the user's input.
-
-        Parameters:
-            event (tk.Event, optional): The event that triggered the update. Defaults to None.
-        """
-        replace_text = self.replace_entry.get()
-        new_text = self.new_entry.get()
-        case_conversion = self.case_conversion_var.get()
-        prefix = self.prefix_entry.get()
-        suffix = self.suffix_entry.get()
-
-        selected_items = self.file_treeview.selection()
-
-        for item in selected_items:
-            file_name = self.file_treeview.item(item, 'values')[0]
-            name_part, extension_part = os.path.splitext(file_name)
-            if case_conversion == "lowercase":
-                name_part = name_part.lower()
-            elif case_conversion == "uppercase":
-                name_part = name_part.upper()
-            elif case_conversion == "titlecase":
-                name_part = name_part.title()
-
-            if replace_text:
-                name_part = name_part.replace(replace_text, new_text)
-
-            new_file_name = f"{prefix}{name_part}{suffix}{extension_part}"
-
-            self.file_treeview.set(item, "Preview", new_file_name)
-
-    def update_preview_on_selection_change(self, event):
-        selected_items = self.file_treeview.selection()
-        for item in self.file_treeview.get_children():
-            if item in selected_items:
-                original_file_name = self.file_treeview.item(item, "values")[0]
-                replace_text = self.replace_entry.get()
-                new_text = self.new_entry.get()
-                name_part, extension_part = os.path.splitext(original_file_name)
-                if replace_text in name_part:
-                    new_name_part = name_part.replace(replace_text, new_text)
-                else:
-                    new_name_part = name_part
-                new_file_name = new_name_part + extension_part
-                self.file_treeview.set(item, "Preview", new_file_name)
-            else:
-                # Clear the Preview column if the item is not selected
-                self.file_treeview.set(item, "Preview", "")
-
-
-def main():
-    root = ttk.Window(themename="superhero")
-
-    app = BatchFileRenamer(root)
-    root.mainloop()
-
-
-if __name__ == "__main__":
-    main()
+import cProfile
+import os
+import time
+import tkinter as tk
+import ttkbootstrap as ttk
+from tkinter import filedialog, messagebox
+
+from file_list import VirtualFileList
+from renamer import (DuplicateSearch, FileModel, FolderMetadata, FolderScan, JobQueue, NameIndex, PathFilter,
+                     PreviewEngine, Recipe, RenameCancelledError, RenameError, RenameJournal, RenameRules, RenameTask,
+                     Selection, open_reader, plan_renames, split_patterns, tracer)
+
+# How often the main loop checks the folder scan for new rows, and how long each check may spend inserting them.
+LOAD_POLL_INTERVAL_MS = 20
+LOAD_FRAME_BUDGET_SECONDS = 0.03
+# Delay after the last keystroke before the preview is recomputed, and before the file list is filtered.
+PREVIEW_DEBOUNCE_MS = 120
+FILTER_DEBOUNCE_MS = 40
+# How often the main loop checks on a running rename, and how many renames are in flight in parallel mode.
+RENAME_POLL_INTERVAL_MS = 50
+PARALLEL_RENAME_WORKERS = 8
+# How often the main loop checks on the folders a recipe is applied to, and how many problems the summary lists.
+JOB_POLL_INTERVAL_MS = 100
+JOB_REPORT_LIMIT = 10
+# How often the main loop redraws the previews whose metadata was read in the background.
+METADATA_POLL_INTERVAL_MS = 100
+DUPLICATE_POLL_INTERVAL_MS = 100
+# File list columns, and the FileModel sort column behind each sortable one.
+FILE_COLUMNS = ("Name", "Preview", "Extension", "Size", "Date Modified")
+SORT_COLUMNS = {"Name": "name", "Extension": "extension", "Size": "size", "Date Modified": "date"}
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+# How often the status bar shows the latest timings while it is visible.
+STATUS_POLL_INTERVAL_MS = 500
+
+
+class BatchFileRenamer:
+    """
+       A GUI application for batch renaming files in a selected folder using various methods.
+
+       Attributes:
+           master (tk.Tk): The main window of the application.
+           folder_path (str): The path of the selected folder, or None before a folder is opened.
+           folder_label (ttk.Label): Label displaying the selected folder path.
+           scan_options_frame (ttk.Frame): Frame holding the subfolder and filter options of the scan.
+           recursive_var (tk.BooleanVar): Whether the files of every subfolder are listed too.
+           recursive_check (ttk.Checkbutton): Toggle for listing subfolders.
+           include_entry (ttk.Entry): Glob patterns a file name must match to be listed, separated by ";".
+           exclude_entry (ttk.Entry): Glob patterns of files and subfolders to skip, separated by ";".
+           select_folder_button (ttk.Button): Button to open the folder selection dialog.
+           refresh_button (ttk.Button): Button to scan the selected folder again.
+           undo_button (ttk.Button): Button to undo the last rename batch.
+           journal (RenameJournal): Journal every rename batch is recorded in, or None if it could not be opened.
+           list_frame (ttk.Frame): Frame containing the Treeview for displaying files.
+           filter_frame (ttk.Frame): Frame holding the filter box above the Treeview.
+           filter_entry (ttk.Entry): Words a file name must contain to be listed, regardless of case.
+           filter_count_label (ttk.Label): Label giving the number of files the filter lets through.
+           select_matches_button (ttk.Button): Button selecting every file the filter lets through.
+           name_index (NameIndex): Trigram index of the file names, searched as the filter is typed.
+           filter_after_id (str): The pending debounced filter update, if any.
+           file_model (FileModel): The files of the selected folder, in display order.
+           file_list (VirtualFileList): The file list, showing only the rows in view and holding the selection.
+           file_treeview (ttk.Treeview): Treeview for displaying the list of files in the selected folder.
+           sort_columns (list): (column name, ascending) pairs the file list is sorted by, most significant first.
+           scrollbar (ttk.Scrollbar): Scrollbar for the Treeview.
+           select_all_button (ttk.Button): Button to select all files in the Treeview.
+           deselect_all_button (ttk.Button): Button to deselect all files in the Treeview.
+           duplicates_button (ttk.Button): Button to show only the files with identical content, and back.
+           replace_section_label (ttk.Label): Label for the replace section.
+           replace_label (ttk.Label): Label for the replace field.
+           replace_entry (ttk.Entry): Entry for the text to be replaced.
+           new_label (ttk.Label): Label for the new text field.
+           new_entry (ttk.Entry): Entry for the new text.
+           rename_button (ttk.Button): Button to apply the replace rename operation.
+           regex_var (tk.BooleanVar): Whether the replace text is a regular expression.
+           regex_check (ttk.Checkbutton): Toggle for regular expression replace.
+           ignore_case_var (tk.BooleanVar): Whether the replace text matches regardless of case.
+           ignore_case_check (ttk.Checkbutton): Toggle for case-insensitive replace.
+           pattern_error_label (ttk.Label): Label reporting an invalid regular expression while it is typed.
+           file_pattern_label (ttk.Label): Label for the file pattern field.
+           file_pattern_entry (ttk.Entry): Glob patterns limiting which selected files every rename applies to.
+           case_rename_button (ttk.Button): Button to apply the case conversion rename operation.
+           titlecase_radio (ttk.Radiobutton): Radiobutton to select title case conversion.
+           uppercase_radio (ttk.Radiobutton): Radiobutton to select upper case conversion.
+           lowercase_radio (ttk.Radiobutton): Radiobutton to select lower case conversion.
+           case_label (ttk.Label): Label for the case conversion section.
+           case_conversion_var (tk.StringVar): Variable to store the selected case conversion option.
+           none_radio (ttk.Radiobutton): Radiobutton to select no case conversion.
+           prefix_suffix_label (ttk.Label): Label for the prefix/suffix section.
+           suffix_label (ttk.Label): Label for the suffix field.
+           prefix_entry (ttk.Entry): Entry for the prefix text.
+           suffix_entry (ttk.Entry): Entry for the suffix text.
+           prefix_label (ttk.Label): Label for the prefix field.
+           prefix_suffix_button (ttk.Button): Button to apply the prefix/suffix rename operation.
+           template_label (ttk.Label): Label for the template field.
+           template_entry (ttk.Entry): Entry for the name template, such as "{date:%Y%m%d}_{counter:05}_{stem}{ext}".
+           template_button (ttk.Button): Button applying every rule entered, the template last, in a single rename.
+           selected_files (Selection): The selection saved when an entry takes focus.
+           preview_engine (PreviewEngine): Computes and caches the Preview column for the rows in view.
+           preview_after_id (str): The pending debounced preview update, if any.
+           metadata_reader (MetadataReader): Reads photo and audio metadata for template fields, through the
+               on-disk metadata cache.
+           folder_scan (FolderScan): The background scan filling the Treeview, or None when no folder is loading.
+           duplicate_search (DuplicateSearch): The running search for duplicate files, or None.
+           duplicate_groups (list): Groups of file indices with identical content while only duplicates are shown,
+               otherwise None.
+           rename_task (RenameTask): The rename running in the background, or None.
+           job_queue (JobQueue): The recipe being applied to many folders in the background, or None.
+           parallel_rename_var (tk.BooleanVar): Whether renames are applied on a thread pool.
+           parallel_rename_check (ttk.Checkbutton): Toggle for parallel renames, useful on network shares.
+           progress_frame (ttk.Frame): Frame holding the progress controls, shown only while a folder loads or a
+               rename runs.
+           progress_label (ttk.Label): Label describing the running operation.
+           progressbar (ttk.Progressbar): Progress bar of the running operation.
+           cancel_button (ttk.Button): Button to cancel the running operation.
+           recipes_menu (tk.Menu): Menu saving and loading recipes and applying them to many folders.
+           diagnostics_menu (tk.Menu): Menu turning timings and profiling on and exporting them.
+           show_timings_var (tk.BooleanVar): Whether phase timings are recorded and shown in the status bar.
+           status_bar (ttk.Label): Status bar with the latest timing of each phase, shown only with timings on.
+           status_after_id (str): The pending status bar update, if any.
+           profile (cProfile.Profile): The profiler running on the main thread, or None.
+       """
+
+    def __init__(self, master):
+        """
+        Initialize the BatchFileRenamer class.
+
+        Args:
+            master (tk.Tk): The root window or parent frame.
+        """
+        self.master = master
+        self.master.title("Bulk File Renamer")
+        self.folder_path = None
+        self.folder_label = None
+        self.scan_options_frame = None
+        self.recursive_var = None
+        self.recursive_check = None
+        self.include_entry = None
+        self.exclude_entry = None
+        self.select_folder_button = None
+        self.refresh_button = None
+        self.undo_button = None
+        self.list_frame = None
+        self.filter_frame = None
+        self.filter_entry = None
+        self.filter_count_label = None
+        self.select_matches_button = None
+        self.file_model = FileModel()
+        self.name_index = NameIndex(self.file_model)
+        self.filter_after_id = None
+        self.file_list = None
+        self.file_treeview = None
+        self.sort_columns = []
+        self.scrollbar = None
+        self.select_all_button = None
+        self.deselect_all_button = None
+        self.duplicates_button = None
+        self.replace_section_label = None
+        self.replace_label = None
+        self.replace_entry = None
+        self.new_label = None
+        self.new_entry = None
+        self.rename_button = None
+        self.regex_var = None
+        self.regex_check = None
+        self.ignore_case_var = None
+        self.ignore_case_check = None
+        self.pattern_error_label = None
+        self.file_pattern_label = None
+        self.file_pattern_entry = None
+        self.case_rename_button = None
+        self.titlecase_radio = None
+        self.uppercase_radio = None
+        self.lowercase_radio = None
+        self.case_label = None
+        self.case_conversion_var = None
+        self.none_radio = None
+        self.prefix_suffix_label = None
+        self.suffix_label = None
+        self.prefix_entry = None
+        self.suffix_entry = None
+        self.prefix_label = None
+        self.prefix_suffix_button = None
+        self.template_label = None
+        self.template_entry = None
+        self.template_button = None
+        self.selected_files = Selection()
+        self.preview_engine = PreviewEngine(self.file_model, sequence=self.selected_indices)
+        self.preview_after_id = None
+        self.metadata_reader = open_reader()
+        self.folder_scan = None
+        self.duplicate_search = None
+        self.duplicate_groups = None
+        self.rename_task = None
+        self.job_queue = None
+        self.parallel_rename_var = None
+        self.parallel_rename_check = None
+        self.progress_frame = None
+        self.progress_label = None
+        self.progressbar = None
+        self.cancel_button = None
+        self.recipes_menu = None
+        self.diagnostics_menu = None
+        self.show_timings_var = None
+        self.status_bar = None
+        self.status_after_id = None
+        self.profile = None
+        try:
+            self.journal = RenameJournal()
+        except OSError:
+            self.journal = None
+
+        self.app_interface()
+        self.master.after_idle(self.recover_interrupted_renames)
+        self.master.after(METADATA_POLL_INTERVAL_MS, self.poll_metadata)
+
+    def app_interface(self):
+        """
+        Set up the user interface for the application.
+
+        This includes creating buttons, labels, entries, and the file list Treeview.
+        """
+        menu_bar = tk.Menu(self.master)
+        self.recipes_menu = tk.Menu(menu_bar, tearoff=False)
+        self.recipes_menu.add_command(label="Save Recipe...", command=self.save_recipe)
+        self.recipes_menu.add_command(label="Load Recipe...", command=self.load_recipe)
+        self.recipes_menu.add_separator()
+        self.recipes_menu.add_command(label="Apply to Subfolders...", command=self.apply_recipe_to_folders)
+        menu_bar.add_cascade(label="Recipes", menu=self.recipes_menu)
+        self.diagnostics_menu = tk.Menu(menu_bar, tearoff=False)
+        self.show_timings_var = tk.BooleanVar(value=False)
+        self.diagnostics_menu.add_checkbutton(label="Show Timings", variable=self.show_timings_var,
+                                              command=self.toggle_timings)
+        self.diagnostics_menu.add_command(label="Export Trace...", command=self.export_trace)
+        self.diagnostics_menu.add_separator()
+        self.diagnostics_menu.add_command(label="Start Profiling", command=self.toggle_profiling)
+        menu_bar.add_cascade(label="Diagnostics", menu=self.diagnostics_menu)
+        self.master.config(menu=menu_bar)
+
+        # Folder Selection
+        self.select_folder_button = ttk.Button(self.master, text="Open Folder", command=self.select_folder,
+                                               bootstyle="success")
+        self.select_folder_button.grid(row=0, column=1, columnspan=2, padx=10, pady=10, sticky="ew")
+
+        self.refresh_button = ttk.Button(self.master, text="Refresh", command=self.refresh_file_list,
+                                         bootstyle="secondary-outline")
+        self.refresh_button.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
+        self.master.bind("<F5>", lambda event: self.refresh_file_list())
+
+        self.undo_button = ttk.Button(self.master, text="Undo Last Rename", command=self.undo_last_batch,
+                                      bootstyle="secondary-outline")
+        self.undo_button.grid(row=0, column=3, padx=5, pady=10, sticky="ew")
+
+        self.parallel_rename_var = tk.BooleanVar(value=False)
+        self.parallel_rename_check = ttk.Checkbutton(self.master, text="Parallel renames",
+                                                     variable=self.parallel_rename_var, bootstyle="round-toggle")
+        self.parallel_rename_check.grid(row=0, column=4, padx=5, pady=10, sticky="w")
+
+        self.folder_label = ttk.Label(self.master, text="Selected Folder: ")
+        self.folder_label.grid(row=1, column=0, columnspan=2, padx=10, pady=10, sticky="w")
+
+        self.scan_options_frame = ttk.Frame(self.master)
+        self.scan_options_frame.grid(row=1, column=2, columnspan=3, padx=10, pady=10, sticky="e")
+        self.recursive_var = tk.BooleanVar(value=False)
+        self.recursive_check = ttk.Checkbutton(self.scan_options_frame, text="Include subfolders",
+                                               variable=self.recursive_var, command=self.refresh_file_list,
+                                               bootstyle="round-toggle")
+        self.recursive_check.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(self.scan_options_frame, text="Include:").pack(side=tk.LEFT)
+        self.include_entry = ttk.Entry(self.scan_options_frame, width=12)
+        self.include_entry.pack(side=tk.LEFT, padx=(5, 10))
+        ttk.Label(self.scan_options_frame, text="Exclude:").pack(side=tk.LEFT)
+        self.exclude_entry = ttk.Entry(self.scan_options_frame, width=12)
+        self.exclude_entry.pack(side=tk.LEFT, padx=(5, 0))
+        for entry in (self.include_entry, self.exclude_entry):
+            entry.bind("<Return>", lambda event: self.refresh_file_list())
+
+        # File List
+        self.list_frame = ttk.Frame(self.master)
+        self.list_frame.grid(row=2, column=0, columnspan=5, padx=10, pady=10, sticky="nsew")
+
+        self.filter_frame = ttk.Frame(self.list_frame)
+        self.filter_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(self.filter_frame, text="Filter:").pack(side=tk.LEFT)
+        self.filter_entry = ttk.Entry(self.filter_frame)
+        self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.filter_entry.bind("<KeyRelease>", self.update_filter)
+        self.filter_entry.bind("<Escape>", lambda event: self.clear_filter())
+        self.filter_count_label = ttk.Label(self.filter_frame, text="")
+        self.filter_count_label.pack(side=tk.LEFT, padx=5)
+        self.select_matches_button = ttk.Button(self.filter_frame, text="Select Matches", command=self.select_all,
+                                                bootstyle="secondary-outline")
+        self.select_matches_button.pack(side=tk.LEFT)
+        self.master.bind("<Control-f>", lambda event: self.filter_entry.focus_set())
+
+        self.file_list = VirtualFileList(self.list_frame, self.file_model, FILE_COLUMNS, self.file_row_values,
+                                         on_select=self.preview_engine.selection_changed,
+                                         on_heading_click=self.on_column_click)
+        self.file_list.frame.pack(fill=tk.BOTH, expand=True)
+        self.file_treeview = self.file_list.treeview
+        self.scrollbar = self.file_list.scrollbar
+        for column in FILE_COLUMNS:
+            self.file_treeview.heading(column, text=column)
+        self.file_treeview.column("Extension", width=80, stretch=False)
+        self.file_treeview.column("Size", width=90, stretch=False, anchor="e")
+
+        # Select all / Deselect all
+        self.select_all_button = ttk.Button(self.master, text="Select All", command=self.select_all,
+                                            bootstyle="secondary")
+        self.select_all_button.grid(row=3, column=0, columnspan=2, padx=(15, 10), pady=10, sticky="ew")
+
+        self.deselect_all_button = ttk.Button(self.master, text="Deselect All", command=self.deselect_all,
+                                              bootstyle="secondary")
+        self.deselect_all_button.grid(row=3, column=2, columnspan=2, padx=10, pady=10, sticky="ew")
+
+        self.duplicates_button = ttk.Button(self.master, text="Find Duplicates", command=self.find_duplicates,
+                                            bootstyle="secondary-outline")
+        self.duplicates_button.grid(row=3, column=4, padx=(10, 15), pady=10, sticky="ew")
+
+        ttk.Separator(self.master, orient='horizontal').grid(row=4, column=0, columnspan=5, padx=10, pady=10,
+                                                             sticky="ew")
+        # Replace Section
+        self.replace_section_label = ttk.Label(self.master, text="Replace character(s)")
+        self.replace_section_label.grid(row=5, column=0, padx=10, sticky="w")
+        self.pattern_error_label = ttk.Label(self.master, text="", bootstyle="danger")
+        self.pattern_error_label.grid(row=5, column=1, columnspan=2, sticky="w")
+        self.file_pattern_label = ttk.Label(self.master, text="Only files matching:")
+        self.file_pattern_label.grid(row=5, column=3, padx=5, sticky="e")
+        self.file_pattern_entry = ttk.Entry(self.master, width=12)
+        self.file_pattern_entry.grid(row=5, column=4, padx=(0, 10), sticky="ew")
+        self.file_pattern_entry.bind("<FocusIn>", self.save_file_selection)
+        self.file_pattern_entry.bind("<FocusOut>", self.restore_file_selection)
+        self.file_pattern_entry.bind("<KeyRelease>", self.update_preview)
+        self.replace_label = ttk.Label(self.master, text="Replace:")
+        self.replace_label.grid(row=6, column=0, padx=10, sticky="w")
+        self.replace_entry = ttk.Entry(self.master)
+        self.replace_entry.grid(row=6, column=1, columnspan=2, pady=5, sticky="ew")
+        self.replace_entry.bind("<FocusIn>", self.save_file_selection)
+        self.replace_entry.bind("<FocusOut>", self.restore_file_selection)
+        self.replace_entry.bind("<KeyRelease>", self.update_preview)
+
+        self.new_label = ttk.Label(self.master, text="With:")
+        self.new_label.grid(row=7, column=0, padx=10, sticky="w")
+        self.new_entry = ttk.Entry(self.master)
+        self.new_entry.grid(row=7, column=1, columnspan=2, pady=5, sticky="ew")
+        self.new_entry.bind("<FocusIn>", self.save_file_selection)
+        self.new_entry.bind("<FocusOut>", self.restore_file_selection)
+        self.new_entry.bind("<KeyRelease>", self.update_preview)
+
+        self.rename_button = ttk.Button(self.master, text="Replace character(s)", command=self.rename_files,
+                                        bootstyle="primary")
+        self.rename_button.grid(row=6, column=3, rowspan=2, padx=5)
+
+        self.regex_var = tk.BooleanVar(value=False)
+        self.regex_check = ttk.Checkbutton(self.master, text="Regex", variable=self.regex_var,
+                                           command=self.update_preview)
+        self.regex_check.grid(row=6, column=4, padx=5, sticky="w")
+        self.ignore_case_var = tk.BooleanVar(value=False)
+        self.ignore_case_check = ttk.Checkbutton(self.master, text="Ignore case", variable=self.ignore_case_var,
+                                                 command=self.update_preview)
+        self.ignore_case_check.grid(row=7, column=4, padx=5, sticky="w")
+
+        ttk.Separator(self.master, orient='horizontal').grid(row=8, column=0, columnspan=5, padx=10, pady=10,
+                                                             sticky="ew")
+
+        # Case Conversion Section
+        self.case_label = ttk.Label(self.master, text="Case Conversion:")
+        self.case_label.grid(row=10, column=0, rowspan=2, padx=10, sticky="w")
+        self.case_conversion_var = tk.StringVar(value="none")
+        self.none_radio = ttk.Radiobutton(self.master, text="None", variable=self.case_conversion_var,
+                                          value="none", command=self.update_preview)
+        self.none_radio.grid(row=10, column=1, pady=5, sticky="w")
+        self.lowercase_radio = ttk.Radiobutton(self.master, text="Lowercase", variable=self.case_conversion_var,
+                                               value="lowercase", command=self.update_preview)
+        self.lowercase_radio.grid(row=10, column=2, pady=5, sticky="w")
+        self.uppercase_radio = ttk.Radiobutton(self.master, text="Uppercase", variable=self.case_conversion_var,
+                                               value="uppercase", command=self.update_preview)
+        self.uppercase_radio.grid(row=11, column=1, pady=5, sticky="w")
+        self.titlecase_radio = ttk.Radiobutton(self.master, text="Titlecase", variable=self.case_conversion_var,
+                                               value="titlecase", command=self.update_preview)
+        self.titlecase_radio.grid(row=11, column=2, pady=5, sticky="w")
+        self.case_rename_button = ttk.Button(self.master, text="Change Case", command=self.rename_case)
+        self.case_rename_button.grid(row=10, rowspan=2, column=3, sticky="w")
+
+        # Prefix/Suffix Section
+        ttk.Separator(self.master, orient='horizontal').grid(row=12, column=0, columnspan=5, padx=10, pady=10,
+                                                             sticky="ew")
+        self.prefix_suffix_label = ttk.Label(self.master, text="Add Prefix/Suffix:")
+        self.prefix_suffix_label.grid(row=13, column=0, padx=10, sticky="w")
+
+        self.prefix_label = ttk.Label(self.master, text="Prefix:")
+        self.prefix_label.grid(row=14, column=0, padx=10, pady=5, sticky="w")
+        self.prefix_entry = ttk.Entry(self.master)
+        self.prefix_entry.grid(row=14, column=1, pady=5, sticky="ew")
+        self.prefix_entry.bind("<KeyRelease>", self.update_preview)
+
+        self.suffix_label = ttk.Label(self.master, text="Suffix:")
+        self.suffix_label.grid(row=15, column=0, padx=10, pady=5, sticky="w")
+        self.suffix_entry = ttk.Entry(self.master)
+        self.suffix_entry.grid(row=15, column=1, pady=5, sticky="ew")
+        self.suffix_entry.bind("<KeyRelease>", self.update_preview)
+
+        self.prefix_suffix_button = ttk.Button(self.master, text="Rename Prefix/Suffix",
+                                               command=self.rename_prefix_suffix)
+        self.prefix_suffix_button.grid(row=14, column=2, rowspan=2, pady=5)
+
+        # Template Section
+        ttk.Separator(self.master, orient='horizontal').grid(row=16, column=0, columnspan=5, padx=10, pady=10,
+                                                             sticky="ew")
+        self.template_label = ttk.Label(self.master, text="Template:")
+        self.template_label.grid(row=17, column=0, padx=10, pady=5, sticky="w")
+        self.template_entry = ttk.Entry(self.master)
+        self.template_entry.grid(row=17, column=1, columnspan=2, pady=5, sticky="ew")
+        self.template_entry.bind("<FocusIn>", self.save_file_selection)
+        self.template_entry.bind("<FocusOut>", self.restore_file_selection)
+        self.template_entry.bind("<KeyRelease>", self.update_preview)
+        self.template_button = ttk.Button(self.master, text="Rename with Template", command=self.rename_template)
+        self.template_button.grid(row=17, column=3, padx=5, pady=5)
+
+        # Progress, only shown while a folder is being scanned or files are being renamed
+        self.progress_frame = ttk.Frame(self.master)
+        self.progress_frame.grid(row=18, column=0, columnspan=5, padx=10, pady=10, sticky="ew")
+        self.progress_label = ttk.Label(self.progress_frame, text="")
+        self.progress_label.pack(side=tk.LEFT, padx=(0, 10))
+        self.cancel_button = ttk.Button(self.progress_frame, text="Cancel", command=self.cancel_task,
+                                        bootstyle="danger-outline")
+        self.cancel_button.pack(side=tk.RIGHT)
+        self.progressbar = ttk.Progressbar(self.progress_frame, mode="indeterminate", bootstyle="info-striped")
+        self.progressbar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
+        self.progress_frame.grid_remove()
+
+        self.status_bar = ttk.Label(self.master, text="", bootstyle="secondary")
+        self.status_bar.grid(row=19, column=0, columnspan=5, padx=10, pady=(0, 5), sticky="ew")
+        self.status_bar.grid_remove()
+
+    def select_folder(self):
+        """
+        Open a dialog to select a folder and list its files in the Treeview.
+        """
+        folder_path = filedialog.askdirectory()
+        if folder_path:
+            self.folder_path = folder_path
+            self.folder_label.config(text="Selected Folder: " + folder_path)
+            self.load_file_list(folder_path)
+
+    def refresh_file_list(self):
+        """
+        Scan the selected folder again, for changes made outside the application.
+        """
+        if self.folder_path and self.rename_task is None and self.job_queue is None:
+            self.load_file_list(self.folder_path)
+
+    def load_file_list(self, folder_path):
+        """
+       List all files in the selected folder in the Treeview.
+
+       The folder is scanned on a worker thread and the rows are added in batches from the main loop, so the window
+       stays responsive and the first files can be selected while the rest are still loading. With "Include
+       subfolders" on, the whole tree is walked and files are listed by their path relative to the folder.
+
+       Args:
+           folder_path (str): The path to the selected folder.
+       """
+        self.cancel_loading()
+        self.cancel_duplicate_search()
+        self.duplicate_groups = None
+        self.duplicates_button.config(text="Find Duplicates")
+        self.sort_columns = []
+        self.update_sort_headings()
+        self.file_model.clear()
+        self.name_index.clear()
+        self.preview_engine.metadata = FolderMetadata(folder_path, self.file_model, self.metadata_reader)
+        self.preview_engine.invalidate()
+        self.file_list.clear()
+
+        self.folder_scan = FolderScan(folder_path, recursive=self.recursive_var.get(), path_filter=self.path_filter())
+        self.folder_scan.start()
+        self.show_progress("Loading files...")
+        self.master.after(LOAD_POLL_INTERVAL_MS, self.poll_folder_scan, self.folder_scan)
+
+    def path_filter(self):
+        """
+        Build the scan filter from the Include and Exclude fields.
+
+        Returns:
+            PathFilter: The filter, or None if both fields are empty.
+        """
+        include = split_patterns(self.include_entry.get())
+        exclude = split_patterns(self.exclude_entry.get())
+        return PathFilter(include, exclude) if include or exclude else None
+
+    def file_row_values(self, index):
+        """
+        Build the Treeview values for a file. Only called for the rows in view.
+
+        Args:
+            index (int): The file index in the model.
+
+        Returns:
+            tuple: The values of the FILE_COLUMNS.
+        """
+        file_model = self.file_model
+        preview = self.preview_engine.preview(index) if index in self.file_list.selection else ""
+        extension = file_model.split(index)[1]
+        last_modified_date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(file_model.mtimes[index]))
+        return (file_model.names[index], preview, extension, self.format_size(file_model.sizes[index]),
+                last_modified_date)
+
+    @staticmethod
+    def format_size(size):
+        """
+        Format a file size for the Size column, such as "12.3 MB".
+
+        Args:
+            size (int): The size in bytes.
+
+        Returns:
+            str: The formatted size.
+        """
+        if size < 1024:
+            return f"{size} B"
+        for unit in SIZE_UNITS[1:]:
+            size /= 1024
+            if size < 1024 or unit == SIZE_UNITS[-1]:
+                return f"{size:.1f} {unit}"
+
+    def poll_folder_scan(self, folder_scan):
+        """
+        Add the files scanned since the last call, within a fixed time budget, and schedule the next call.
+
+        Args:
+            folder_scan (FolderScan): The scan being polled. Ignored if another folder has been loaded since.
+        """
+        if folder_scan is not self.folder_scan:
+            return
+
+        loaded_count = len(self.file_model.names)
+        deadline = time.perf_counter() + LOAD_FRAME_BUDGET_SECONDS
+        while time.perf_counter() < deadline:
+            batch = folder_scan.next_batch()
+            if batch is None:
+                break
+            self.file_model.extend(batch)
+        if len(self.file_model.names) != loaded_count:
+            self.name_index.catch_up()
+            if self.file_model.filtered is not None:
+                self.apply_filter()
+            else:
+                self.file_list.refresh()
+
+        if folder_scan.done:
+            self.finish_loading(folder_scan)
+        else:
+            self.progress_label.config(text=f"Loading files... {folder_scan.scanned_count} found")
+            self.master.after(LOAD_POLL_INTERVAL_MS, self.poll_folder_scan, folder_scan)
+
+    def poll_metadata(self):
+        """
+        Redraw the rows whose metadata was read since the last call, and schedule the next call.
+
+        Previews waiting for metadata are not cached, so redrawing the rows in view is enough.
+        """
+        folder_metadata = self.preview_engine.metadata
+        if folder_metadata is not None and folder_metadata.take_ready():
+            self.file_list.render()
+        self.master.after(METADATA_POLL_INTERVAL_MS, self.poll_metadata)
+
+    def finish_loading(self, folder_scan):
+        """
+        Hide the loading controls once a scan has finished, and report a scan error if there was one.
+
+        Args:
+            folder_scan (FolderScan): The finished scan.
+        """
+        self.folder_scan = None
+        self.hide_progress()
+        if folder_scan.error is not None:
+            messagebox.showerror("Error", f"Failed to read {folder_scan.folder_path}. Error: {folder_scan.error}")
+
+    def cancel_loading(self):
+        """
+        Stop loading the current folder, keeping the files listed so far.
+        """
+        if self.folder_scan is not None:
+            folder_scan = self.folder_scan
+            folder_scan.cancel()
+            self.finish_loading(folder_scan)
+
+    def show_progress(self, text, maximum=None):
+        """
+        Show the progress controls.
+
+        Args:
+            text (str): Description of the running operation.
+            maximum (int, optional): Total amount of work. The progress bar just animates if omitted.
+        """
+        self.progress_label.config(text=text)
+        if maximum is None:
+            self.progressbar.config(mode="indeterminate")
+            self.progressbar.start()
+        else:
+            self.progressbar.stop()
+            self.progressbar.config(mode="determinate", maximum=max(1, maximum), value=0)
+        self.progress_frame.grid()
+
+    def hide_progress(self):
+        """
+        Hide the progress controls, unless a rename is still running.
+        """
+        if self.rename_task is None and self.job_queue is None:
+            self.progressbar.stop()
+            self.progress_frame.grid_remove()
+
+    def cancel_task(self):
+        """
+        Cancel the running rename, which is then rolled back, or stop looking for duplicates or loading the folder.
+        """
+        if self.rename_task is not None:
+            self.rename_task.cancel()
+            self.progress_label.config(text="Cancelling, restoring the original names...")
+        elif self.job_queue is not None:
+            self.job_queue.cancel()
+            self.progress_label.config(text="Cancelling, restoring the original names...")
+        elif self.duplicate_search is not None:
+            self.cancel_duplicate_search()
+        else:
+            self.cancel_loading()
+
+    def get_file_info(self, index):
+        """
+        Fetch file information from the file model.
+
+        Args:
+            index (int): The file index in the model.
+
+        Returns:
+            original_file_name (str): The original file name.
+            original_file_path (str): The full file path.
+            name_part (str): The name part of the file.
+            extension_part (str): The extension part of the file.
+        """
+        original_file_name = self.file_model.name(index)
+        original_file_path = os.path.join(self.folder_path, original_file_name)
+        name_part, extension_part = self.file_model.split(index)
+
+        return original_file_name, original_file_path, name_part, extension_part
+
+    def on_column_click(self, column, extend=False):
+        """
+        Handle the column header click for sorting the files.
+
+        Clicking the column the files are sorted by reverses its direction, clicking another column sorts by it
+        alone. With shift held, the column is added as a tie-breaker after the current sort columns instead, or
+        reversed if it is one of them.
+
+        Args:
+            column (str): The column name by which to sort.
+            extend (bool, optional): Whether shift was held.
+        """
+        if column not in SORT_COLUMNS:
+            return
+        sorted_columns = [sorted_column for sorted_column, ascending in self.sort_columns]
+        if extend and column in sorted_columns:
+            position = sorted_columns.index(column)
+            self.sort_columns[position] = (column, not self.sort_columns[position][1])
+        elif extend:
+            self.sort_columns.append((column, True))
+        elif sorted_columns == [column]:
+            self.sort_columns = [(column, not self.sort_columns[0][1])]
+        else:
+            self.sort_columns = [(column, True)]
+
+        self.sort_files()
+        self.order_changed()
+        self.update_sort_headings()
+
+    def update_sort_headings(self):
+        """
+        Mark the sort columns in their headings with their direction, and their rank when there are several.
+        """
+        for column in SORT_COLUMNS:
+            self.file_treeview.heading(column, text=column)
+        for rank, (column, ascending) in enumerate(self.sort_columns, 1):
+            text = column + (" ↑" if ascending else " ↓")
+            if len(self.sort_columns) > 1:
+                text += str(rank)
+            self.file_treeview.heading(column, text=text)
+
+    def sort_files(self):
+        """
+        Sort the displayed files by the current sort columns.
+
+        The model sorts its order array with sort keys computed once per file, so sorting again only costs the sort
+        itself, and only the rows in view are redrawn afterwards.
+        """
+        if self.sort_columns:
+            self.file_model.sort_by([(SORT_COLUMNS[column], not ascending) for column, ascending in self.sort_columns])
+
+    def order_changed(self):
+        """
+        Redraw the file list after the displayed files or their order changed.
+        """
+        self.file_list.anchor = None
+        self.preview_engine.sequence_changed()
+        self.file_list.refresh()
+
+    def update_filter(self, event=None):
+        """
+        Filter the file list once typing in the filter box pauses for FILTER_DEBOUNCE_MS.
+
+        Args:
+            event (tk.Event, optional): The event that triggered the update.
+        """
+        if self.filter_after_id is not None:
+            self.master.after_cancel(self.filter_after_id)
+        self.filter_after_id = self.master.after(FILTER_DEBOUNCE_MS, self.apply_filter)
+
+    def apply_filter(self):
+        """
+        List only the files whose name contains every word typed in the filter box, in the current order.
+
+        Matches come from the name index, so a keystroke costs a lookup of the typed text rather than a pass over
+        every name. The selection is kept, but renames only apply to the selected files that are listed.
+        """
+        self.filter_after_id = None
+        text = self.filter_entry.get()
+        if text.strip():
+            self.file_model.set_filter(self.name_index.search(text))
+            self.filter_count_label.config(text=f"{len(self.file_model)} of {len(self.file_model.names)}")
+        else:
+            self.file_model.set_filter(None)
+            self.filter_count_label.config(text="")
+        self.order_changed()
+
+    def clear_filter(self):
+        """
+        Empty the filter box and list every file again.
+        """
+        self.filter_entry.delete(0, tk.END)
+        self.apply_filter()
+
+    def find_duplicates(self):
+        """
+        Look for files with identical content in the background, or go back to every file if duplicates are shown.
+
+        Only files sharing their size with another file are hashed, and digests come from the metadata cache when
+        the file has not changed since it was last hashed.
+        """
+        if self.duplicate_groups is not None:
+            self.show_all_files()
+            return
+        if not self.folder_path or self.folder_scan is not None or self.rename_task is not None \
+                or self.job_queue is not None or self.duplicate_search is not None:
+            return
+        self.duplicate_search = DuplicateSearch(self.folder_path, self.file_model, self.file_model.order,
+                                                self.metadata_reader.cache)
+        self.duplicate_search.start()
+        self.show_progress("Looking for duplicates...")
+        self.master.after(DUPLICATE_POLL_INTERVAL_MS, self.poll_duplicate_search, self.duplicate_search)
+
+    def poll_duplicate_search(self, duplicate_search):
+        """
+        Update the progress of a running duplicate search, and show the duplicates once it has finished.
+
+        Args:
+            duplicate_search (DuplicateSearch): The running search. Ignored if it has been cancelled since.
+        """
+        if duplicate_search is not self.duplicate_search:
+            return
+        if not duplicate_search.done:
+            if duplicate_search.total_count:
+                self.progressbar.stop()
+                self.progressbar.config(mode="determinate", maximum=duplicate_search.total_count,
+                                        value=duplicate_search.hashed_count)
+                self.progress_label.config(text=f"Hashing files... {duplicate_search.hashed_count} of "
+                                                f"{duplicate_search.total_count}")
+            self.master.after(DUPLICATE_POLL_INTERVAL_MS, self.poll_duplicate_search, duplicate_search)
+            return
+
+        self.duplicate_search = None
+        self.hide_progress()
+        if duplicate_search.error is not None:
+            messagebox.showerror("Error", f"Failed to look for duplicates. Error: {duplicate_search.error}")
+            return
+        if not duplicate_search.result:
+            messagebox.showinfo("No duplicates", "No two listed files have the same content.")
+            return
+
+        self.duplicate_groups = duplicate_search.result
+        self.file_model.set_order([index for group in self.duplicate_groups for index in group])
+        self.duplicates_button.config(text="Show All Files")
+        self.order_changed()
+        # Every copy but the first of each group is selected, ready to be renamed or reviewed.
+        self.file_list.set_selection(index for group in self.duplicate_groups for index in group[1:])
+
+    def cancel_duplicate_search(self):
+        """
+        Stop looking for duplicates. The digests computed so far stay cached.
+        """
+        if self.duplicate_search is not None:
+            self.duplicate_search.cancel()
+            self.duplicate_search = None
+            self.hide_progress()
+
+    def show_all_files(self):
+        """
+        Leave the duplicates view and display every file again, in the current sort order.
+        """
+        self.duplicate_groups = None
+        self.file_model.reset_order()
+        self.sort_files()
+        self.duplicates_button.config(text="Find Duplicates")
+        self.order_changed()
+
+    def select_all(self):
+        """
+        Select all files in the Treeview.
+        """
+        self.file_list.select_all()
+
+    def deselect_all(self):
+        """
+        Deselect all files in the Treeview.
+        """
+        self.file_list.clear_selection()
+
+    def save_file_selection(self, event):
+        self.selected_files = self.file_list.selection.copy()
+
+    def restore_file_selection(self, event):
+        self.file_list.add_to_selection(self.selected_files)
+
+    def current_rules(self):
+        """
+        Collect the rename options currently entered in the interface.
+
+        Returns:
+            RenameRules: The rules matching the replace, case and prefix/suffix inputs.
+        """
+        return RenameRules(case_conversion=self.case_conversion_var.get(), prefix=self.prefix_entry.get(),
+                           suffix=self.suffix_entry.get(), template=self.template_entry.get(),
+                           **self.replace_options())
+
+    def replace_options(self):
+        """
+        Collect the replace inputs and the file pattern, which every rename button applies.
+
+        Returns:
+            dict: RenameRules keyword arguments.
+        """
+        return {"replace_text": self.replace_entry.get(), "new_text": self.new_entry.get(),
+                "use_regex": self.regex_var.get(), "ignore_case": self.ignore_case_var.get(),
+                "file_pattern": self.file_pattern_entry.get()}
+
+    def selected_indices(self):
+        """
+        Get the selected files in display order, which is the order template counters number them in.
+
+        Returns:
+            list: File indices.
+        """
+        return self.file_model.indices_in_order(self.file_list.selection)
+
+    def apply_rules(self, rules, not_found_message=None):
+        """
+        Plan and apply a rename of the selected files, reporting the outcome to the user.
+
+        Args:
+            rules (RenameRules): The rules to apply.
+            not_found_message (str, optional): Warning shown when the rules leave every selected file unchanged.
+        """
+        if self.rename_task is not None or self.job_queue is not None:
+            return
+        file_model = self.file_model
+        indices = self.selected_indices()
+        file_names = [file_model.name(index) for index in indices]
+        file_stats = [(file_model.mtimes[index], file_model.sizes[index]) for index in indices]
+        # The folder was just scanned, so clashes are checked against the scan instead of listing it again.
+        existing_files = file_model.names
+        if rules.uses_metadata():
+            # Reading the metadata of files out of view can take minutes, so the plan is built on the worker.
+            folder_path = self.folder_path
+            folder_metadata = self.preview_engine.metadata
+
+            def prepare():
+                file_metadata = None
+                if folder_metadata is not None:
+                    file_metadata = folder_metadata.get_all(indices, rules.uses_digest())
+                return plan_renames(folder_path, file_names, rules, existing_files, file_stats, file_metadata)
+
+            self.start_rename(None, self.renamed_files_message, prepare=prepare, not_found_message=not_found_message)
+            return
+        try:
+            plan = plan_renames(self.folder_path, file_names, rules, existing_files, file_stats)
+        except RenameError as e:
+            messagebox.showwarning("Cannot rename", str(e))
+            return
+
+        if not plan.renames:
+            if not_found_message:
+                messagebox.showwarning("Not found", not_found_message)
+            return
+
+        self.start_rename(plan, self.renamed_files_message)
+
+    @staticmethod
+    def renamed_files_message(renamed_count):
+        return f"{renamed_count} file{'s' if renamed_count > 1 else ''} ha{'ve' if renamed_count > 1 else 's'} been renamed successfully."
+
+    def start_rename(self, plan, success_message, undoes=None, prepare=None, not_found_message=None):
+        """
+        Apply a plan on a worker thread, showing its progress and letting the user cancel it.
+
+        Args:
+            plan (RenamePlan): The plan to apply, or None to build it with prepare.
+            success_message (callable): Builds the message shown on success from the number of renamed files.
+            undoes (str, optional): The journaled batch the plan undoes.
+            prepare (callable, optional): Builds the plan on the worker thread.
+            not_found_message (str, optional): Warning shown when the plan built by prepare renames nothing.
+        """
+        workers = PARALLEL_RENAME_WORKERS if self.parallel_rename_var.get() else 1
+        self.rename_task = RenameTask(plan, self.journal, undoes, workers, prepare)
+        self.rename_task.start()
+        self.set_rename_controls_state(tk.DISABLED)
+        if plan is None:
+            self.show_progress("Reading metadata...")
+        else:
+            self.show_progress(f"Renaming... 0 of {self.rename_task.total_steps}",
+                               maximum=self.rename_task.total_steps)
+        self.master.after(RENAME_POLL_INTERVAL_MS, self.poll_rename_task, self.rename_task, success_message,
+                          not_found_message)
+
+    def poll_rename_task(self, rename_task, success_message, not_found_message=None):
+        """
+        Update the progress of a running rename, and report its outcome once it has finished.
+
+        Args:
+            rename_task (RenameTask): The running rename.
+            success_message (callable): Builds the message shown on success from the number of renamed files.
+            not_found_message (str, optional): Warning shown when the plan renames nothing.
+        """
+        if not rename_task.done:
+            if not rename_task.cancelled and rename_task.plan is not None:
+                if str(self.progressbar.cget("mode")) == "indeterminate":
+                    # The plan was just built on the worker, so the number of steps is now known.
+                    self.show_progress("", maximum=rename_task.total_steps)
+                self.progressbar.config(value=rename_task.applied_steps)
+                self.progress_label.config(
+                    text=f"Renaming... {rename_task.applied_steps} of {rename_task.total_steps}")
+            self.master.after(RENAME_POLL_INTERVAL_MS, self.poll_rename_task, rename_task, success_message,
+                              not_found_message)
+            return
+
+        self.rename_task = None
+        self.hide_progress()
+        self.set_rename_controls_state(tk.NORMAL)
+        if rename_task.plan is None:
+            # Building the plan failed, before any file was touched.
+            if rename_task.error is not None:
+                messagebox.showwarning("Cannot rename", str(rename_task.error))
+            return
+        if rename_task.error is None and not rename_task.result:
+            if not_found_message:
+                messagebox.showwarning("Not found", not_found_message)
+            return
+        folder_path = rename_task.plan.folder_path
+        if self.folder_path and os.path.abspath(self.folder_path) == os.path.abspath(folder_path):
+            if rename_task.error is None:
+                self.update_renamed_files(rename_task.result)
+            elif not isinstance(rename_task.error, RenameCancelledError):
+                # A failed rollback can leave files under either name, so only a rescan is reliable.
+                self.load_file_list(self.folder_path)
+
+        if isinstance(rename_task.error, RenameCancelledError):
+            messagebox.showinfo("Cancelled", str(rename_task.error))
+        elif rename_task.error is not None:
+            messagebox.showerror("Error", str(rename_task.error))
+        else:
+            messagebox.showinfo("Success", success_message(len(rename_task.result)))
+
+    def update_renamed_files(self, renames):
+        """
+        Patch the renamed rows in place, keeping the sort order, selection and scroll position.
+
+        Args:
+            renames (list): (original_file_name, new_file_name) pairs that were applied.
+        """
+        renamed = self.file_model.apply_renames(renames, candidates=self.file_list.selection)
+        self.name_index.update(renamed)
+        self.preview_engine.invalidate(renamed)
+        self.file_list.render()
+
+    def set_rename_controls_state(self, state):
+        """
+        Enable or disable the controls that start a rename or change folder, while a rename runs.
+
+        Args:
+            state (str): tk.NORMAL or tk.DISABLED.
+        """
+        for control in (self.select_folder_button, self.refresh_button, self.undo_button, self.rename_button,
+                        self.case_rename_button, self.prefix_suffix_button, self.template_button,
+                        self.parallel_rename_check, self.duplicates_button,
+                        self.recursive_check):
+            control.config(state=state)
+        self.recipes_menu.entryconfig(3, state=state)
+
+    def recover_interrupted_renames(self):
+        """
+        Finish or roll back any rename batch that was interrupted by a crash, and tell the user what was done.
+        """
+        if self.journal is None:
+            return
+        try:
+            recovered = self.journal.recover()
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to recover interrupted renames. Error: {e}")
+            return
+        for entry, action, problems in recovered:
+            message = f"An interrupted rename of {len(entry.steps)} file(s) in {entry.folder_path} was {action}."
+            if problems:
+                messagebox.showwarning("Rename recovered", message + f" {problems} file(s) could not be restored.")
+            else:
+                messagebox.showinfo("Rename recovered", message)
+
+    def undo_last_batch(self):
+        """
+        Undo the most recent rename batch, replaying the journal in reverse through the rename planner.
+        """
+        if self.rename_task is not None or self.job_queue is not None:
+            return
+        if self.journal is None:
+            messagebox.showwarning("Cannot undo", "The rename journal is not available.")
+            return
+        try:
+            entry, plan = self.journal.plan_undo()
+        except (RenameError, OSError) as e:
+            messagebox.showwarning("Cannot undo", str(e))
+            return
+
+        if not messagebox.askyesno("Undo rename",
+                                   f"Restore the original names of {len(plan)} file(s) in {entry.folder_path}?"):
+            return
+        self.start_rename(plan, lambda restored_count: f"{restored_count} file(s) restored to their original names.",
+                          undoes=entry.batch_id)
+
+    def rename_files(self):
+        """
+        Perform the renaming of the selected files based on the user's input.
+        """
+        if not self.file_list.selection:
+            messagebox.showwarning("Nothing selected!", "Please select at least one file.")
+            return
+
+        if len(self.file_list.selection) == 1:
+            not_found_message = "No file name matches your input."
+        else:
+            not_found_message = "No file names match your input. Nothing was renamed."
+        self.apply_rules(RenameRules(**self.replace_options()), not_found_message)
+
+    def rename_case(self):
+        """
+        Apply the selected case conversion to the selected files' names.
+        """
+        case_conversion = self.case_conversion_var.get()
+        if not case_conversion:
+            messagebox.showwarning("Input Error", "Please select a case conversion option.")
+            return
+
+        if not self.file_list.selection:
+            messagebox.showwarning("Selection Error", "No files selected.")
+            return
+
+        self.apply_rules(RenameRules(case_conversion=case_conversion, file_pattern=self.file_pattern_entry.get()))
+
+    def rename_prefix_suffix(self):
+        """
+        Add specified prefix and/or suffix to the selected files' names and rename them.
+        """
+        if not self.file_list.selection:
+            messagebox.showwarning("Nothing selected", "Please select at least one file.")
+            return
+
+        self.apply_rules(RenameRules(prefix=self.prefix_entry.get(), suffix=self.suffix_entry.get(),
+                                     file_pattern=self.file_pattern_entry.get()))
+
+    def rename_template(self):
+        """
+        Rename the selected files with every rule entered, in one pass: case, replace, prefix/suffix, then the
+        template, exactly as the Preview column shows them.
+        """
+        if not self.file_list.selection:
+            messagebox.showwarning("Nothing selected", "Please select at least one file.")
+            return
+        if not self.template_entry.get():
+            messagebox.showwarning("Input Error", "Please enter a template, such as {counter:03}_{stem}{ext}.")
+            return
+
+        self.apply_rules(self.current_rules(), "The template leaves every selected file name unchanged.")
+
+    def update_preview(self, event=None):
+        """
+        Update the preview of the renamed files in the Treeview based on the user's input.
+
+        Keystrokes are debounced: the preview is only recomputed once typing pauses for PREVIEW_DEBOUNCE_MS.
+
+        Parameters:
+            event (tk.Event, optional): The event that triggered the update. Defaults to None.
+        """
+        if self.preview_after_id is not None:
+            self.master.after_cancel(self.preview_after_id)
+        self.preview_after_id = self.master.after(PREVIEW_DEBOUNCE_MS, self.refresh_preview)
+
+    def refresh_preview(self):
+        """
+        Recompile the rename rules if they changed and redraw the Preview cells in view.
+
+        An invalid regular expression is reported next to the Replace field instead of in a dialog, so typing is
+        never interrupted; the preview shows the names unchanged until the pattern is valid again.
+        """
+        self.preview_after_id = None
+        with tracer.span("preview"):
+            try:
+                changed = self.preview_engine.set_rules(self.current_rules())
+                self.pattern_error_label.config(text="")
+            except RenameError as e:
+                changed = self.preview_engine.set_rules(RenameRules())
+                self.pattern_error_label.config(text=str(e))
+            if changed:
+                self.file_list.render()
+
+    def current_recipe(self):
+        """
+        Collect the rename rules and scan options currently entered in the interface.
+
+        Returns:
+            Recipe: The recipe.
+        """
+        return Recipe(self.current_rules(), self.recursive_var.get(), split_patterns(self.include_entry.get()),
+                      split_patterns(self.exclude_entry.get()))
+
+    def save_recipe(self):
+        """
+        Save the rules and scan options entered as a recipe file, to load again or pass to the command line.
+        """
+        recipe = self.current_recipe()
+        try:
+            recipe.rules.validate()
+        except RenameError as e:
+            messagebox.showerror("Invalid rules", str(e))
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="recipe.json",
+                                            filetypes=[("Rename recipe", "*.json")])
+        if not path:
+            return
+        try:
+            recipe.save(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save the recipe. Error: {e}")
+
+    def load_recipe(self):
+        """
+        Fill the rename rules and scan options in from a recipe file, rescanning the folder if the scan options
+        changed.
+        """
+        path = filedialog.askopenfilename(filetypes=[("Rename recipe", "*.json"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            recipe = Recipe.load(path)
+        except (OSError, RenameError) as e:
+            messagebox.showerror("Error", f"Failed to load the recipe. Error: {e}")
+            return
+
+        current = self.current_recipe()
+        scan_changed = (current.recursive, current.include, current.exclude) != \
+            (recipe.recursive, recipe.include, recipe.exclude)
+        rules = recipe.rules
+        for entry, text in ((self.replace_entry, rules.replace_text), (self.new_entry, rules.new_text),
+                            (self.file_pattern_entry, rules.file_pattern), (self.prefix_entry, rules.prefix),
+                            (self.suffix_entry, rules.suffix), (self.template_entry, rules.template),
+                            (self.include_entry, "; ".join(recipe.include)),
+                            (self.exclude_entry, "; ".join(recipe.exclude))):
+            entry.delete(0, tk.END)
+            entry.insert(0, text)
+        self.regex_var.set(rules.use_regex)
+        self.ignore_case_var.set(rules.ignore_case)
+        self.case_conversion_var.set(rules.case_conversion)
+        self.recursive_var.set(recipe.recursive)
+        if scan_changed:
+            self.refresh_file_list()
+        self.update_preview()
+
+    def apply_recipe_to_folders(self):
+        """
+        Apply the rules and scan options entered to every subfolder of a folder the user picks, several folders at a
+        time in the background, each planned and renamed on its own.
+        """
+        if self.rename_task is not None or self.job_queue is not None:
+            return
+        recipe = self.current_recipe()
+        try:
+            recipe.rules.validate()
+        except RenameError as e:
+            messagebox.showerror("Invalid rules", str(e))
+            return
+        parent_path = filedialog.askdirectory(title="Rename the files of every subfolder of")
+        if not parent_path:
+            return
+        try:
+            with os.scandir(parent_path) as entries:
+                folder_paths = sorted(entry.path for entry in entries
+                                      if entry.is_dir() and not entry.name.startswith("."))
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to list the subfolders. Error: {e}")
+            return
+        if not folder_paths:
+            messagebox.showinfo("No subfolders", f"{parent_path} has no subfolders.")
+            return
+        if not messagebox.askyesno("Apply to Subfolders",
+                                   f"Rename the files of the {len(folder_paths)} subfolder(s) of {parent_path} "
+                                   f"with the current rules?"):
+            return
+
+        workers = PARALLEL_RENAME_WORKERS if self.parallel_rename_var.get() else 1
+        self.job_queue = JobQueue(recipe, folder_paths, self.journal, rename_workers=workers)
+        self.job_queue.start()
+        self.set_rename_controls_state(tk.DISABLED)
+        self.show_progress(f"Renaming folders... 0 of {len(folder_paths)}", maximum=0)
+        self.master.after(JOB_POLL_INTERVAL_MS, self.poll_job_queue, self.job_queue)
+
+    def poll_job_queue(self, job_queue):
+        """
+        Update the combined progress of the folders a recipe is applied to, and report the outcome once every folder
+        has finished.
+
+        Args:
+            job_queue (JobQueue): The running queue.
+        """
+        if not job_queue.done:
+            if not job_queue.cancelled:
+                finished_count, total_count, applied_steps, planned_steps = job_queue.progress()
+                # The total grows as folders are planned, so the bar can step back a little meanwhile.
+                self.progressbar.config(maximum=max(1, planned_steps), value=applied_steps)
+                self.progress_label.config(text=f"Renaming folders... {finished_count} of {total_count} "
+                                                f"({applied_steps} of {planned_steps} files)")
+            self.master.after(JOB_POLL_INTERVAL_MS, self.poll_job_queue, job_queue)
+            return
+
+        self.job_queue = None
+        self.hide_progress()
+        self.set_rename_controls_state(tk.NORMAL)
+        if self.folder_path:
+            # The open folder is rescanned if it is one of the folders, inside one, or lists them as subfolders.
+            folder_path = os.path.abspath(self.folder_path)
+            if any(os.path.commonpath([job.folder_path, folder_path]) in (job.folder_path, folder_path)
+                   for job in job_queue.jobs):
+                self.load_file_list(self.folder_path)
+
+        counts = job_queue.counts()
+        renamed = sum(len(job.result) for job in job_queue.jobs if job.result)
+        lines = [f"{renamed} file(s) renamed in {counts.get('done', 0)} folder(s)."]
+        if counts.get("unchanged"):
+            lines.append(f"{counts['unchanged']} folder(s) had nothing to rename.")
+        problems = [job for job in job_queue.jobs if job.state in ("conflict", "failed", "cancelled")]
+        lines.extend(f"{job.folder_path}: {job.error}" for job in problems[:JOB_REPORT_LIMIT])
+        if len(problems) > JOB_REPORT_LIMIT:
+            lines.append(f"...and {len(problems) - JOB_REPORT_LIMIT} more folder(s) not renamed.")
+        if problems:
+            messagebox.showwarning("Folders not renamed", "\n\n".join(lines))
+        else:
+            messagebox.showinfo("Success", "\n".join(lines))
+
+    def toggle_timings(self):
+        """
+        Start or stop recording phase timings, showing them in the status bar while they are recorded.
+        """
+        if self.show_timings_var.get():
+            tracer.enable()
+            self.status_bar.grid()
+            self.poll_status_bar()
+        else:
+            tracer.disable()
+            self.status_bar.grid_remove()
+            if self.status_after_id is not None:
+                self.master.after_cancel(self.status_after_id)
+                self.status_after_id = None
+
+    def poll_status_bar(self):
+        """
+        Show the latest duration of each phase in the status bar, and schedule the next update.
+        """
+        phases = tracer.summary()
+        if phases:
+            text = "   ".join(f"{name} {phase['last_ms']:.1f} ms" + (f" ({phase['items']})" if phase["items"] else "")
+                               for name, phase in phases.items())
+        else:
+            text = "Recording timings..."
+        self.status_bar.config(text=text)
+        self.status_after_id = self.master.after(STATUS_POLL_INTERVAL_MS, self.poll_status_bar)
+
+    def export_trace(self):
+        """
+        Save the recorded timings as a Chrome trace, to open in chrome://tracing or https://ui.perfetto.dev.
+        """
+        if not tracer.events:
+            messagebox.showinfo("No timings", "Turn on Diagnostics > Show Timings, then repeat the slow operation.")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="batch-renamer-trace.json",
+                                            filetypes=[("Chrome trace", "*.json")])
+        if not path:
+            return
+        try:
+            count = tracer.export_chrome_trace(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save the trace. Error: {e}")
+            return
+        messagebox.showinfo("Trace saved", f"{count} timing(s) saved to {path}.")
+
+    def toggle_profiling(self):
+        """
+        Start profiling the main thread, or stop and save the profile for pstats or snakeviz.
+        """
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            self.diagnostics_menu.entryconfig(3, label="Stop Profiling and Save...")
+            return
+        self.profile.disable()
+        profile, self.profile = self.profile, None
+        self.diagnostics_menu.entryconfig(3, label="Start Profiling")
+        path = filedialog.asksaveasfilename(defaultextension=".prof", initialfile="batch-renamer.prof",
+                                            filetypes=[("cProfile dump", "*.prof")])
+        if not path:
+            return
+        try:
+            profile.dump_stats(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save the profile. Error: {e}")
+
+
+def main():
+    root = ttk.Window(themename="superhero")
+
+    app = BatchFileRenamer(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
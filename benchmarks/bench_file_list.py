@@ -0,0 +1,141 @@
+"""
+Compare the memory and latency of the virtual file list against one Treeview item per file.
+
+Each measurement runs in its own subprocess so resident memory is not shared between runs. Needs a display
+(run under xvfb-run on a headless machine) and ttkbootstrap.
+
+Usage:
+    python benchmarks/bench_file_list.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renamer import FileModel, ScannedFile  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+COLUMNS = ("Name", "Preview", "Date Modified")
+
+
+def resident_memory():
+    """
+    Get the resident memory of this process in bytes, or 0 where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def synthetic_files(count):
+    base_mtime = 1_700_000_000.0
+    return [ScannedFile(f"IMG_{i:07d}.jpg", base_mtime + i, 1024 + i % 4096, i) for i in range(count)]
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def measure_treeview(root, scanned_files):
+    import tkinter as tk
+    from tkinter import ttk
+
+    treeview = ttk.Treeview(root, columns=COLUMNS, show="headings")
+    treeview.pack(fill=tk.BOTH, expand=True)
+    root.update()
+    memory_before = resident_memory()
+
+    def populate():
+        for scanned_file in scanned_files:
+            date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(scanned_file.mtime))
+            treeview.insert("", tk.END, values=(scanned_file.name, "", date))
+        root.update()
+
+    def scroll():
+        treeview.yview_moveto(0.5)
+        root.update()
+
+    return {
+        "populate": timed(populate),
+        "memory": resident_memory() - memory_before,
+        "get_children": timed(treeview.get_children),
+        "select_all": timed(lambda: treeview.selection_set(treeview.get_children())),
+        "scroll": timed(scroll),
+    }
+
+
+def measure_virtual(root, scanned_files):
+    import tkinter as tk
+    from file_list import VirtualFileList
+
+    model = FileModel()
+
+    def row_values(index):
+        date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(model.mtimes[index]))
+        return model.names[index], "", date
+
+    file_list = VirtualFileList(root, model, COLUMNS, row_values)
+    file_list.frame.pack(fill=tk.BOTH, expand=True)
+    root.update()
+    memory_before = resident_memory()
+
+    def populate():
+        model.extend(scanned_files)
+        file_list.refresh()
+        root.update()
+
+    def scroll():
+        file_list.yview("moveto", 0.5)
+        root.update()
+
+    return {
+        "populate": timed(populate),
+        "memory": resident_memory() - memory_before,
+        "get_children": timed(file_list.visible_indices),
+        "select_all": timed(file_list.select_all),
+        "scroll": timed(scroll),
+    }
+
+
+def run_child(mode, size):
+    import ttkbootstrap as ttk
+
+    root = ttk.Window(themename="superhero")
+    root.geometry("900x600")
+    scanned_files = synthetic_files(size)
+    measure = measure_virtual if mode == "virtual" else measure_treeview
+    print(json.dumps(measure(root, scanned_files)))
+    root.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'files':>9} {'mode':>8} {'populate s':>11} {'memory MB':>10} {'children s':>11} "
+          f"{'select s':>9} {'scroll s':>9}")
+    for size in args.sizes:
+        for mode in ("treeview", "virtual"):
+            output = subprocess.run([sys.executable, __file__, "--child", mode, str(size)],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{size:>9} {mode:>8} {result['populate']:>11.3f} {result['memory'] / 2 ** 20:>10.1f} "
+                  f"{result['get_children']:>11.4f} {result['select_all']:>9.4f} {result['scroll']:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Check that the filter box narrows 100,000 names within the per-keystroke latency budget.
+
+The name index is built on the first search, as in the GUI. Each simulated keystroke then searches the index and
+rebuilds the filtered display order of a shuffled model, which is what the GUI does before redrawing the rows in
+view. Exits with status 1 if the slowest keystroke is over budget; the index build is reported separately.
+
+Usage:
+    python benchmarks/bench_filter.py [--files 100000] [--budget-ms 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renamer import FileModel, NameIndex, ScannedFile  # noqa: E402
+
+WORDS = ("holiday", "work", "family", "beach", "birthday", "scan", "invoice", "draft")
+# Successive states of the filter box while a search is typed, edited and cleared.
+KEYSTROKES = ("h", "ho", "hol", "holi", "holid", "holiday", "holiday 0", "holiday 00", "holiday 001", "holiday 00",
+              "beach", "beach 12", "invoice", "")
+
+
+def make_model(count):
+    model = FileModel()
+    model.extend([ScannedFile(f"IMG_{i:07d}_{WORDS[i % len(WORDS)]}_{WORDS[i * 7 % len(WORDS)]}.jpg", 0.0, 0, i)
+                  for i in range(count)])
+    order = list(range(count))
+    random.Random(0).shuffle(order)
+    model.set_order(order)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--budget-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    model = make_model(args.files)
+    index = NameIndex(model)
+    start = time.perf_counter()
+    index.catch_up()
+    print(f"Index built in {(time.perf_counter() - start) * 1000:.0f} ms ({len(index.postings)} trigrams)")
+
+    slowest = 0.0
+    print(f"{'filter':<14} {'matches':>8} {'ms':>8}")
+    for text in KEYSTROKES:
+        start = time.perf_counter()
+        model.set_filter(index.search(text) if text.strip() else None)
+        elapsed = time.perf_counter() - start
+        slowest = max(slowest, elapsed)
+        print(f"{text!r:<14} {len(model):>8} {elapsed * 1000:>8.2f}")
+    print(f"Slowest keystroke: {slowest * 1000:.1f} ms for {args.files} files (budget {args.budget_ms:.0f} ms)")
+    return 0 if slowest * 1000 <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
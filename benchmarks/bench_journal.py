@@ -0,0 +1,58 @@
+"""
+Measure what the rename journal costs on top of plain renames, for a few group commit sizes.
+
+Usage:
+    python benchmarks/bench_journal.py [--files 100000] [--groups 1 64 512 4096]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renamer import RenameJournal, RenameRules, apply_plan, list_files, plan_renames  # noqa: E402
+
+
+def make_folder(count):
+    folder_path = tempfile.mkdtemp(prefix="bench-journal-")
+    for i in range(count):
+        open(os.path.join(folder_path, f"file_{i:07d}.dat"), "wb").close()
+    return folder_path
+
+
+def time_batch(count, journal):
+    folder_path = make_folder(count)
+    try:
+        plan = plan_renames(folder_path, list_files(folder_path), RenameRules(prefix="renamed_"))
+        start = time.perf_counter()
+        apply_plan(plan, journal)
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(folder_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--groups", type=int, nargs="+", default=(1, 64, 512, 4096))
+    args = parser.parse_args()
+
+    journal_directory = tempfile.mkdtemp(prefix="bench-journal-state-")
+    try:
+        baseline = time_batch(args.files, None)
+        print(f"{'journal':>18} {'seconds':>9} {'renames/s':>11} {'overhead':>9}")
+        print(f"{'none':>18} {baseline:>9.3f} {args.files / baseline:>11.0f} {'':>9}")
+        for group_size in args.groups:
+            journal = RenameJournal(journal_directory, group_size=group_size)
+            elapsed = time_batch(args.files, journal)
+            print(f"{f'group {group_size}':>18} {elapsed:>9.3f} {args.files / elapsed:>11.0f} "
+                  f"{(elapsed / baseline - 1) * 100:>8.1f}%")
+    finally:
+        shutil.rmtree(journal_directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Show the speedup of the thread-pool rename mode on a high-latency file system.
+
+The latency of a network share is simulated by a shim around FolderRenamer.rename that sleeps before each call,
+releasing the GIL like a blocking network round trip would. Half of the files are renamed independently and the
+other half form chains (file_1 -> file_2 -> ...), so the ordering constraints of the planner are exercised too.
+
+Usage:
+    python benchmarks/bench_parallel_rename.py [--files 2000] [--latency-ms 2] [--workers 1 4 8 16]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renamer import FolderRenamer, apply_plan, plan_mapping  # noqa: E402
+
+CHAIN_LENGTH = 10
+
+
+class LatencyShim:
+    """
+    Context manager that adds a fixed delay to every rename the executor makes.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.original_rename = FolderRenamer.rename
+
+    def __enter__(self):
+        original_rename = self.original_rename
+        latency = self.latency
+
+        def slow_rename(renamer, from_name, to_name):
+            time.sleep(latency)
+            original_rename(renamer, from_name, to_name)
+
+        FolderRenamer.rename = slow_rename
+        return self
+
+    def __exit__(self, *exc_info):
+        FolderRenamer.rename = self.original_rename
+
+
+def make_batch(count):
+    """
+    Create a folder and a rename mapping over its files, half independent renames and half chains.
+
+    Returns:
+        tuple: The folder path, the renames, and the expected {new_name: content} result.
+    """
+    folder_path = tempfile.mkdtemp(prefix="bench-parallel-")
+    renames = []
+    chained = count // 2
+    for i in range(count):
+        name = f"file_{i:07d}"
+        with open(os.path.join(folder_path, name), "w") as file:
+            file.write(name)
+    for i in range(chained, count):
+        renames.append((f"file_{i:07d}", f"renamed_{i:07d}"))
+    # Each chain of CHAIN_LENGTH files shifts every file to the next one's name; the last moves to a free name.
+    for start in range(0, chained, CHAIN_LENGTH):
+        end = min(start + CHAIN_LENGTH, chained)
+        for i in range(start, end - 1):
+            renames.append((f"file_{i:07d}", f"file_{i + 1:07d}"))
+        renames.append((f"file_{end - 1:07d}", f"shifted_{end - 1:07d}"))
+    expected = {new_name: original_name for original_name, new_name in renames}
+    for i in range(0, chained, CHAIN_LENGTH):
+        expected.setdefault(f"file_{i:07d}", None)
+    return folder_path, renames, expected
+
+
+def check(folder_path, expected):
+    for new_name, original_name in expected.items():
+        path = os.path.join(folder_path, new_name)
+        if original_name is None:
+            assert not os.path.exists(path), path
+            continue
+        with open(path) as file:
+            assert file.read() == original_name, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=(1, 4, 8, 16))
+    args = parser.parse_args()
+
+    print(f"{args.files} files, {args.latency_ms} ms per rename")
+    print(f"{'workers':>8} {'seconds':>9} {'renames/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        folder_path, renames, expected = make_batch(args.files)
+        try:
+            plan = plan_mapping(folder_path, renames)
+            with LatencyShim(args.latency_ms / 1000):
+                start = time.perf_counter()
+                apply_plan(plan, workers=workers)
+                elapsed = time.perf_counter() - start
+            check(folder_path, expected)
+        finally:
+            shutil.rmtree(folder_path)
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>9.3f} {len(renames) / elapsed:>10.0f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Check that a regex rename previews 100,000 names within the per-keystroke latency budget.
+
+Each simulated keystroke changes the pattern, recompiles the rules through the pattern cache and previews every
+file in the model, which is the worst case: the GUI itself only previews the rows in view. Exits with status 1 if
+the slowest keystroke is over budget.
+
+Usage:
+    python benchmarks/bench_regex_preview.py [--files 100000] [--budget-ms 250]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renamer import FileModel, PreviewEngine, RenameRules, ScannedFile  # noqa: E402
+from renamer.rules import compile_regex  # noqa: E402
+
+# Successive states of the Replace field while a pattern is typed, then edited back to an earlier state.
+KEYSTROKES = (r"IMG", r"IMG_", r"IMG_(", r"IMG_(\d", r"IMG_(\d+", r"IMG_(\d+)", r"IMG_(\d+)_", r"IMG_(\d+)")
+
+
+def make_model(count):
+    model = FileModel()
+    model.extend([ScannedFile(f"IMG_{i:07d}_{'holiday' if i % 3 else 'work'}.jpg", 0.0, 0, i) for i in range(count)])
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--budget-ms", type=float, default=250.0)
+    args = parser.parse_args()
+
+    model = make_model(args.files)
+    engine = PreviewEngine(model, cache_size=args.files + 1)
+    compile_regex.cache_clear()
+    slowest = 0.0
+    print(f"{'pattern':<14} {'rules ms':>10} {'preview ms':>10}")
+    for pattern in KEYSTROKES:
+        rules = RenameRules(replace_text=pattern, new_text=r"photo-\1" if ")" in pattern else "photo",
+                            use_regex=True, ignore_case=True)
+        start = time.perf_counter()
+        try:
+            engine.set_rules(rules)
+        except Exception as e:
+            print(f"{pattern:<14} rejected: {e}")
+            continue
+        compiled = time.perf_counter()
+        for index in range(len(model)):
+            engine.preview(index)
+        done = time.perf_counter()
+        slowest = max(slowest, done - start)
+        print(f"{pattern:<14} {(compiled - start) * 1000:>10.2f} {(done - compiled) * 1000:>10.1f}")
+    print(f"Pattern cache: {compile_regex.cache_info()}")
+    print(f"Slowest keystroke: {slowest * 1000:.1f} ms for {args.files} files (budget {args.budget_ms:.0f} ms)")
+    return 0 if slowest * 1000 <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
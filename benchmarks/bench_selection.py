@@ -0,0 +1,86 @@
+"""
+Check that selecting, dragging over and restoring a million files stays within the per-action latency budget.
+
+Runs the selection operations the file list performs, without a display: select all, a drag over a thousand rows
+one motion event per row, saving and restoring the selection around a rename, and testing every visible row for
+membership as a redraw does. Each is timed in scan order and in a shuffled order. Exits with status 1 if the
+slowest action is over budget.
+
+Usage:
+    python benchmarks/bench_selection.py [--files 1000000] [--budget-ms 50]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renamer import FileModel, ScannedFile, Selection  # noqa: E402
+
+DRAG_ROWS = 1000
+VISIBLE_ROWS = 40
+
+
+def make_model(count, shuffled):
+    model = FileModel()
+    model.extend([ScannedFile(f"IMG_{i:07d}.jpg", 0.0, 0, i) for i in range(count)])
+    if shuffled:
+        order = list(range(count))
+        random.Random(0).shuffle(order)
+        model.set_order(order)
+    return model
+
+
+def select_all(model, selection):
+    selection.replace(model.index_runs(0, len(model)))
+    selection.take_changes()
+
+
+def drag(model, selection):
+    anchor = len(model) // 2
+    selection.replace(model.index_runs(anchor, anchor + 1))
+    for position in range(anchor + 1, anchor + DRAG_ROWS):
+        for start, stop in model.index_runs(position - 1, position + 1):
+            selection.add_range(start, stop)
+        selection.take_changes()
+
+
+def save_and_restore(model, selection):
+    saved = selection.copy()
+    selection.clear()
+    selection.take_changes()
+    selection.update(saved)
+    selection.take_changes()
+
+
+def redraw(model, selection):
+    top = len(model) // 3
+    return [index for index in model.order[top:top + VISIBLE_ROWS] if index in selection]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    slowest = 0.0
+    print(f"{'order':<10} {'action':<18} {'selected':>9} {'ranges':>8} {'ms':>8}")
+    for shuffled in (False, True):
+        model = make_model(args.files, shuffled)
+        selection = Selection()
+        for action in (drag, select_all, save_and_restore, redraw):
+            start = time.perf_counter()
+            action(model, selection)
+            elapsed = time.perf_counter() - start
+            slowest = max(slowest, elapsed)
+            print(f"{'shuffled' if shuffled else 'scan':<10} {action.__name__:<18} {len(selection):>9} "
+                  f"{len(selection.starts):>8} {elapsed * 1000:>8.2f}")
+    print(f"Slowest action: {slowest * 1000:.1f} ms for {args.files} files (budget {args.budget_ms:.0f} ms)")
+    return 0 if slowest * 1000 <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Check that sorting 500,000 files again by any column stays within the latency budget.
+
+The first sort by name or extension computes the sort keys of every file, as the first heading click does in the
+GUI; it is reported separately. Every sort after it only reorders the model's order array. Exits with status 1 if
+the slowest sort after the first is over budget.
+
+Usage:
+    python benchmarks/bench_sort.py [--files 500000] [--budget-ms 1500]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renamer import FileModel, ScannedFile  # noqa: E402
+
+EXTENSIONS = (".jpg", ".JPG", ".png", ".mp3", ".txt")
+SORTS = (
+    [("name", False)],
+    [("name", True)],
+    [("extension", False)],
+    [("size", True)],
+    [("date", False)],
+    [("extension", False), ("size", True), ("name", False)],
+)
+
+
+def make_model(count):
+    rng = random.Random(0)
+    model = FileModel()
+    model.extend([ScannedFile(f"IMG_{rng.randrange(count)}_{i % 97}{EXTENSIONS[i % len(EXTENSIONS)]}",
+                              1_600_000_000.0 + rng.randrange(10 ** 7), rng.randrange(10 ** 7), i)
+                  for i in range(count)])
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500_000)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+
+    model = make_model(args.files)
+    for column in ("name", "extension"):
+        start = time.perf_counter()
+        model.sort_keys(column)
+        print(f"{column.capitalize()} keys computed in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    slowest = 0.0
+    print(f"{'columns':<40} {'ms':>8}")
+    for columns in SORTS:
+        start = time.perf_counter()
+        model.sort_by(columns)
+        elapsed = time.perf_counter() - start
+        slowest = max(slowest, elapsed)
+        label = ", ".join(f"{column} {'desc' if reverse else 'asc'}" for column, reverse in columns)
+        print(f"{label:<40} {elapsed * 1000:>8.1f}")
+    print(f"Slowest sort: {slowest * 1000:.0f} ms for {args.files} files (budget {args.budget_ms:.0f} ms)")
+    return 0 if slowest * 1000 <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""
+Time loading, sorting, previewing and renaming synthetic folders, and compare the results with a saved baseline.
+
+For each size, two folders of empty files are generated in a temporary directory:
+
+- "mixed": names as found in real folders, camera photos, phone photos, documents with spaces and versions, music
+  tracks and "(1)" copies, with varied sizes and modification times.
+- "chain": names "000000.dat", "000001.dat"... renumbered from 1, so every new name but one is taken by another file
+  of the batch and the planner has to order the whole batch as one chain.
+
+Each folder is measured headless, through the renamer package as the GUI and the command line use it, then through
+the Tk application when ttkbootstrap and a display are available (run under xvfb-run on a headless machine). Each
+measurement runs in its own subprocess so peak resident memory is its own. Preview latency is measured per
+simulated keystroke, for the rows in view, while a replace pattern and then a template are typed.
+
+With --save-baseline the results are written to the baseline file. Otherwise they are compared with it, and the
+script exits with status 1 if any measurement is slower or larger than the baseline by more than the tolerance.
+Baselines are only meaningful on the machine they were saved on.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 10000 100000 1000000] [--cases mixed chain] [--no-tk]
+                                     [--baseline benchmarks/baseline.json] [--save-baseline] [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renamer import (FileModel, NameIndex, PreviewEngine, RenameError, RenameJournal, RenameRules,  # noqa: E402
+                     apply_plan, plan_renames, scan_folder)
+
+DEFAULT_SIZES = (10_000, 100_000)
+CASES = ("mixed", "chain")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+VISIBLE_ROWS = 40
+# Successive states of the Replace field, then of the Template field, while they are typed.
+REPLACE_TEXT = "IMG_"
+TEMPLATE_TEXT = "{date:%Y%m%d}_{counter:06}_{stem}{ext}"
+# The rules of the rename measured in each case.
+RENAME_TEMPLATES = {"mixed": "{counter:06}_{stem}{ext}", "chain": "{counter(1, 1):06}{ext}"}
+# Differences below these are noise, whatever the tolerance says.
+NOISE = {"s": 0.02, "ms": 2.0, "mb": 8.0}
+
+WORDS = ("holiday", "beach", "family", "report", "invoice", "draft", "scan", "meeting", "budget", "notes")
+TITLES = ("Intro", "Blue Sky", "Night Drive", "Homecoming", "Outro", "Interlude", "Rain")
+
+
+def mixed_name(rng, i):
+    """
+    Get a realistic file name, unique thanks to the index it includes.
+    """
+    kind = rng.random()
+    if kind < 0.35:
+        return f"IMG_{i:06d}.{rng.choice(('JPG', 'jpg', 'HEIC'))}"
+    if kind < 0.5:
+        return f"DSC{i:06d}.{rng.choice(('JPG', 'ARW', 'NEF'))}"
+    if kind < 0.65:
+        return (f"PXL_2023{rng.randrange(1, 13):02d}{rng.randrange(1, 29):02d}_{rng.randrange(240000):06d}"
+                f"{i:07d}.jpg")
+    if kind < 0.8:
+        extension = rng.choice(("docx", "pdf", "xlsx"))
+        return f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} v{rng.randrange(1, 12)} {i}.{extension}"
+    if kind < 0.92:
+        return f"{rng.randrange(1, 20):02d} - {rng.choice(TITLES)} {i}.mp3"
+    return f"{rng.choice(WORDS)}_{i} ({rng.randrange(1, 4)}).{rng.choice(('png', 'txt', 'zip'))}"
+
+
+def generate_folder(folder_path, case, count):
+    """
+    Create count empty files of a case in a folder, with varied sizes and modification times.
+    """
+    rng = random.Random(count)
+    base_mtime = 1_600_000_000
+    for i in range(count):
+        name = mixed_name(rng, i) if case == "mixed" else f"{i:06d}.dat"
+        path = os.path.join(folder_path, name)
+        with open(path, "xb") as file:
+            # Sparse, so sizes vary without writing data.
+            file.truncate(rng.randrange(4096))
+        mtime = base_mtime + rng.randrange(100_000_000)
+        os.utime(path, (mtime, mtime))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def keystroke_rules():
+    """
+    Yield the rules of each keystroke, typing the replace text then the template.
+    """
+    for length in range(1, len(REPLACE_TEXT) + 1):
+        yield RenameRules(replace_text=REPLACE_TEXT[:length], new_text="photo_")
+    for length in range(1, len(TEMPLATE_TEXT) + 1):
+        yield RenameRules(replace_text=REPLACE_TEXT, new_text="photo_", template=TEMPLATE_TEXT[:length])
+
+
+def peak_memory_mb():
+    """
+    Get the peak resident memory of this process in megabytes, or 0 where the resource module is not available.
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def measure_headless(folder_path, case):
+    """
+    Load, index, sort, preview, plan and rename a folder through the renamer package.
+
+    Returns:
+        dict: Seconds per phase, preview latency in milliseconds and peak memory in megabytes.
+    """
+    results = {}
+    model = FileModel()
+    start = time.perf_counter()
+    for batch in scan_folder(folder_path):
+        model.extend(batch)
+    results["load_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    NameIndex(model).catch_up()
+    results["index_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.sort_by([("name", False)])
+    results["first_sort_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    model.sort_by([("date", True)])
+    model.sort_by([("name", False)])
+    results["resort_s"] = (time.perf_counter() - start) / 2
+
+    order = model.order
+    engine = PreviewEngine(model, sequence=lambda: order)
+    latencies = []
+    for rules in keystroke_rules():
+        start = time.perf_counter()
+        try:
+            engine.set_rules(rules)
+        except RenameError:
+            engine.set_rules(RenameRules())
+        for index in order[:VISIBLE_ROWS]:
+            engine.preview(index)
+        latencies.append((time.perf_counter() - start) * 1000)
+    results["preview_p50_ms"] = percentile(latencies, 0.5)
+    results["preview_p99_ms"] = percentile(latencies, 0.99)
+
+    file_names = [model.names[index] for index in order]
+    start = time.perf_counter()
+    plan = plan_renames(folder_path, file_names, RenameRules(template=RENAME_TEMPLATES[case]))
+    results["plan_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    apply_plan(plan, journal=RenameJournal())
+    results["rename_s"] = time.perf_counter() - start
+    results["peak_rss_mb"] = peak_memory_mb()
+    return results
+
+
+def measure_tk(folder_path, case):
+    """
+    Load, sort and preview a folder through the Tk application, waiting for Tk to draw after each step.
+
+    Renaming is left out: the application reports it in a dialog, which would wait for a click.
+
+    Returns:
+        dict: Seconds per phase, preview latency in milliseconds and peak memory in megabytes.
+    """
+    import ttkbootstrap as ttk
+    from BatchRenamer import BatchFileRenamer
+
+    root = ttk.Window(themename="superhero")
+    root.geometry("1000x700")
+    app = BatchFileRenamer(root)
+    root.update()
+
+    results = {}
+    start = time.perf_counter()
+    app.load_file_list(folder_path)
+    while app.folder_scan is not None:
+        root.update()
+    results["load_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app.on_column_click("Name")
+    root.update()
+    results["first_sort_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    app.on_column_click("Name")
+    root.update()
+    results["resort_s"] = time.perf_counter() - start
+
+    app.select_all()
+    root.update()
+    latencies = []
+    for rules in keystroke_rules():
+        app.replace_entry.delete(0, "end")
+        app.replace_entry.insert(0, rules.replace_text)
+        app.new_entry.delete(0, "end")
+        app.new_entry.insert(0, rules.new_text)
+        app.template_entry.delete(0, "end")
+        app.template_entry.insert(0, rules.template)
+        start = time.perf_counter()
+        app.refresh_preview()
+        root.update()
+        latencies.append((time.perf_counter() - start) * 1000)
+    results["preview_p50_ms"] = percentile(latencies, 0.5)
+    results["preview_p99_ms"] = percentile(latencies, 0.99)
+    results["peak_rss_mb"] = peak_memory_mb()
+    root.destroy()
+    return results
+
+
+def tk_available():
+    """
+    Check that the Tk measurements can run: ttkbootstrap is installed and there is a display.
+    """
+    try:
+        import ttkbootstrap  # noqa: F401
+    except ImportError:
+        return False
+    return not sys.platform.startswith("linux") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def run_child(mode, folder_path, case, state_path):
+    """
+    Measure one folder in a subprocess, with its own state folder so the rename journal starts empty.
+    """
+    environment = dict(os.environ, BATCH_RENAMER_HOME=state_path)
+    output = subprocess.run([sys.executable, __file__, "--child", mode, folder_path, case], capture_output=True,
+                            text=True, check=True, env=environment).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(key, value, baseline, tolerance):
+    """
+    Check a measurement against its baseline.
+
+    Returns:
+        tuple: The change as text, and whether it is a regression.
+    """
+    if key not in baseline:
+        return "new", False
+    previous = baseline[key]
+    unit = key.rsplit("_", 1)[1]
+    change = f"{(value - previous) / previous:+.0%}" if previous else "n/a"
+    return change, value > previous * (1 + tolerance) and value - previous > NOISE[unit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--no-tk", action="store_true", help="skip the measurements through the Tk application")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction a measurement may exceed its baseline by (default 0.25)")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "FOLDER", "CASE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, folder_path, case = args.child
+        measure = measure_tk if mode == "tk" else measure_headless
+        print(json.dumps(measure(folder_path, case)))
+        return 0
+
+    modes = ["headless"]
+    if args.no_tk:
+        pass
+    elif tk_available():
+        # First, as the headless run renames the files.
+        modes.insert(0, "tk")
+    else:
+        print("Skipping the Tk measurements: ttkbootstrap or a display is missing (try xvfb-run).")
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    results = {}
+    regressions = []
+    print(f"{'measurement':<40} {'value':>10} {'per second':>12} {'baseline':>10} {'change':>8}")
+    for size in args.sizes:
+        for case in args.cases:
+            with tempfile.TemporaryDirectory(prefix="batch-renamer-bench-") as temp_path:
+                folder_path = os.path.join(temp_path, "files")
+                os.mkdir(folder_path)
+                start = time.perf_counter()
+                generate_folder(folder_path, case, size)
+                print(f"{case} folder of {size} files generated in {time.perf_counter() - start:.1f} s")
+                for mode in modes:
+                    state_path = os.path.join(temp_path, f"state-{mode}")
+                    for metric, value in run_child(mode, folder_path, case, state_path).items():
+                        key = f"{case}/{size}/{mode}/{metric}"
+                        results[key] = value
+                        throughput = f"{size / value:,.0f}" if metric.endswith("_s") and value else ""
+                        change, regressed = compare(key, value, baseline, args.tolerance)
+                        if regressed:
+                            regressions.append(key)
+                        print(f"{key:<40} {value:>10.3f} {throughput:>12} {baseline.get(key, float('nan')):>10.3f} "
+                              f"{change:>8}{'  REGRESSION' if regressed else ''}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"No regression beyond {args.tolerance:.0%} of the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Measure how many names per second a compiled name template produces, against a target of 1M names per second.
+
+The template is compiled once, then evaluated for a whole batch with the files' modification times and sizes, the
+same way plan_renames calls it, and one file at a time, the way the preview calls it. Modification times are spread
+over a year, so the date field mostly hits its cache of formatted 15-minute slots. Exits with status 1 if the batch
+evaluation of the main template falls short of the target.
+
+Usage:
+    python benchmarks/bench_template.py [--files 1000000] [--target 1000000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renamer import RenameRules  # noqa: E402
+
+TEMPLATES = (
+    "{date:%Y%m%d}_{counter:05}_{stem}{ext}",
+    "{counter(100, 10):06}-{stem[0:8]|lower}{ext|lower}",
+    "{date:%Y-%m-%d %H.%M.%S} {size:,}b {name}",
+)
+
+
+def make_files(count):
+    random.seed(0)
+    start = time.time() - 365 * 86400
+    stems = [f"IMG_{i:07d}" for i in range(count)]
+    exts = [".JPG"] * count
+    mtimes = [start + random.random() * 365 * 86400 for i in range(count)]
+    sizes = [random.randrange(1 << 24) for i in range(count)]
+    return stems, exts, mtimes, sizes
+
+
+def batch_names_per_second(template, files, repeat):
+    transform_batch = RenameRules(template=template).compile_batch()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        transform_batch(*files)
+        best = min(best, time.perf_counter() - start)
+    return len(files[0]) / best
+
+
+def single_names_per_second(template, files, repeat):
+    transform = RenameRules(template=template).compile()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for number, (stem, ext, mtime, size) in enumerate(zip(*files)):
+            transform(stem, ext, number, mtime, size)
+        best = min(best, time.perf_counter() - start)
+    return len(files[0]) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--target", type=float, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per template; the best one counts")
+    args = parser.parse_args()
+
+    files = make_files(args.files)
+    results = []
+    print(f"{'template':<50} {'batch':>12} {'per file':>12}")
+    for template in TEMPLATES:
+        batch_rate = batch_names_per_second(template, files, args.repeat)
+        single_rate = single_names_per_second(template, files, args.repeat)
+        results.append(batch_rate)
+        print(f"{template:<50} {batch_rate / 1e6:8.2f}M/s {single_rate / 1e6:8.2f}M/s")
+    print(f"Target: {args.target / 1e6:.2f}M names/s in batch for {TEMPLATES[0]}")
+    return 0 if results[0] >= args.target else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+import tkinter as tk
+import ttkbootstrap as ttk
+
+from renamer import Selection, tracer
+
+DEFAULT_ROW_HEIGHT = 20
+WHEEL_SCROLL_ROWS = 3
+
+
+class VirtualFileList:
+    """
+    A Treeview showing a FileModel that only holds items for the rows currently in view.
+
+    The Treeview keeps a pool of items, one per visible row. Scrolling changes which files the pool items display
+    instead of adding or moving items, so the widget costs the same for ten files or a million. Selection lives in
+    this class as ranges of file indices rather than in the Treeview, and only the selected rows in view are pushed
+    to the Treeview, in one call.
+
+    Attributes:
+        model (FileModel): The files to display.
+        row_values (callable): Returns the tuple of column values for a file index.
+        on_select (callable): Called with the (added, removed) Selections when the selection changes, before the rows
+            are redrawn.
+        on_heading_click (callable): Called with the column name, and whether shift was held, when a column heading
+            is clicked.
+        frame (ttk.Frame): Frame holding the Treeview and its scrollbar.
+        treeview (ttk.Treeview): The Treeview displaying the visible rows.
+        scrollbar (ttk.Scrollbar): Scrollbar driven by the model length instead of the Treeview items.
+        selection (Selection): Indices of the selected files.
+        anchor (int): Display position shift-click and drag select from.
+        drag_position (int): Display position the current drag has reached, so each motion event only selects the
+            rows between it and the pointer.
+        top (int): Display position of the first visible row.
+        visible_rows (int): Number of rows that fit in the Treeview.
+        pool (list): The Treeview items, one per visible row.
+        rendered (dict): The values last pushed to each pool item, so unchanged cells are not set again.
+    """
+
+    def __init__(self, master, model, columns, row_values, on_select=None, on_heading_click=None):
+        """
+        Initialize the VirtualFileList class.
+
+        Args:
+            master (tk.Widget): The parent widget.
+            model (FileModel): The files to display.
+            columns (tuple): The column names.
+            row_values (callable): Returns the tuple of column values for a file index.
+            on_select (callable, optional): Called when the selection changes.
+            on_heading_click (callable, optional): Called when a column heading is clicked.
+        """
+        self.model = model
+        self.columns = columns
+        self.row_values = row_values
+        self.on_select = on_select
+        self.on_heading_click = on_heading_click
+        self.selection = Selection()
+        self.anchor = None
+        self.drag_position = None
+        self.top = 0
+        self.visible_rows = 1
+        self.pool = []
+        self.rendered = {}
+        self.rendered_selection = []
+        self.row_height = None
+        self.heading_height = None
+
+        self.frame = ttk.Frame(master)
+        self.treeview = ttk.Treeview(self.frame, columns=columns, show="headings", selectmode="none")
+        self.treeview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.yview, bootstyle="round")
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.treeview.bind("<Configure>", self.on_configure)
+        self.treeview.bind("<ButtonPress-1>", self.on_mouse_press)
+        self.treeview.bind("<Control-Button-1>", self.on_mouse_press)
+        self.treeview.bind("<Shift-Button-1>", self.on_mouse_press)
+        self.treeview.bind("<B1-Motion>", self.on_mouse_drag)
+        self.treeview.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.treeview.bind("<Button-4>", self.on_mouse_wheel)
+        self.treeview.bind("<Button-5>", self.on_mouse_wheel)
+        self.treeview.bind("<Up>", lambda event: self.on_arrow_key(event, -1))
+        self.treeview.bind("<Down>", lambda event: self.on_arrow_key(event, 1))
+        self.treeview.bind("<Prior>", lambda event: self.on_arrow_key(event, -self.visible_rows))
+        self.treeview.bind("<Next>", lambda event: self.on_arrow_key(event, self.visible_rows))
+        self.treeview.bind("<Control-a>", lambda event: self.select_all())
+
+    def __len__(self):
+        return len(self.model)
+
+    def refresh(self):
+        """
+        Redraw after the model changed length or order.
+        """
+        self.top = max(0, min(self.top, len(self.model) - self.visible_rows))
+        self.render()
+
+    def render(self):
+        """
+        Fill the pool items with the files currently in view, only pushing the cells that changed to Tk.
+        """
+        mark = tracer.start()
+        count = max(0, min(self.visible_rows, len(self.model) - self.top))
+        self.resize_pool(count)
+
+        order = self.model.order
+        rendered = self.rendered
+        selected_items = []
+        for offset, item in enumerate(self.pool):
+            index = order[self.top + offset]
+            values = self.row_values(index)
+            previous = rendered.get(item)
+            if values != previous:
+                changed = [column for column, value, old in zip(self.columns, values, previous or ())
+                           if value != old]
+                if previous is not None and len(changed) == 1:
+                    self.treeview.set(item, changed[0], values[self.columns.index(changed[0])])
+                else:
+                    self.treeview.item(item, values=values)
+                rendered[item] = values
+            if index in self.selection:
+                selected_items.append(item)
+        if selected_items != self.rendered_selection:
+            self.treeview.selection_set(selected_items)
+            self.rendered_selection = selected_items
+        self.update_scrollbar()
+        tracer.stop("render", mark, count)
+
+    def resize_pool(self, count):
+        """
+        Add or remove pool items so there is exactly one per visible row.
+
+        Args:
+            count (int): Number of rows to display.
+        """
+        while len(self.pool) < count:
+            self.pool.append(self.treeview.insert("", tk.END, values=()))
+        if len(self.pool) > count:
+            self.treeview.delete(*self.pool[count:])
+            for item in self.pool[count:]:
+                self.rendered.pop(item, None)
+            del self.pool[count:]
+            self.rendered_selection = [item for item in self.rendered_selection if item in self.rendered]
+
+    def visible_indices(self):
+        """
+        Get the files currently in view.
+
+        Returns:
+            list: File indices, top to bottom.
+        """
+        return self.model.order[self.top:self.top + len(self.pool)]
+
+    def update_scrollbar(self):
+        total = len(self.model)
+        if total <= self.visible_rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.top / total, (self.top + self.visible_rows) / total)
+
+    def fit_rows(self):
+        """
+        Work out how many rows fit in the Treeview at its current size.
+
+        Returns:
+            int: The number of visible rows.
+        """
+        if self.row_height is None and self.pool:
+            bbox = self.treeview.bbox(self.pool[0])
+            if bbox:
+                self.heading_height = bbox[1]
+                self.row_height = bbox[3]
+        row_height = self.row_height or DEFAULT_ROW_HEIGHT
+        heading_height = self.heading_height if self.heading_height is not None else row_height
+        return max(1, (self.treeview.winfo_height() - heading_height) // row_height)
+
+    def on_configure(self, event=None):
+        visible_rows = self.fit_rows()
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.refresh()
+            # The first render is what lets fit_rows measure the real row height.
+            if self.fit_rows() != self.visible_rows:
+                self.on_configure()
+
+    def scroll_to(self, top):
+        """
+        Scroll so the given display position is the first visible row.
+
+        Args:
+            top (int): The display position.
+        """
+        top = max(0, min(top, len(self.model) - self.visible_rows))
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    def see(self, position):
+        """
+        Scroll as little as possible to bring a display position into view.
+
+        Args:
+            position (int): The display position.
+        """
+        if position < self.top:
+            self.scroll_to(position)
+        elif position >= self.top + self.visible_rows:
+            self.scroll_to(position - self.visible_rows + 1)
+
+    def yview(self, *args):
+        """
+        Scrollbar command, following the Tk yview protocol.
+        """
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.model)))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows
+            self.scroll_to(self.top + amount)
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.top - WHEEL_SCROLL_ROWS)
+        else:
+            self.scroll_to(self.top + WHEEL_SCROLL_ROWS)
+        return "break"
+
+    def position_at(self, y):
+        """
+        Get the display position of the row at a y coordinate.
+
+        Args:
+            y (int): The y coordinate, relative to the Treeview.
+
+        Returns:
+            int: The display position, or None if there is no row there.
+        """
+        item = self.treeview.identify_row(y)
+        if not item:
+            return None
+        return self.top + self.pool.index(item)
+
+    def on_mouse_press(self, event):
+        """
+        Handle mouse press events to select or deselect files, or to sort when a heading is pressed.
+
+        Args:
+            event (tk.Event): The mouse press event.
+        """
+        ctrl_pressed = (event.state & 0x4) != 0
+        shift_pressed = (event.state & 0x1) != 0
+
+        region = self.treeview.identify_region(event.x, event.y)
+        if region == "heading" and self.on_heading_click is not None:
+            column = self.treeview.identify_column(event.x)
+            self.on_heading_click(self.columns[int(column[1:]) - 1], shift_pressed)
+        if region in ("heading", "separator"):
+            return None
+
+        self.treeview.focus_set()
+        position = self.position_at(event.y)
+        if position is None:
+            self.selection.clear()
+        else:
+            index = self.model.index_at(position)
+            if ctrl_pressed:
+                self.selection.toggle(index)
+                self.anchor = position
+            elif shift_pressed and self.anchor is not None:
+                self.selection.replace(self.runs_between(self.anchor, position))
+            else:
+                self.selection.replace([(index, index + 1)])
+                self.anchor = position
+        self.drag_position = self.anchor
+        self.selection_changed()
+        return "break"
+
+    def on_mouse_drag(self, event):
+        """
+        Extend the selection to the row under the pointer, scrolling when dragging past the top or bottom edge.
+
+        Args:
+            event (tk.Event): The mouse motion event.
+        """
+        if self.anchor is None or not self.pool:
+            return "break"
+        if event.y < (self.heading_height or 0):
+            self.scroll_to(self.top - 1)
+            position = self.top
+        elif event.y >= self.treeview.winfo_height():
+            self.scroll_to(self.top + 1)
+            position = self.top + len(self.pool) - 1
+        else:
+            position = self.position_at(event.y)
+            if position is None:
+                return "break"
+        previous = self.drag_position if self.drag_position is not None else self.anchor
+        for start, stop in self.runs_between(previous, position):
+            self.selection.add_range(start, stop)
+        self.drag_position = position
+        self.selection_changed()
+        return "break"
+
+    def on_arrow_key(self, event, step):
+        """
+        Move the selection up or down, extending it when shift is held.
+
+        Args:
+            event (tk.Event): The key event.
+            step (int): Number of rows to move by.
+        """
+        if not len(self.model):
+            return "break"
+        start = self.anchor if self.anchor is not None else self.top
+        position = max(0, min(start + step, len(self.model) - 1))
+        if (event.state & 0x1) != 0 and self.anchor is not None:
+            self.selection.replace(self.runs_between(self.anchor, position))
+        else:
+            index = self.model.index_at(position)
+            self.selection.replace([(index, index + 1)])
+            self.anchor = position
+        self.see(position)
+        self.selection_changed()
+        return "break"
+
+    def runs_between(self, start, end):
+        """
+        Get the files displayed between two positions, both included.
+
+        Returns:
+            list: (start, stop) ranges of file indices.
+        """
+        if start > end:
+            start, end = end, start
+        return self.model.index_runs(start, end + 1)
+
+    def selection_changed(self):
+        """
+        Tell the owner what the last change added to and removed from the selection, then redraw the rows in view.
+        Does nothing if the selection did not actually change.
+        """
+        added, removed = self.selection.take_changes()
+        if not added and not removed:
+            return
+        # Called first, so the rows rendered below already reflect what the callback updates.
+        if self.on_select is not None:
+            self.on_select(added, removed)
+        self.render()
+
+    def select_all(self):
+        """
+        Select every file displayed. In scan order, this is a single range however many files are loaded.
+        """
+        self.selection.replace(self.model.index_runs(0, len(self.model)))
+        self.selection_changed()
+        return "break"
+
+    def clear_selection(self):
+        """
+        Deselect every file.
+        """
+        self.selection.clear()
+        self.anchor = None
+        self.selection_changed()
+
+    def set_selection(self, indices):
+        """
+        Replace the selection.
+
+        Args:
+            indices (iterable): Indices of the files to select, or a Selection.
+        """
+        if not isinstance(indices, Selection):
+            indices = Selection(indices, track_changes=False)
+        self.selection.replace(indices.ranges())
+        self.selection_changed()
+
+    def add_to_selection(self, selection):
+        """
+        Select the files of another selection as well, such as a saved one.
+
+        Args:
+            selection (Selection): The files to select.
+        """
+        self.selection.update(selection)
+        self.selection_changed()
+
+    def clear(self):
+        """
+        Forget the selection and scroll position, for when the model is emptied.
+        """
+        self.selection = Selection()
+        self.anchor = None
+        self.drag_position = None
+        self.top = 0
+        self.render()
@@ -0,0 +1,65 @@
+"""
+Headless rename engine used by both the Batch Renamer GUI and the batch-renamer command line.
+
+Nothing in this package imports tkinter, so it can run in scripts and pipelines without a display.
+"""
+from renamer.backend import FolderRenamer
+from renamer.errors import RenameCancelledError, RenameConflictError, RenameError
+from renamer.executor import RenameTask, apply_plan
+from renamer.hashing import DuplicateSearch, digest_files, find_duplicates, hash_file
+from renamer.jobs import FolderJob, JobQueue
+from renamer.journal import JournalEntry, RenameJournal
+from renamer.metadata import FolderMetadata, MetadataCache, MetadataReader, extract_metadata, open_reader
+from renamer.model import FileModel
+from renamer.planner import RenamePlan, list_files, plan_mapping, plan_renames
+from renamer.preview import PreviewEngine
+from renamer.recipe import Recipe
+from renamer.rules import CASE_CONVERSIONS, RenameRules, check_invalid_characters
+from renamer.scanner import FolderScan, PathFilter, ScannedFile, scan_folder, split_patterns, walk_folder
+from renamer.search import NameIndex
+from renamer.selection import Selection
+from renamer.template import NameTemplate
+from renamer.trace import Tracer, tracer
+
+__all__ = [
+    "CASE_CONVERSIONS",
+    "DuplicateSearch",
+    "FileModel",
+    "FolderJob",
+    "FolderMetadata",
+    "FolderRenamer",
+    "FolderScan",
+    "JobQueue",
+    "JournalEntry",
+    "MetadataCache",
+    "MetadataReader",
+    "NameIndex",
+    "NameTemplate",
+    "PathFilter",
+    "PreviewEngine",
+    "Recipe",
+    "RenameCancelledError",
+    "RenameConflictError",
+    "RenameError",
+    "RenameJournal",
+    "RenamePlan",
+    "RenameRules",
+    "RenameTask",
+    "ScannedFile",
+    "Selection",
+    "Tracer",
+    "apply_plan",
+    "check_invalid_characters",
+    "digest_files",
+    "extract_metadata",
+    "find_duplicates",
+    "hash_file",
+    "list_files",
+    "open_reader",
+    "plan_mapping",
+    "plan_renames",
+    "scan_folder",
+    "split_patterns",
+    "tracer",
+    "walk_folder",
+]
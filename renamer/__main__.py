@@ -0,0 +1,5 @@
+import sys
+
+from renamer.cli import main
+
+sys.exit(main())
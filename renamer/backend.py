@@ -0,0 +1,200 @@
+"""
+Renames that never overwrite a file, made relative to a directory file descriptor held open for a whole batch.
+
+On Linux, renameat2 with RENAME_NOREPLACE makes the kernel refuse a rename onto an existing name atomically, so a
+file created by another program after the batch was planned is never clobbered, and RENAME_EXCHANGE swaps two
+names in one step. Where renameat2 or its flags are not available, a hard link followed by an unlink gives the same
+guarantee, and as a last resort the new name is checked just before a plain rename.
+"""
+import ctypes
+import errno
+import os
+import sys
+
+RENAME_NOREPLACE = 1
+RENAME_EXCHANGE = 2
+# Errors meaning renameat2 or its flags, or hard links, are not supported here, rather than that this rename failed.
+RENAMEAT2_UNSUPPORTED = {errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP}
+LINK_UNSUPPORTED = {errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EMLINK}
+# Paths are resolved against the open folder where os supports it, instead of from the root for every call.
+DIR_FD_SUPPORTED = {os.rename, os.link, os.unlink, os.stat} <= os.supports_dir_fd
+
+
+def load_renameat2():
+    """
+    Look renameat2 up in the C library.
+
+    Returns:
+        The ctypes function, or None if it is not available (not Linux, or a C library older than glibc 2.28).
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        function = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return None
+    function.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint)
+    function.restype = ctypes.c_int
+    return function
+
+
+_renameat2 = load_renameat2()
+
+
+class FolderRenamer:
+    """
+    Rename files inside one folder without ever overwriting a file. Safe to use from several threads at once.
+
+    Attributes:
+        folder_path (str): The folder. Names passed to the methods are relative to it.
+        method (str): How renames are made: "renameat2", "link" (a hard link then an unlink) or "rename" (a plain
+            rename after checking the new name is free, which leaves a short window for another program). It falls
+            back to the next one the first time the file system refuses the current one.
+        can_exchange (bool): Whether two names can be swapped in one step.
+    """
+
+    def __init__(self, folder_path):
+        """
+        Open the folder.
+
+        Args:
+            folder_path (str): The folder.
+
+        Raises:
+            OSError: If the folder cannot be opened.
+        """
+        self.folder_path = folder_path
+        self.dir_fd = None
+        if DIR_FD_SUPPORTED:
+            self.dir_fd = os.open(folder_path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        if _renameat2 is not None and self.dir_fd is not None:
+            self.method = "renameat2"
+        elif os.name == "nt":
+            # os.rename already refuses to replace an existing file on Windows.
+            self.method = "rename"
+        else:
+            self.method = "link"
+        self.can_exchange = self.method == "renameat2"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        if self.dir_fd is not None:
+            os.close(self.dir_fd)
+            self.dir_fd = None
+
+    def _path(self, name):
+        return name if self.dir_fd is not None else os.path.join(self.folder_path, name)
+
+    def _renameat2(self, from_name, to_name, flags):
+        if _renameat2(self.dir_fd, os.fsencode(from_name), self.dir_fd, os.fsencode(to_name), flags) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), from_name, None, to_name)
+
+    def rename(self, from_name, to_name):
+        """
+        Rename a file, unless something already has the new name.
+
+        Args:
+            from_name (str): The current name.
+            to_name (str): The new name.
+
+        Raises:
+            FileExistsError: If the new name is taken.
+            OSError: If the rename fails for another reason.
+        """
+        try:
+            if self.method == "renameat2":
+                try:
+                    self._renameat2(from_name, to_name, RENAME_NOREPLACE)
+                    return
+                except OSError as e:
+                    if e.errno not in RENAMEAT2_UNSUPPORTED:
+                        raise
+                    self.method = "link"
+            if self.method == "link":
+                try:
+                    self._link_rename(from_name, to_name)
+                    return
+                except OSError as e:
+                    if e.errno not in LINK_UNSUPPORTED:
+                        raise
+                    self.method = "rename"
+            if os.name != "nt" and self._exists(to_name):
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), from_name, None, to_name)
+            self._plain_rename(from_name, to_name)
+        except FileExistsError:
+            # A name that only changes case is "taken" by the file itself on a case-insensitive file system.
+            if from_name.casefold() != to_name.casefold() or not self._same_file(from_name, to_name):
+                raise
+            self._plain_rename(from_name, to_name)
+
+    def exchange(self, first_name, second_name):
+        """
+        Swap the names of two files in one step.
+
+        Args:
+            first_name (str): The name of one file.
+            second_name (str): The name of the other.
+
+        Returns:
+            bool: True if they were swapped, False if that is not supported here and nothing was done.
+
+        Raises:
+            OSError: If the swap fails for another reason.
+        """
+        if not self.can_exchange:
+            return False
+        try:
+            self._renameat2(first_name, second_name, RENAME_EXCHANGE)
+        except OSError as e:
+            if e.errno not in RENAMEAT2_UNSUPPORTED:
+                raise
+            self.can_exchange = False
+            return False
+        return True
+
+    def identity(self, name):
+        """
+        Identify the file that has a name, to recognise it under another name later.
+
+        Args:
+            name (str): The name.
+
+        Returns:
+            tuple: (st_dev, st_ino) of the file, or None if it cannot be read.
+        """
+        try:
+            stat_result = os.stat(self._path(name), dir_fd=self.dir_fd, follow_symlinks=False)
+        except OSError:
+            return None
+        return stat_result.st_dev, stat_result.st_ino
+
+    def _link_rename(self, from_name, to_name):
+        dir_fd = self.dir_fd
+        os.link(self._path(from_name), self._path(to_name), src_dir_fd=dir_fd, dst_dir_fd=dir_fd,
+                follow_symlinks=False)
+        try:
+            os.unlink(self._path(from_name), dir_fd=dir_fd)
+        except OSError:
+            os.unlink(self._path(to_name), dir_fd=dir_fd)
+            raise
+
+    def _plain_rename(self, from_name, to_name):
+        os.rename(self._path(from_name), self._path(to_name), src_dir_fd=self.dir_fd, dst_dir_fd=self.dir_fd)
+
+    def _exists(self, name):
+        try:
+            os.stat(self._path(name), dir_fd=self.dir_fd, follow_symlinks=False)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _same_file(self, first_name, second_name):
+        first = self.identity(first_name)
+        return first is not None and first == self.identity(second_name)
@@ -0,0 +1,370 @@
+"""
+Command line interface for the rename engine.
+
+Example:
+    batch-renamer ~/Photos --replace IMG_ --with holiday_ --case lowercase --dry-run
+    batch-renamer ~/Photos --regex --replace "IMG_(\\d+)" --with "photo-\\1" --match "*.jpg"
+    batch-renamer ~/Photos --template "{date:%Y%m%d}_{counter:04}_{stem|lower}{ext}"
+    batch-renamer ~/Music --template "{artist} - {track:02} {title}{ext}"
+    batch-renamer ~/Downloads --template "{hash[:16]}{ext|lower}"
+    batch-renamer ~/Downloads --recursive --duplicates
+    batch-renamer ~/Archive --recursive --include "*.jpg" --exclude ".git" --prefix 2024_
+    batch-renamer ~/Photos --template "{counter:05}{ext}" --trace rename-trace.json
+    batch-renamer --case lowercase --prefix scan_ --save-recipe scans.json
+    batch-renamer --recipe scans.json --jobs 8 /srv/scans/*/
+"""
+import argparse
+import cProfile
+import os
+import sys
+import time
+
+from renamer.errors import RenameError
+from renamer.journal import DEFAULT_GROUP_SIZE, RenameJournal
+from renamer.executor import apply_plan
+from renamer.hashing import find_duplicates
+from renamer.jobs import DEFAULT_JOB_WORKERS, JobQueue
+from renamer.metadata import file_key, open_reader
+from renamer.planner import list_files, plan_renames
+from renamer.recipe import Recipe
+from renamer.rules import CASE_CONVERSIONS, RenameRules
+from renamer.scanner import PathFilter
+from renamer.trace import tracer
+
+# How often the combined progress of several folders is printed.
+JOB_POLL_INTERVAL_SECONDS = 0.2
+
+
+def build_parser():
+    """
+    Build the argument parser for the batch-renamer command.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(prog="batch-renamer", description="Rename the files in a folder in bulk.")
+    parser.add_argument("folders", nargs="*", metavar="folder",
+                        help="folder containing the files to rename; several folders are renamed as parallel jobs")
+    parser.add_argument("--replace", default="", metavar="TEXT", help="text to replace in the file names")
+    parser.add_argument("--with", dest="new_text", default="", metavar="TEXT", help="replacement text")
+    parser.add_argument("-E", "--regex", action="store_true",
+                        help="treat --replace as a regular expression; --with may refer to groups as \\1 or \\g<name>")
+    parser.add_argument("-i", "--ignore-case", action="store_true", help="match --replace regardless of case")
+    parser.add_argument("--match", default="", metavar="GLOB",
+                        help="only rename files whose name matches one of these ;-separated patterns")
+    parser.add_argument("--case", default="none", choices=list(CASE_CONVERSIONS), help="case conversion")
+    parser.add_argument("--prefix", default="", help="text to add before the name")
+    parser.add_argument("--suffix", default="", help="text to add after the name, before the extension")
+    parser.add_argument("-t", "--template", default="",
+                        help="build the whole new name from a template, such as "
+                             "{date:%%Y%%m%%d}_{counter:05}_{stem}{ext}; see renamer/template.py for the fields")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="also rename the files in every subfolder; files are never moved between folders")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="only rename files whose name matches this pattern (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="skip files and subfolders whose name or relative path matches this pattern "
+                             "(repeatable)")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="print the plan without renaming anything")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors and the summary")
+    parser.add_argument("-j", "--workers", type=int, default=1, metavar="N",
+                        help="number of renames in flight at once; more than 1 helps on network shares")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="list the files with identical content instead of renaming anything")
+    parser.add_argument("--undo", action="store_true",
+                        help="undo the last rename batch instead of renaming; with a folder, the last batch in it")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="do not record the batch in the journal (disables crash recovery and undo)")
+    parser.add_argument("--journal-group", type=int, default=DEFAULT_GROUP_SIZE, metavar="N",
+                        help=f"number of journal records synced to disk together (default {DEFAULT_GROUP_SIZE})")
+    parser.add_argument("--recipe", metavar="FILE",
+                        help="apply the rules and scan options saved in a recipe file, instead of the options above")
+    parser.add_argument("--save-recipe", metavar="FILE",
+                        help="save the rule and scan options given as a recipe file; nothing is renamed without a "
+                             "folder")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOB_WORKERS, metavar="N",
+                        help=f"number of folders renamed at once (default {DEFAULT_JOB_WORKERS})")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record the time spent scanning, planning and renaming, and save it as a Chrome trace "
+                             "(open it in chrome://tracing or https://ui.perfetto.dev)")
+    parser.add_argument("--profile", metavar="FILE", help="profile the run and save a cProfile dump, for pstats")
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the batch-renamer command.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The process exit code.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    args.folder = args.folders[0] if args.folders else None
+    if args.folder is None and not args.undo and not args.save_recipe:
+        parser.error("the folder argument is required")
+    if len(args.folders) > 1 and (args.duplicates or args.undo):
+        parser.error("--duplicates and --undo take a single folder")
+
+    if args.trace:
+        tracer.enable()
+    profile = cProfile.Profile() if args.profile else None
+    if profile is not None:
+        profile.enable()
+    try:
+        return run(args)
+    finally:
+        if profile is not None:
+            profile.disable()
+            save_diagnostic(profile.dump_stats, args.profile, "profile")
+        if args.trace:
+            save_diagnostic(tracer.export_chrome_trace, args.trace, "trace")
+
+
+def save_diagnostic(save, path, kind):
+    """
+    Save a trace or profile, reporting a failure without changing the exit code of the run.
+
+    Args:
+        save (callable): Writes the file, given its path.
+        path (str): The file to write.
+        kind (str): What is saved, for the error message.
+    """
+    try:
+        save(path)
+    except OSError as e:
+        print(f"batch-renamer: cannot save the {kind} to {path}: {e}", file=sys.stderr)
+
+
+def run(args):
+    """
+    Run the batch-renamer command once the command line has been checked.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        int: The process exit code.
+    """
+    if args.duplicates:
+        return list_duplicates(args)
+
+    try:
+        recipe = Recipe.load(args.recipe) if args.recipe else recipe_from_args(args)
+        if args.save_recipe:
+            recipe.save(args.save_recipe)
+            print(f"Recipe saved to {args.save_recipe}.")
+    except (RenameError, OSError) as e:
+        print(f"batch-renamer: {e}", file=sys.stderr)
+        return 1
+    if args.folder is None and not args.undo:
+        return 0
+
+    journal = None
+    if not args.no_journal:
+        try:
+            journal = RenameJournal(group_size=args.journal_group)
+            if args.dry_run:
+                # A dry run renames nothing, not even to recover a batch, so it only reports them.
+                for entry in journal.entries():
+                    if entry.state == "pending":
+                        print(f"batch-renamer: a rename of {len(entry.steps)} file(s) in {entry.folder_path} was "
+                              f"interrupted or is still running; it is recovered on the next run",
+                              file=sys.stderr)
+            else:
+                for entry, action, problems in journal.recover():
+                    print(f"batch-renamer: an interrupted rename of {len(entry.steps)} file(s) in "
+                          f"{entry.folder_path} was {action}"
+                          + (f"; {problems} file(s) could not be restored" if problems else ""), file=sys.stderr)
+        except OSError as e:
+            print(f"batch-renamer: cannot use the rename journal: {e}", file=sys.stderr)
+            return 1
+
+    if args.undo:
+        return undo_last_batch(journal, args)
+    if len(args.folders) > 1:
+        return run_jobs(recipe, journal, args)
+
+    try:
+        file_names = sorted(list_files(args.folder, recipe.recursive, recipe.path_filter()))
+        plan = plan_renames(args.folder, file_names, recipe.rules)
+    except (RenameError, OSError) as e:
+        print(f"batch-renamer: {e}", file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        for original_file_name, new_file_name in plan:
+            print(f"{original_file_name} -> {new_file_name}")
+
+    if args.dry_run:
+        print(f"{len(plan)} file(s) would be renamed.")
+        return 0
+
+    try:
+        applied = apply_plan(plan, journal, workers=args.workers)
+    except RenameError as e:
+        print(f"batch-renamer: {e}", file=sys.stderr)
+        return 1
+    print(f"{len(applied)} file(s) renamed.")
+    return 0
+
+
+def recipe_from_args(args):
+    """
+    Build a recipe from the rule and scan options of the command line.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        Recipe: The recipe.
+
+    Raises:
+        RenameError: If the rules are invalid.
+    """
+    rules = RenameRules(replace_text=args.replace, new_text=args.new_text, case_conversion=args.case,
+                        prefix=args.prefix, suffix=args.suffix, use_regex=args.regex, ignore_case=args.ignore_case,
+                        file_pattern=args.match, template=args.template)
+    rules.validate()
+    return Recipe(rules, args.recursive, args.include, args.exclude)
+
+
+def run_jobs(recipe, journal, args):
+    """
+    Apply a recipe to several folders at once, printing the result of each folder as it finishes, with the
+    combined progress on a terminal.
+
+    A folder whose plan has conflicts is reported and left untouched; the other folders are still renamed.
+
+    Args:
+        recipe (Recipe): The recipe to apply.
+        journal (RenameJournal): The journal, or None if it is disabled.
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        int: The process exit code: 1 if any folder had conflicts, failed or was cancelled.
+    """
+    queue = JobQueue(recipe, args.folders, journal, args.jobs, args.workers, args.dry_run)
+    queue.start()
+    show_progress = not args.quiet and sys.stderr.isatty()
+    reported = set()
+    progress_text = ""
+    while len(reported) < len(queue.jobs):
+        try:
+            time.sleep(JOB_POLL_INTERVAL_SECONDS)
+        except KeyboardInterrupt:
+            print("\nbatch-renamer: cancelling; renames in progress are rolled back...", file=sys.stderr)
+            queue.cancel()
+        if show_progress and progress_text:
+            print("\r" + " " * len(progress_text) + "\r", end="", file=sys.stderr)
+        # Jobs finish in any order; each is reported once, as soon as it has finished.
+        for position, job in enumerate(queue.jobs):
+            if job.finished and position not in reported:
+                reported.add(position)
+                report_job(job, args)
+        if show_progress:
+            finished_count, total_count, applied_steps, planned_steps = queue.progress()
+            progress_text = (f"{finished_count}/{total_count} folders, {applied_steps}/{planned_steps} files "
+                             f"{'planned' if args.dry_run else 'renamed'}")
+            print(progress_text, end="", file=sys.stderr, flush=True)
+    if show_progress:
+        print(file=sys.stderr)
+
+    counts = queue.counts()
+    renamed = sum(len(job.result) for job in queue.jobs if job.result)
+    planned = sum(len(job.plan) for job in queue.jobs if job.plan is not None)
+    summary = (f"{planned} file(s) would be renamed in {len(queue.jobs)} folder(s)" if args.dry_run
+               else f"{renamed} file(s) renamed in {counts.get('done', 0)} folder(s)")
+    problems = [f"{counts[state]} {label}" for state, label in (("conflict", "with conflicts"), ("failed", "failed"),
+                                                                  ("cancelled", "cancelled")) if counts.get(state)]
+    print(summary + (f"; folders {', '.join(problems)}." if problems else "."))
+    return 1 if problems else 0
+
+
+def report_job(job, args):
+    """
+    Print the outcome of one folder of a job queue.
+
+    Args:
+        job (FolderJob): The finished job.
+        args (argparse.Namespace): The parsed command line.
+    """
+    if job.state in ("done", "planned"):
+        if not args.quiet:
+            for original_file_name, new_file_name in job.plan:
+                print(f"{os.path.join(job.folder_path, original_file_name)} -> {new_file_name}")
+    elif job.state == "unchanged":
+        if not args.quiet:
+            print(f"{job.folder_path}: nothing to rename.")
+    else:
+        print(f"batch-renamer: {job.folder_path}: {job.error}", file=sys.stderr)
+        for original_file_name, new_file_name, reason in job.conflicts:
+            print(f"  {original_file_name} -> {new_file_name}: {reason}", file=sys.stderr)
+
+
+def list_duplicates(args):
+    """
+    Print the groups of files with identical content, largest files first, one blank line between groups.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        int: The process exit code.
+    """
+    reader = open_reader()
+    try:
+        file_names = sorted(list_files(args.folder, args.recursive, PathFilter(args.include, args.exclude)))
+        paths = [os.path.join(args.folder, file_name) for file_name in file_names]
+        keys = [file_key(path) for path in paths]
+        groups = find_duplicates(paths, keys, [size for device, inode, size, mtime_ns in keys], reader.cache)
+    except OSError as e:
+        print(f"batch-renamer: {e}", file=sys.stderr)
+        return 1
+    finally:
+        reader.close()
+
+    for group in groups:
+        if not args.quiet:
+            print("\n".join(file_names[position] for position in group), end="\n\n")
+    print(f"{sum(len(group) - 1 for group in groups)} duplicate file(s) in {len(groups)} group(s).")
+    return 0
+
+
+def undo_last_batch(journal, args):
+    """
+    Undo the most recent journaled batch, or the most recent one in the folder given.
+
+    Args:
+        journal (RenameJournal): The journal, or None if it is disabled.
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        int: The process exit code.
+    """
+    if journal is None:
+        print("batch-renamer: --undo needs the rename journal", file=sys.stderr)
+        return 1
+    try:
+        entry, plan = journal.plan_undo(args.folder)
+    except (RenameError, OSError) as e:
+        print(f"batch-renamer: {e}", file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        for new_file_name, original_file_name in plan:
+            print(f"{new_file_name} -> {original_file_name}")
+    if args.dry_run:
+        print(f"{len(plan)} file(s) in {entry.folder_path} would be restored.")
+        return 0
+
+    try:
+        apply_plan(plan, journal, undoes=entry.batch_id, workers=args.workers)
+    except RenameError as e:
+        print(f"batch-renamer: {e}", file=sys.stderr)
+        return 1
+    print(f"{len(plan)} file(s) in {entry.folder_path} restored.")
+    return 0
@@ -0,0 +1,29 @@
+class RenameError(Exception):
+    """
+    Raised when a rename cannot be planned or applied.
+
+    The message is meant to be shown to the user as-is, either in a message box or on the command line.
+    """
+
+
+class RenameCancelledError(RenameError):
+    """
+    Raised when the user cancels a batch while it is being applied. The files renamed so far have been restored.
+    """
+
+
+class RenameConflictError(RenameError):
+    """
+    Raised when a plan would give two files the same name or overwrite a file that is not being renamed.
+
+    Attributes:
+        conflicts (list): (original_file_name, new_file_name, reason) tuples, one per conflicting rename.
+    """
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        original_file_name, new_file_name, reason = conflicts[0]
+        message = reason
+        if len(conflicts) > 1:
+            message += f" {len(conflicts) - 1} more conflict{'s were' if len(conflicts) > 2 else ' was'} found."
+        super().__init__(message + " Nothing was renamed.")
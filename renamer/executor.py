@@ -0,0 +1,330 @@
+"""
+Apply rename plans to the disk, serially or on a bounded thread pool, with progress reporting and cancellation.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from renamer.backend import FolderRenamer
+from renamer.errors import RenameCancelledError, RenameConflictError, RenameError
+from renamer.trace import tracer
+
+# Number of steps applied between two progress reports or cancellation checks when there is no journal to set it.
+DEFAULT_GROUP_SIZE = 512
+CANCELLED = "cancelled"
+
+
+def group_chains(chains, group_size):
+    """
+    Split a plan's chains into groups of about group_size steps, never splitting a chain.
+
+    Args:
+        chains (list): Lists of (from_name, to_name) steps.
+        group_size (int): Target number of steps per group.
+
+    Yields:
+        list: Groups of chains.
+    """
+    group = []
+    group_steps = 0
+    for chain in chains:
+        group.append(chain)
+        group_steps += len(chain)
+        if group_steps >= group_size:
+            yield group
+            group = []
+            group_steps = 0
+    if group:
+        yield group
+
+
+def is_cycle(chain):
+    """
+    Tell whether a chain is a cycle broken through a temporary name: a -> tmp, c -> a, b -> c, tmp -> b.
+
+    Args:
+        chain (list): (from_name, to_name) steps.
+
+    Returns:
+        bool: True for a cycle.
+    """
+    return len(chain) > 1 and chain[0][1] == chain[-1][0]
+
+
+def is_swap(chain):
+    """
+    Tell whether a chain swaps the names of two files through a temporary name: a -> tmp, b -> a, tmp -> b.
+
+    Args:
+        chain (list): (from_name, to_name) steps.
+
+    Returns:
+        bool: True for a swap.
+    """
+    # The planner only makes cycles of the form above, so a cycle of three steps swaps two files.
+    return len(chain) == 3 and is_cycle(chain)
+
+
+def step_identities(renamer, chain):
+    """
+    Identify the file each step of a chain moves, for the journal. Only cycles need it: the same names exist on
+    disk before and after a cycle, so recovery has to recognise the files to tell whether it was applied.
+
+    Args:
+        renamer (FolderRenamer): Renames in the folder the files live in.
+        chain (list): (from_name, to_name) steps.
+
+    Returns:
+        list: (st_dev, st_ino) or None for each step.
+    """
+    if not is_cycle(chain):
+        return [None] * len(chain)
+    identities = [renamer.identity(from_name) for from_name, to_name in chain[:-1]]
+    # The last step moves the file the first step parked under the temporary name.
+    return identities + identities[:1]
+
+
+def run_chain(renamer, chain, applied_steps, cancel_event=None):
+    """
+    Apply the steps of one chain in order. A swap is made in one step where the file system supports it, and
+    recorded as its three steps, which leave the files the same way.
+
+    Args:
+        renamer (FolderRenamer): Renames in the folder the files live in.
+        chain (list): (from_name, to_name) steps.
+        applied_steps (list): Each applied step is appended to it.
+        cancel_event (threading.Event, optional): The chain is skipped if this is set before it starts.
+
+    Returns:
+        The failed step and its OSError as a tuple, CANCELLED if the chain was skipped, or None on success.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        return CANCELLED
+    if renamer.can_exchange and is_swap(chain):
+        first_name, second_name = chain[0][0], chain[1][0]
+        try:
+            if renamer.exchange(first_name, second_name):
+                applied_steps.extend(chain)
+                return None
+        except OSError as e:
+            return first_name, second_name, e
+    for from_name, to_name in chain:
+        try:
+            renamer.rename(from_name, to_name)
+        except OSError as e:
+            return from_name, to_name, e
+        applied_steps.append((from_name, to_name))
+    return None
+
+
+def apply_plan(plan, journal=None, undoes=None, workers=1, progress=None, cancel_event=None):
+    """
+    Rename the files on disk, following the plan's steps.
+
+    Steps are applied a group at a time. With a journal, each group is recorded before it is applied, so a crash can
+    be recovered from on the next start. With more than one worker, the independent chains of a group are applied
+    in parallel, which hides the round trip of each rename on network file systems; the steps inside a chain still
+    run in order. No step overwrites a file, so a name taken after the plan was made, or by a file the plan did not
+    know about, stops the batch. If a step fails or the batch is cancelled, the steps already applied are undone in
+    reverse order so the folder is left as it was.
+
+    Args:
+        plan (RenamePlan): The plan to apply.
+        journal (RenameJournal, optional): The journal to record the batch in.
+        undoes (str, optional): The journaled batch this plan undoes.
+        workers (int, optional): Number of renames allowed in flight at once.
+        progress (callable, optional): Called with (applied_steps, total_steps) after each group.
+        cancel_event (threading.Event, optional): Set it to stop the batch and roll it back.
+
+    Returns:
+        list: The (original_file_name, new_file_name) pairs that were renamed.
+
+    Raises:
+        RenameCancelledError: If the batch was cancelled.
+        RenameConflictError: If a new name was taken by a file outside the batch. The batch is rolled back.
+        RenameError: If a rename fails.
+    """
+    folder_path = plan.folder_path
+    try:
+        renamer = FolderRenamer(folder_path)
+    except OSError as e:
+        raise RenameError(f"Failed to open {folder_path}. Nothing was renamed. Error: {e}") from e
+    try:
+        return _apply_steps(plan, renamer, journal, undoes, workers, progress, cancel_event)
+    finally:
+        renamer.close()
+
+
+def _apply_steps(plan, renamer, journal, undoes, workers, progress, cancel_event):
+    total_steps = len(plan.steps)
+    try:
+        writer = journal.begin(plan, undoes) if journal is not None else None
+    except OSError as e:
+        raise RenameError(f"Failed to write the rename journal. Nothing was renamed. Error: {e}") from e
+    group_size = writer.group_size if writer is not None else DEFAULT_GROUP_SIZE
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rename") if workers > 1 else None
+
+    applied_steps = []
+    failure = None
+    mark = tracer.start()
+    try:
+        for group in group_chains(plan.chains, group_size):
+            if cancel_event is not None and cancel_event.is_set():
+                failure = CANCELLED
+                break
+            group_mark = tracer.start()
+            applied_before = len(applied_steps)
+            if writer is not None:
+                try:
+                    writer.log_steps([step for chain in group for step in chain],
+                                     [identity for chain in group for identity in step_identities(renamer, chain)])
+                except OSError as e:
+                    failure = e
+                    break
+            if pool is None:
+                for chain in group:
+                    failure = run_chain(renamer, chain, applied_steps, cancel_event)
+                    if failure is not None:
+                        break
+            else:
+                # Wait for the whole group, so nothing is still renaming if it has to be rolled back.
+                results = list(pool.map(lambda chain: run_chain(renamer, chain, applied_steps, cancel_event),
+                                        group))
+                failure = next((result for result in results if isinstance(result, tuple)), None)
+                if failure is None and cancel_event is not None and cancel_event.is_set():
+                    failure = CANCELLED
+            tracer.stop("rename group", group_mark, len(applied_steps) - applied_before)
+            if failure is not None:
+                break
+            if progress is not None:
+                progress(len(applied_steps), total_steps)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        tracer.stop("rename", mark, len(applied_steps))
+
+    if failure is None:
+        if writer is not None:
+            try:
+                writer.applied()
+                writer.commit()
+            except OSError as e:
+                writer.close()
+                raise RenameError(f"The files were renamed, but the rename journal could not record it, so the "
+                                  f"batch may not be undoable. Error: {e}") from e
+        return list(plan.renames)
+
+    if writer is not None:
+        try:
+            writer.failed()
+        except OSError:
+            # Without a failed or applied record the journal still rolls the batch back.
+            pass
+    rolled_back = rollback_steps(renamer, applied_steps)
+    if writer is not None:
+        if rolled_back:
+            try:
+                writer.abort()
+            except OSError:
+                writer.close()
+        else:
+            # Left pending, so the next start retries the rollback from the journal.
+            writer.close()
+    restored = ("The files renamed so far were restored." if rolled_back
+                else "Some files could not be restored to their original names.")
+    if failure == CANCELLED:
+        raise RenameCancelledError(f"Renaming was cancelled. {restored}")
+    if isinstance(failure, OSError):
+        raise RenameError(f"Failed to write the rename journal. {restored} Error: {failure}") from failure
+    from_name, to_name, error = failure
+    if isinstance(error, FileExistsError) and rolled_back:
+        raise RenameConflictError([(from_name, to_name, f"A file named '{to_name}' already exists.")]) from error
+    raise RenameError(f"Failed to rename {from_name} to {to_name}. Error: {error} {restored}") from error
+
+
+def rollback_steps(renamer, applied_steps):
+    """
+    Undo applied rename steps, most recent first.
+
+    Args:
+        renamer (FolderRenamer): Renames in the folder the files live in.
+        applied_steps (list): The (from_name, to_name) steps that were applied.
+
+    Returns:
+        bool: True if every step was undone.
+    """
+    restored = True
+    for from_name, to_name in reversed(applied_steps):
+        try:
+            renamer.rename(to_name, from_name)
+        except OSError:
+            restored = False
+    return restored
+
+
+class RenameTask:
+    """
+    Run apply_plan on a worker thread, so the caller can show progress and offer to cancel.
+
+    The consumer polls the task from its own thread (the Tk main loop, for the GUI) until done is True. A plan that
+    needs files read first, such as one using their metadata, can be built on the worker too by passing prepare.
+
+    Attributes:
+        plan (RenamePlan): The plan being applied, or None while prepare builds it.
+        applied_steps (int): Number of steps applied so far.
+        total_steps (int): Number of steps in the plan, or 0 while it is being built.
+        result (list): The renames, once the task has finished successfully.
+        error (Exception): The error that stopped the task, if any: a RenameError, or any unexpected error, so the
+            consumer always learns how the task ended.
+    """
+
+    def __init__(self, plan, journal=None, undoes=None, workers=1, prepare=None):
+        self.plan = plan
+        self.prepare = prepare
+        self.journal = journal
+        self.undoes = undoes
+        self.workers = workers
+        self.applied_steps = 0
+        self.total_steps = len(plan.steps) if plan is not None else 0
+        self.result = None
+        self.error = None
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="RenameTask", daemon=True)
+
+    def start(self):
+        """
+        Start applying the plan on the worker thread.
+        """
+        self._thread.start()
+
+    def cancel(self):
+        """
+        Ask the worker to stop and roll back. The task reports a RenameCancelledError once it has.
+        """
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def done(self):
+        return not self._thread.is_alive()
+
+    def _progress(self, applied_steps, total_steps):
+        self.applied_steps = applied_steps
+
+    def _run(self):
+        try:
+            if self.plan is None:
+                plan = self.prepare()
+                self.total_steps = len(plan.steps)
+                self.plan = plan
+            if not self.plan.steps:
+                self.result = []
+                return
+            self.result = apply_plan(self.plan, self.journal, self.undoes, self.workers, self._progress,
+                                     self._cancel_event)
+            self.applied_steps = self.total_steps
+        except Exception as e:
+            # Any error is kept, so the consumer never mistakes a task that died for one with nothing to rename.
+            self.error = e
@@ -0,0 +1,207 @@
+"""
+Content digests of files, for naming files after their content and finding duplicate files.
+
+Hashing reads whole files, so digests are only computed when asked for, on a process pool, and kept in the metadata
+cache under the same (device, inode, size, mtime_ns) key: hashing a folder again only reads the files that changed.
+"""
+import hashlib
+import mmap
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from renamer.errors import RenameCancelledError
+
+HASH_ALGORITHM = "sha256"
+READ_BUFFER_SIZE = 1 << 20
+# Files at least this large are hashed through a memory map, in slices of this size, saving a copy of every block.
+MMAP_THRESHOLD = 1 << 20
+MMAP_SLICE_SIZE = 64 << 20
+DEFAULT_HASH_WORKERS = os.cpu_count() or 1
+# Number of files sent to a worker process at once, so small files do not cost a round trip each.
+HASH_CHUNK_SIZE = 8
+# Number of digests stored in the cache together while hashing, so an interrupted run keeps most of its work.
+STORE_BATCH_SIZE = 256
+
+
+def hash_file(path):
+    """
+    Compute the content digest of a file.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        str: The hexadecimal digest, or None if the file cannot be read.
+    """
+    digest = hashlib.new(HASH_ALGORITHM)
+    try:
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    for offset in range(0, len(view), MMAP_SLICE_SIZE):
+                        digest.update(view[offset:offset + MMAP_SLICE_SIZE])
+            else:
+                for block in iter(lambda: file.read(READ_BUFFER_SIZE), b""):
+                    digest.update(block)
+    except (OSError, ValueError):
+        return None
+    return digest.hexdigest()
+
+
+def process_pool(workers):
+    # The GUI starts hashing from a worker thread, and forking a process that runs threads is unsafe.
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def digest_files(paths, keys, cache=None, workers=DEFAULT_HASH_WORKERS, progress=None, cancel_event=None):
+    """
+    Get the content digests of files, hashing the ones missing from the cache on a process pool.
+
+    Args:
+        paths (list): The file paths.
+        keys (list): The cache key of each file, (device, inode, size, mtime_ns).
+        cache (MetadataCache, optional): Where digests are looked up and stored.
+        workers (int, optional): Number of worker processes. 1 hashes in the calling thread.
+        progress (callable, optional): Called with (done_count, total_count) as files are hashed.
+        cancel_event (threading.Event, optional): Stops hashing when set. The digests computed so far are cached.
+
+    Returns:
+        list: The digest of each file, None for the files that cannot be read.
+
+    Raises:
+        RenameCancelledError: If cancel_event was set.
+    """
+    digests = [cache.lookup_digest(key) for key in keys] if cache is not None else [None] * len(paths)
+    missing = [position for position, digest in enumerate(digests) if digest is None]
+    total_count = len(paths)
+    done_count = total_count - len(missing)
+    if progress is not None:
+        progress(done_count, total_count)
+    if not missing:
+        return digests
+
+    pool = process_pool(workers) if workers > 1 and len(missing) > 1 else None
+    hashed = (pool.map(hash_file, [paths[position] for position in missing], chunksize=HASH_CHUNK_SIZE)
+              if pool is not None else map(hash_file, [paths[position] for position in missing]))
+    pending = []
+    try:
+        for position, digest in zip(missing, hashed):
+            if cancel_event is not None and cancel_event.is_set():
+                raise RenameCancelledError("Hashing was cancelled.")
+            digests[position] = digest
+            if digest is not None:
+                pending.append((keys[position], digest))
+            done_count += 1
+            if progress is not None:
+                progress(done_count, total_count)
+            if len(pending) >= STORE_BATCH_SIZE:
+                if cache is not None:
+                    cache.store_digests(pending)
+                pending = []
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if cache is not None and pending:
+            cache.store_digests(pending)
+    return digests
+
+
+def find_duplicates(paths, keys, sizes, cache=None, workers=DEFAULT_HASH_WORKERS, progress=None, cancel_event=None):
+    """
+    Find the files with identical content.
+
+    Files are first grouped by size, and only files sharing their size with another file are hashed. Empty files
+    are left out: they are all identical and rarely worth reporting.
+
+    Args:
+        paths (list): The file paths.
+        keys (list): The cache key of each file.
+        sizes (list): The size of each file.
+        cache (MetadataCache, optional): Where digests are looked up and stored.
+        workers (int, optional): Number of worker processes.
+        progress (callable, optional): Called with (done_count, total_count) as the candidates are hashed.
+        cancel_event (threading.Event, optional): Stops the search when set.
+
+    Returns:
+        list: Groups of positions in paths, one per set of identical files, largest files first.
+
+    Raises:
+        RenameCancelledError: If cancel_event was set.
+    """
+    positions_by_size = defaultdict(list)
+    for position, size in enumerate(sizes):
+        if size:
+            positions_by_size[size].append(position)
+    candidates = [position for positions in positions_by_size.values() if len(positions) > 1
+                  for position in positions]
+    digests = digest_files([paths[position] for position in candidates], [keys[position] for position in candidates],
+                           cache, workers, progress, cancel_event)
+
+    positions_by_content = defaultdict(list)
+    for position, digest in zip(candidates, digests):
+        if digest is not None:
+            positions_by_content[sizes[position], digest].append(position)
+    groups = [positions for positions in positions_by_content.values() if len(positions) > 1]
+    groups.sort(key=lambda positions: sizes[positions[0]], reverse=True)
+    return groups
+
+
+class DuplicateSearch:
+    """
+    Run find_duplicates over the files of a FileModel on a worker thread, so the caller can show progress and
+    offer to cancel. The consumer polls the search until done is True.
+
+    Attributes:
+        folder_path (str): The folder the model was scanned from.
+        hashed_count (int): Number of candidate files hashed so far.
+        total_count (int): Number of candidate files, once known.
+        result (list): Groups of file indices with identical content, once the search has finished successfully.
+        error (Exception): The error that stopped the search, if any.
+    """
+
+    def __init__(self, folder_path, model, indices, cache=None, workers=DEFAULT_HASH_WORKERS):
+        self.folder_path = folder_path
+        self.indices = list(indices)
+        self.paths = [os.path.join(folder_path, model.name(index)) for index in self.indices]
+        self.keys = [(model.devices[index], model.inodes[index], model.sizes[index], model.mtime_ns[index])
+                     for index in self.indices]
+        self.sizes = [model.sizes[index] for index in self.indices]
+        self.cache = cache
+        self.workers = workers
+        self.hashed_count = 0
+        self.total_count = 0
+        self.result = None
+        self.error = None
+        self._started = False
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="DuplicateSearch", daemon=True)
+
+    def start(self):
+        self._started = True
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def done(self):
+        return self._started and not self._thread.is_alive()
+
+    def _progress(self, hashed_count, total_count):
+        self.hashed_count = hashed_count
+        self.total_count = total_count
+
+    def _run(self):
+        try:
+            groups = find_duplicates(self.paths, self.keys, self.sizes, self.cache, self.workers, self._progress,
+                                     self._cancel_event)
+            self.result = [[self.indices[position] for position in positions] for positions in groups]
+        except Exception as e:
+            # Any error is kept: without a result or an error, the consumer would report that there are no duplicates.
+            self.error = e
@@ -0,0 +1,190 @@
+"""
+Apply one recipe to many folders, several folders at a time, each folder planned and renamed on its own.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from renamer.errors import RenameCancelledError, RenameConflictError, RenameError
+from renamer.executor import apply_plan
+from renamer.planner import list_files, plan_renames
+
+DEFAULT_JOB_WORKERS = 4
+# States a job ends in. "planned" is the end of a dry run, "unchanged" a folder the recipe leaves as it is.
+FINISHED_STATES = ("done", "planned", "unchanged", "conflict", "failed", "cancelled")
+
+
+class FolderJob:
+    """
+    The recipe applied to one folder.
+
+    Attributes:
+        folder_path (str): The folder.
+        state (str): "queued", "planning" or "renaming" while it runs, then one of FINISHED_STATES.
+        plan (RenamePlan): The renames planned for the folder, once planned.
+        applied_steps (int): Number of steps applied so far.
+        total_steps (int): Number of steps in the plan, once planned.
+        result (list): The (original_file_name, new_file_name) pairs renamed, once done.
+        conflicts (list): (original_file_name, new_file_name, reason) tuples, if the plan had conflicts or a file
+            took a new name while renaming. Nothing is renamed in the folder then.
+        error (Exception): The error that stopped the job, if any.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.state = "queued"
+        self.plan = None
+        self.applied_steps = 0
+        self.total_steps = 0
+        self.result = None
+        self.conflicts = []
+        self.error = None
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def run(self, recipe, journal=None, rename_workers=1, dry_run=False, cancel_event=None):
+        """
+        Plan the folder, then rename its files unless it is a dry run. Errors are kept on the job, not raised, so
+        one folder failing does not stop the others.
+
+        Args:
+            recipe (Recipe): The recipe to apply.
+            journal (RenameJournal, optional): The journal to record the renames in.
+            rename_workers (int, optional): Number of renames in flight at once within the folder.
+            dry_run (bool, optional): Only plan the renames.
+            cancel_event (threading.Event, optional): Set it to stop the job, rolling back its renames.
+        """
+        if cancel_event is not None and cancel_event.is_set():
+            self.state = "cancelled"
+            return
+        self.state = "planning"
+        try:
+            file_names = sorted(list_files(self.folder_path, recipe.recursive, recipe.path_filter()))
+            self.plan = plan_renames(self.folder_path, file_names, recipe.rules)
+        except RenameConflictError as e:
+            self.conflicts = e.conflicts
+            self.error = e
+            self.state = "conflict"
+            return
+        except (RenameError, OSError) as e:
+            self.error = e
+            self.state = "failed"
+            return
+        self.total_steps = len(self.plan.steps)
+        if dry_run or not self.plan.steps:
+            self.state = "planned" if dry_run else "unchanged"
+            return
+
+        self.state = "renaming"
+        try:
+            self.result = apply_plan(self.plan, journal, workers=rename_workers, progress=self._progress,
+                                     cancel_event=cancel_event)
+        except RenameCancelledError as e:
+            self.error = e
+            self.state = "cancelled"
+        except RenameConflictError as e:
+            # A file outside the batch took one of the new names; the folder was rolled back.
+            self.conflicts = e.conflicts
+            self.error = e
+            self.state = "conflict"
+        except (RenameError, OSError) as e:
+            self.error = e
+            self.state = "failed"
+        else:
+            self.applied_steps = self.total_steps
+            self.state = "done"
+
+    def _progress(self, applied_steps, total_steps):
+        self.applied_steps = applied_steps
+
+
+class JobQueue:
+    """
+    Run a recipe over many folders on a bounded pool of worker threads, so the caller can show the combined
+    progress and offer to cancel. The consumer polls the queue until done is True, or calls run to wait for it.
+
+    Folders are independent: each is listed, planned and renamed on its own, with its own journaled batch, and a
+    conflict or error in one folder leaves the others going.
+
+    Attributes:
+        recipe (Recipe): The recipe applied to every folder.
+        jobs (list): One FolderJob per folder, in the order given.
+        workers (int): Number of folders processed at once.
+    """
+
+    def __init__(self, recipe, folder_paths, journal=None, workers=DEFAULT_JOB_WORKERS, rename_workers=1,
+                 dry_run=False):
+        self.recipe = recipe
+        self.jobs = [FolderJob(os.path.abspath(folder_path)) for folder_path in folder_paths]
+        self.journal = journal
+        self.workers = max(1, workers)
+        self.rename_workers = rename_workers
+        self.dry_run = dry_run
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="JobQueue", daemon=True)
+
+    def start(self):
+        """
+        Start processing the folders in the background.
+        """
+        self._thread.start()
+
+    def run(self):
+        """
+        Process every folder and wait until all are finished.
+
+        Returns:
+            list: The FolderJobs.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job") as pool:
+            for job in self.jobs:
+                pool.submit(self._run_job, job)
+        return self.jobs
+
+    def _run_job(self, job):
+        try:
+            job.run(self.recipe, self.journal, self.rename_workers, self.dry_run, self._cancel_event)
+        except Exception as e:
+            # Any other error still has to finish the job, or the queue would never be done.
+            job.error = e
+            job.state = "failed"
+
+    def cancel(self):
+        """
+        Stop the queue: folders not started are skipped, and the renames of folders being renamed are rolled back.
+        """
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def done(self):
+        return all(job.finished for job in self.jobs)
+
+    def progress(self):
+        """
+        Get the progress of every folder combined.
+
+        Returns:
+            tuple: (finished_jobs, total_jobs, applied_steps, planned_steps). planned_steps grows as folders are
+            planned.
+        """
+        jobs = list(self.jobs)
+        return (sum(1 for job in jobs if job.finished), len(jobs), sum(job.applied_steps for job in jobs),
+                sum(job.total_steps for job in jobs))
+
+    def counts(self):
+        """
+        Count the folders in each state.
+
+        Returns:
+            dict: Number of jobs by state, for the states at least one job is in.
+        """
+        counts = {}
+        for job in self.jobs:
+            counts[job.state] = counts.get(job.state, 0) + 1
+        return counts
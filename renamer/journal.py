@@ -0,0 +1,447 @@
+"""
+Write-ahead journal of rename batches, used to recover from a crash in the middle of a batch and to undo batches.
+
+Each batch gets its own append-only file of JSON lines: a begin record, one record per rename step written before
+the step is applied, an applied record once every step was applied or a failed record once the batch gave up, and a
+commit or abort record at the end. Step records are written and synced in groups, so the cost of fsync is shared by
+a whole group of renames. The process applying a batch holds a lock on its file, so another process never mistakes
+it for a batch interrupted by a crash.
+"""
+import itertools
+import json
+import os
+import time
+from json.encoder import encode_basestring_ascii
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: batch files are not locked, so only one process at a time should rename.
+    fcntl = None
+
+from renamer.backend import FolderRenamer
+from renamer.errors import RenameError
+from renamer.planner import list_names, plan_mapping
+from renamer.state import default_state_directory
+
+DEFAULT_GROUP_SIZE = 512
+DEFAULT_HISTORY = 20
+JOURNAL_SUFFIX = ".journal"
+# Tells apart the batches a process begins in the same nanosecond, as folders renamed in parallel can.
+_batch_numbers = itertools.count()
+
+
+def lock_file(fd, wait=True):
+    """
+    Take the exclusive lock of an open journal file, released when the file is closed.
+
+    Args:
+        fd (int): The open file.
+        wait (bool, optional): Wait for another process to release the lock, rather than giving up.
+
+    Returns:
+        bool: True if the lock was taken, or locks are not available on this platform.
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def sync_directory(directory):
+    """
+    Flush a directory entry to disk, where the platform supports it.
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JournalEntry:
+    """
+    A rename batch read back from the journal.
+
+    Attributes:
+        path (str): The journal file of the batch.
+        batch_id (str): Unique, time-ordered batch identifier.
+        folder_path (str): The folder the batch renamed files in.
+        step_count (int): Number of steps the plan had.
+        undoes (str): The batch this batch undid, or None.
+        steps (list): (from_name, to_name) steps recorded before they were applied.
+        identities (list): For each step, the (st_dev, st_ino) of the file it moves, or None where not recorded.
+        outcome (str): "applied" once every step was applied, "failed" once the batch gave up and started rolling
+            back, or None before either.
+        state (str): "pending" while the batch has not finished, then "committed" or "aborted".
+        undone (bool): True once another batch has undone this one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.batch_id = None
+        self.folder_path = None
+        self.step_count = 0
+        self.undoes = None
+        self.steps = []
+        self.identities = []
+        self.outcome = None
+        self.state = "pending"
+        self.undone = False
+        self.read()
+
+    def read(self):
+        with open(self.path, "rb") as journal_file:
+            lines = journal_file.read().splitlines()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Only the last line can be torn by a crash; everything before it was fully written.
+                break
+            record_type = record["type"]
+            if record_type == "step":
+                self.steps.append((record["from"], record["to"]))
+                identity = record.get("id")
+                self.identities.append(tuple(identity) if identity else None)
+            elif record_type == "begin":
+                self.batch_id = record["batch"]
+                self.folder_path = record["folder"]
+                self.step_count = record["steps"]
+                self.undoes = record.get("undoes")
+            elif record_type in ("applied", "failed"):
+                self.outcome = record_type
+            elif record_type in ("commit", "abort"):
+                self.state = "committed" if record_type == "commit" else "aborted"
+            elif record_type == "undone":
+                self.undone = True
+
+    def renames(self):
+        """
+        Work out the net (original_file_name, new_file_name) renames from the recorded steps, folding away the
+        temporary names used to break cycles.
+
+        Returns:
+            list: The renames.
+        """
+        original_by_name = {}
+        for from_name, to_name in self.steps:
+            original_by_name[to_name] = original_by_name.pop(from_name, from_name)
+        return [(original_file_name, new_file_name)
+                for new_file_name, original_file_name in original_by_name.items()
+                if original_file_name != new_file_name]
+
+
+class JournalWriter:
+    """
+    Appends the records of one batch to its journal file.
+
+    Attributes:
+        journal (RenameJournal): The journal the batch belongs to.
+        path (str): The journal file of the batch.
+        batch_id (str): The batch identifier.
+        undoes (str): The batch this batch undoes, or None.
+        group_size (int): Number of step records written and synced together.
+    """
+
+    def __init__(self, journal, plan, undoes=None):
+        self.journal = journal
+        self.batch_id = f"{time.time_ns():020d}-{os.getpid()}-{next(_batch_numbers)}"
+        self.path = os.path.join(journal.directory, self.batch_id + JOURNAL_SUFFIX)
+        self.undoes = undoes
+        self.group_size = journal.group_size
+        self._step_number = 0
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o600)
+        # Nobody else knows the new file yet, so this never waits.
+        lock_file(self._fd)
+        self.write([{"type": "begin", "batch": self.batch_id, "folder": os.path.abspath(plan.folder_path),
+                     "steps": len(plan.steps), "undoes": undoes, "time": time.time()}])
+        if journal.durable:
+            sync_directory(journal.directory)
+
+    def write(self, records):
+        self.write_lines([json.dumps(record) for record in records])
+
+    def write_lines(self, lines):
+        data = ("\n".join(lines) + "\n").encode("ascii")
+        os.write(self._fd, data)
+        if self.journal.durable:
+            os.fsync(self._fd)
+
+    def log_steps(self, steps, identities=None):
+        """
+        Record a group of steps. Must be called before any of them is applied.
+
+        Args:
+            steps (list): (from_name, to_name) pairs.
+            identities (list, optional): For each step, the (st_dev, st_ino) of the file it moves, or None. Recovery
+                needs them for cycles, whose names on disk are the same before and after.
+        """
+        # Formatted by hand rather than through json.dumps: this runs once per rename and dominates the journal cost.
+        number = self._step_number
+        if identities is None:
+            identities = [None] * len(steps)
+        self.write_lines([f'{{"type": "step", "n": {number + offset}, "from": {encode_basestring_ascii(from_name)}, '
+                          f'"to": {encode_basestring_ascii(to_name)}'
+                          + (f', "id": [{identity[0]}, {identity[1]}]}}' if identity else "}")
+                          for offset, ((from_name, to_name), identity) in enumerate(zip(steps, identities))])
+        self._step_number += len(steps)
+
+    def applied(self):
+        """
+        Record that every step was applied, so the batch is finished rather than rolled back after a crash.
+        """
+        self.write([{"type": "applied"}])
+
+    def failed(self):
+        """
+        Record that the batch gave up, before it is rolled back, so it is rolled back again after a crash even if
+        every step was recorded.
+        """
+        self.write([{"type": "failed"}])
+
+    def commit(self):
+        """
+        Mark the batch as fully applied, and the batch it undid as undone.
+        """
+        self.write([{"type": "commit"}])
+        self.close()
+        if self.undoes is not None:
+            self.journal.mark_undone(self.undoes)
+        self.journal.prune()
+
+    def abort(self):
+        """
+        Mark the batch as rolled back.
+        """
+        self.write([{"type": "abort"}])
+        self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class RenameJournal:
+    """
+    The directory of batch journal files.
+
+    Attributes:
+        directory (str): Where the journal files are kept.
+        group_size (int): Number of step records written and synced with one fsync.
+        durable (bool): Whether records are fsynced. Without it, a process crash is still recoverable but a power
+            loss may lose the last records.
+        history (int): Number of finished batches kept for undo.
+    """
+
+    def __init__(self, directory=None, group_size=DEFAULT_GROUP_SIZE, durable=True, history=DEFAULT_HISTORY):
+        self.directory = directory or os.path.join(default_state_directory(), "journal")
+        self.group_size = max(1, group_size)
+        self.durable = durable
+        self.history = history
+        os.makedirs(self.directory, exist_ok=True)
+
+    def begin(self, plan, undoes=None):
+        """
+        Start journaling a batch.
+
+        Args:
+            plan (RenamePlan): The plan about to be applied.
+            undoes (str, optional): The batch this plan undoes.
+
+        Returns:
+            JournalWriter: The writer for the batch.
+        """
+        return JournalWriter(self, plan, undoes)
+
+    def paths(self):
+        """
+        Get the journal files, oldest first.
+
+        Returns:
+            list: The file paths.
+        """
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(JOURNAL_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def entries(self, newest_first=False):
+        """
+        Read the journaled batches.
+
+        Args:
+            newest_first (bool, optional): Yield the most recent batch first.
+
+        Yields:
+            JournalEntry: The batches.
+        """
+        paths = self.paths()
+        if newest_first:
+            paths.reverse()
+        for path in paths:
+            entry = JournalEntry(path)
+            if entry.batch_id is not None:
+                yield entry
+
+    def mark_undone(self, batch_id):
+        path = os.path.join(self.directory, batch_id + JOURNAL_SUFFIX)
+        if os.path.exists(path):
+            with open(path, "ab") as journal_file:
+                journal_file.write(b'{"type": "undone"}\n')
+                journal_file.flush()
+                if self.durable:
+                    os.fsync(journal_file.fileno())
+
+    def prune(self):
+        """
+        Delete the oldest finished batches beyond the history limit.
+        """
+        paths = self.paths()
+        for path in paths[:max(0, len(paths) - self.history)]:
+            try:
+                if JournalEntry(path).state != "pending":
+                    os.remove(path)
+            except FileNotFoundError:
+                # Already pruned by a batch finishing at the same time on another thread.
+                pass
+
+    def recover(self):
+        """
+        Finish or roll back every batch that was interrupted by a crash.
+
+        A batch recorded as applied is finished: only its commit record was missing. Any other batch, whether it
+        stopped partway or gave up and could not roll back, has its recorded steps rolled back. Each step is checked
+        against the files on disk, so steps that were recorded but never applied, or already applied, are left alone.
+        Batches still locked by the process applying them are skipped.
+
+        Returns:
+            list: (JournalEntry, action, problems) tuples, where action is "finished" or "rolled back" and problems
+            is the number of steps that could not be replayed.
+        """
+        results = []
+        for entry in self.entries():
+            if entry.state != "pending":
+                continue
+            try:
+                fd = os.open(entry.path, os.O_WRONLY | os.O_APPEND | getattr(os, "O_BINARY", 0))
+            except FileNotFoundError:
+                continue
+            try:
+                if not lock_file(fd, wait=False):
+                    continue
+                # Read again under the lock: the batch may have finished since it was first read.
+                entry = JournalEntry(entry.path)
+                if entry.state != "pending":
+                    continue
+                if entry.outcome == "applied":
+                    problems = replay_steps(entry.folder_path, entry.steps, entry.identities)
+                    action, record_type = "finished", "commit"
+                else:
+                    problems = replay_steps(entry.folder_path,
+                                            [(to_name, from_name) for from_name, to_name in reversed(entry.steps)],
+                                            entry.identities[::-1])
+                    action, record_type = "rolled back", "abort"
+                os.write(fd, json.dumps({"type": record_type, "recovered": True}).encode("utf-8") + b"\n")
+                if self.durable:
+                    os.fsync(fd)
+                if record_type == "commit" and entry.undoes is not None:
+                    self.mark_undone(entry.undoes)
+            finally:
+                os.close(fd)
+            results.append((entry, action, problems))
+        return results
+
+    def last_undoable(self, folder_path=None):
+        """
+        Find the most recent batch that can be undone.
+
+        Args:
+            folder_path (str, optional): Only consider the batches that renamed files in this folder.
+
+        Returns:
+            JournalEntry: The batch, or None if there is nothing to undo.
+        """
+        if folder_path is not None:
+            folder_path = os.path.normcase(os.path.abspath(folder_path))
+        for entry in self.entries(newest_first=True):
+            if folder_path is not None and os.path.normcase(entry.folder_path) != folder_path:
+                continue
+            if entry.state == "committed" and not entry.undone and entry.undoes is None:
+                return entry
+        return None
+
+    def plan_undo(self, folder_path=None):
+        """
+        Plan the renames that reverse the most recent batch, checked by the same planner as any other batch.
+
+        Args:
+            folder_path (str, optional): Only undo a batch that renamed files in this folder.
+
+        Returns:
+            tuple: The JournalEntry being undone and the RenamePlan that undoes it.
+
+        Raises:
+            RenameError: If there is nothing to undo or the renamed files have changed since.
+        """
+        entry = self.last_undoable(folder_path)
+        if entry is None:
+            raise RenameError("There is no rename to undo" + (f" in {folder_path}." if folder_path else "."))
+        inverse = [(new_file_name, original_file_name) for original_file_name, new_file_name in entry.renames()]
+        try:
+            existing_files = set(list_names(entry.folder_path, {os.path.dirname(new_file_name)
+                                                                for new_file_name, original_file_name in inverse}))
+        except OSError as e:
+            raise RenameError(f"The last rename can't be undone. Error: {e}") from e
+        missing = [new_file_name for new_file_name, original_file_name in inverse
+                   if new_file_name not in existing_files]
+        if missing:
+            raise RenameError(f"'{missing[0]}' no longer exists in {entry.folder_path}. The last rename can't be "
+                              f"undone.")
+        return entry, plan_mapping(entry.folder_path, inverse, existing_files)
+
+
+def replay_steps(folder_path, steps, identities=None):
+    """
+    Apply the steps that have not been applied yet, judging from which of their names exist on disk, never
+    overwriting a file.
+
+    Names alone cannot tell whether a cycle was applied, since the same names exist before and after, so a step
+    recorded with the identity of the file it moves is only applied if that file still has its from name.
+
+    Args:
+        folder_path (str): The folder the files live in.
+        steps (list): (from_name, to_name) pairs, in the order to apply them.
+        identities (list, optional): For each step, the (st_dev, st_ino) of the file it moves, or None.
+
+    Returns:
+        int: Number of steps whose state on disk did not allow them to be replayed.
+    """
+    try:
+        renamer = FolderRenamer(folder_path)
+    except OSError:
+        return len(steps)
+    if identities is None:
+        identities = [None] * len(steps)
+    problems = 0
+    with renamer:
+        for (from_name, to_name), identity in zip(steps, identities):
+            from_path = os.path.join(folder_path, from_name)
+            to_path = os.path.join(folder_path, to_name)
+            same_file_name = os.path.normcase(from_name) == os.path.normcase(to_name)
+            from_exists = os.path.lexists(from_path)
+            if from_exists and identity is not None and renamer.identity(from_name) != identity:
+                # Another file of the cycle already took the name, so the step was applied.
+                continue
+            if from_exists and (same_file_name or not os.path.lexists(to_path)):
+                try:
+                    renamer.rename(from_name, to_name)
+                except OSError:
+                    problems += 1
+            elif not os.path.lexists(to_path):
+                problems += 1
+    return problems
@@ -0,0 +1,616 @@
+"""
+Photo and audio metadata for name templates: EXIF capture dates and camera models, ID3 tags and content digests.
+
+Only header bytes are read, with bounded reads: the EXIF segment at the start of a JPEG or TIFF file, the ID3v2 tag
+at the start of an MP3 file or the ID3v1 tag in its last 128 bytes. Extracted values are kept in an on-disk cache
+keyed by (device, inode, size, mtime_ns), so a file is only read again after it changed.
+"""
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from renamer.hashing import DEFAULT_HASH_WORKERS, digest_files
+from renamer.rules import INVALID_CHARACTERS
+from renamer.state import default_state_directory
+
+DEFAULT_WORKERS = 8
+# Upper bound on the bytes read from an ID3v2 tag; cover art can make tags several megabytes long, and it comes
+# after the text frames in practice.
+ID3_MAX_BYTES = 256 * 1024
+# Number of JPEG segments looked at before giving up on finding the EXIF one.
+JPEG_MAX_SEGMENTS = 16
+ID3_FRAMES = {
+    "TIT2": "title", "TT2": "title",
+    "TPE1": "artist", "TP1": "artist",
+    "TALB": "album", "TAL": "album",
+    "TRCK": "track", "TRK": "track",
+    "TYER": "year", "TYE": "year", "TDRC": "year",
+}
+ID3_ENCODINGS = ("latin-1", "utf-16", "utf-16-be", "utf-8")
+EXIF_DATE_TAGS = (0x9003, 0x9004)
+CACHE_TABLES = ("metadata", "digests")
+UNSAFE_CHARACTERS = str.maketrans({character: "_" for character in INVALID_CHARACTERS + tuple(map(chr, range(32)))})
+
+
+def clean_text(text):
+    """
+    Make a metadata value usable in a file name, replacing the characters a file name cannot contain.
+
+    Args:
+        text (str): The value as found in the file.
+
+    Returns:
+        str: The cleaned value.
+    """
+    return text.replace("\0", " ").translate(UNSAFE_CHARACTERS).strip(" .")
+
+
+def leading_number(text):
+    """
+    Parse the number at the start of a tag value such as "3/12" or "2004-05-06".
+
+    Returns:
+        int: The number, or None if the value does not start with one.
+    """
+    digits = ""
+    for character in text.strip():
+        if not character.isdigit():
+            break
+        digits += character
+    return int(digits) if digits else None
+
+
+def parse_exif_date(text):
+    """
+    Parse an EXIF date such as "2024:05:06 14:30:00" as local time.
+
+    Returns:
+        float: Seconds since the epoch, or None if the date is missing or malformed.
+    """
+    try:
+        return time.mktime(time.strptime(text.strip("\0 ")[:19], "%Y:%m:%d %H:%M:%S"))
+    except (ValueError, OverflowError):
+        return None
+
+
+def parse_tiff(data):
+    """
+    Read the capture date and camera model from a TIFF structure, as found in EXIF segments and TIFF-based files.
+
+    Args:
+        data (bytes): The TIFF structure, starting with its byte order mark.
+
+    Returns:
+        dict: "taken" and "camera", for the values found.
+    """
+    if data[:2] == b"II":
+        order = "<"
+    elif data[:2] == b"MM":
+        order = ">"
+    else:
+        return {}
+
+    def entries(offset):
+        if offset + 2 > len(data):
+            return {}
+        count, = struct.unpack_from(order + "H", data, offset)
+        found = {}
+        for position in range(offset + 2, min(offset + 2 + count * 12, len(data) - 11), 12):
+            tag, value_type, value_count = struct.unpack_from(order + "HHI", data, position)
+            if value_type == 2:
+                start = position + 8 if value_count <= 4 else struct.unpack_from(order + "I", data, position + 8)[0]
+                found[tag] = data[start:start + value_count].split(b"\0", 1)[0].decode("latin-1")
+            elif value_type == 4:
+                found[tag] = struct.unpack_from(order + "I", data, position + 8)[0]
+        return found
+
+    try:
+        ifd0 = entries(struct.unpack_from(order + "I", data, 4)[0])
+        exif = entries(ifd0[0x8769]) if isinstance(ifd0.get(0x8769), int) else {}
+    except struct.error:
+        return {}
+    values = {}
+    for text in [exif.get(tag) for tag in EXIF_DATE_TAGS] + [ifd0.get(0x0132)]:
+        taken = parse_exif_date(text) if isinstance(text, str) else None
+        if taken is not None:
+            values["taken"] = taken
+            break
+    if isinstance(ifd0.get(0x0110), str) and clean_text(ifd0[0x0110]):
+        values["camera"] = clean_text(ifd0[0x0110])
+    return values
+
+
+def read_jpeg(file):
+    """
+    Find the EXIF segment of a JPEG file, reading segment headers only until it is found.
+
+    Args:
+        file: The file, opened in binary mode and positioned after its start-of-image marker.
+
+    Returns:
+        dict: The values found.
+    """
+    for _ in range(JPEG_MAX_SEGMENTS):
+        header = file.read(4)
+        if len(header) < 4 or header[0] != 0xFF or header[1] == 0xDA:
+            return {}
+        length, = struct.unpack(">H", header[2:])
+        if header[1] == 0xE1:
+            segment = file.read(length - 2)
+            if segment.startswith(b"Exif\0\0"):
+                return parse_tiff(segment[6:])
+        else:
+            file.seek(length - 2, os.SEEK_CUR)
+    return {}
+
+
+def syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def decode_id3_text(data):
+    if not data or data[0] >= len(ID3_ENCODINGS):
+        return ""
+    return data[1:].decode(ID3_ENCODINGS[data[0]], "replace").split("\0", 1)[0]
+
+
+def read_id3v2(file, header):
+    """
+    Read the text frames of an ID3v2 tag.
+
+    Args:
+        file: The file, opened in binary mode and positioned after the 10-byte tag header.
+        header (bytes): The tag header.
+
+    Returns:
+        dict: The raw text of the frames found, by field.
+    """
+    version = header[3]
+    data = file.read(min(syncsafe(header[6:10]), ID3_MAX_BYTES))
+    position = 0
+    if header[5] & 0x40 and version >= 3:
+        position = syncsafe(data[:4]) if version == 4 else struct.unpack(">I", data[:4])[0] + 4
+    id_length, header_length = (3, 6) if version == 2 else (4, 10)
+    frames = {}
+    while position + header_length <= len(data):
+        frame_id = data[position:position + id_length].decode("latin-1")
+        if not frame_id.strip("\0"):
+            break
+        size_bytes = data[position + id_length:position + header_length - (0 if version == 2 else 2)]
+        if version == 2:
+            size = int.from_bytes(size_bytes, "big")
+        elif version == 4:
+            size = syncsafe(size_bytes)
+        else:
+            size = struct.unpack(">I", size_bytes)[0]
+        field = ID3_FRAMES.get(frame_id)
+        if field is not None and field not in frames:
+            frames[field] = decode_id3_text(data[position + header_length:position + header_length + size])
+        position += header_length + size
+    return frames
+
+
+def read_id3v1(file):
+    """
+    Read the ID3v1 tag in the last 128 bytes of a file.
+
+    Returns:
+        dict: The raw text of the fields found, by field.
+    """
+    file.seek(0, os.SEEK_END)
+    if file.tell() < 128:
+        return {}
+    file.seek(-128, os.SEEK_END)
+    tag = file.read(128)
+    if not tag.startswith(b"TAG"):
+        return {}
+
+    def text(start, end):
+        return tag[start:end].split(b"\0", 1)[0].decode("latin-1").strip()
+
+    frames = {"title": text(3, 33), "artist": text(33, 63), "album": text(63, 93), "year": text(93, 97)}
+    if tag[125] == 0 and tag[126]:
+        frames["track"] = str(tag[126])
+    return frames
+
+
+def read_audio_tags(frames):
+    values = {}
+    for field, text in frames.items():
+        if field in ("track", "year"):
+            number = leading_number(text)
+            if number is not None:
+                values[field] = number
+        elif clean_text(text):
+            values[field] = clean_text(text)
+    return values
+
+
+def extract_metadata(path):
+    """
+    Read the metadata of a file from its header bytes. The file type is told from its content, not its extension.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        dict: The values found, by field name. Empty for files without metadata or that cannot be read.
+    """
+    try:
+        with open(path, "rb") as file:
+            header = file.read(10)
+            if header[:2] == b"\xff\xd8":
+                file.seek(2)
+                return read_jpeg(file)
+            if header[:4] in (b"II*\0", b"MM\0*"):
+                file.seek(0)
+                return parse_tiff(file.read(64 * 1024))
+            if header[:3] == b"ID3" and len(header) == 10:
+                return read_audio_tags(read_id3v2(file, header))
+            if os.path.splitext(path)[1].lower() == ".mp3":
+                return read_audio_tags(read_id3v1(file))
+    except (OSError, ValueError, IndexError, struct.error):
+        pass
+    return {}
+
+
+def metadata_key(stat_result):
+    """
+    Get the cache key of a file from its stat data.
+
+    Returns:
+        tuple: (device, inode, size, mtime_ns).
+    """
+    return stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns
+
+
+def to_signed(number):
+    """
+    Map an unsigned 64-bit number, such as an inode number, to the signed range SQLite integers hold.
+    """
+    return number - (1 << 64) if number >= 1 << 63 else number
+
+
+class MetadataCache:
+    """
+    On-disk cache of extracted metadata and content digests, one row per file identity in each of two tables.
+
+    A file is identified by its device and inode numbers. The size and modification time stored with it tell
+    whether the file changed; a changed file's entry is ignored and then replaced. Files without an inode number,
+    as reported on some platforms, are never cached.
+
+    Attributes:
+        path (str): The SQLite database file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_state_directory(), "metadata.sqlite3")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        # A cache can be rebuilt, so it is not worth an fsync per write.
+        self._connection.execute("PRAGMA synchronous = OFF")
+        for table in CACHE_TABLES:
+            self._connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (device INTEGER, inode INTEGER, "
+                                     f"size INTEGER, mtime_ns INTEGER, data TEXT, PRIMARY KEY (device, inode))")
+        self._connection.commit()
+
+    def _lookup(self, table, key):
+        device, inode, size, mtime_ns = key
+        if not inode:
+            return None
+        try:
+            with self._lock:
+                row = self._connection.execute(f"SELECT size, mtime_ns, data FROM {table} "
+                                               f"WHERE device = ? AND inode = ?",
+                                               (to_signed(device), to_signed(inode))).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        return row[2]
+
+    def _store(self, table, items):
+        rows = [(to_signed(device), to_signed(inode), size, mtime_ns, data)
+                for (device, inode, size, mtime_ns), data in items if inode]
+        if not rows:
+            return
+        # A cache that cannot be written to only costs reading the files again next time.
+        try:
+            with self._lock:
+                self._connection.executemany(f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?, ?)", rows)
+                self._connection.commit()
+        except sqlite3.Error:
+            pass
+
+    def lookup(self, key):
+        """
+        Get the cached metadata of a file.
+
+        Args:
+            key (tuple): The file's (device, inode, size, mtime_ns).
+
+        Returns:
+            dict: The metadata, or None if the file is not cached or changed since.
+        """
+        data = self._lookup("metadata", key)
+        return json.loads(data) if data is not None else None
+
+    def store(self, items):
+        """
+        Cache the metadata of files, replacing what was cached for the same files before they changed.
+
+        Args:
+            items (list): (key, metadata) pairs.
+        """
+        self._store("metadata", [(key, json.dumps(values)) for key, values in items])
+
+    def lookup_digest(self, key):
+        """
+        Get the cached content digest of a file.
+
+        Args:
+            key (tuple): The file's (device, inode, size, mtime_ns).
+
+        Returns:
+            str: The digest, or None if the file is not cached or changed since.
+        """
+        return self._lookup("digests", key)
+
+    def store_digests(self, items):
+        """
+        Cache the content digests of files.
+
+        Args:
+            items (list): (key, digest) pairs.
+        """
+        self._store("digests", items)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class MetadataReader:
+    """
+    Look metadata up in the cache and extract what is missing on a thread pool. Content digests, for the hash
+    template field, are only computed when asked for.
+
+    Attributes:
+        cache (MetadataCache): The cache, or None to always extract.
+        workers (int): Number of files read at once.
+        hash_workers (int): Number of processes hashing files at once in read_many.
+    """
+
+    def __init__(self, cache=None, workers=DEFAULT_WORKERS, hash_workers=DEFAULT_HASH_WORKERS):
+        self.cache = cache
+        self.workers = workers
+        self.hash_workers = hash_workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="metadata")
+
+    def lookup(self, key, digest=False):
+        """
+        Get the cached metadata of a file.
+
+        Args:
+            key (tuple): The file's cache key.
+            digest (bool, optional): Also get the content digest, as the "hash" field.
+
+        Returns:
+            dict: The metadata, or None if any of it is missing from the cache.
+        """
+        if self.cache is None:
+            return None
+        values = self.cache.lookup(key)
+        if values is None or not digest:
+            return values
+        content_digest = self.cache.lookup_digest(key)
+        return dict(values, hash=content_digest) if content_digest is not None else None
+
+    def read(self, path, key, digest=False):
+        """
+        Get the metadata of one file, extracting, hashing and caching it if needed.
+
+        Returns:
+            dict: The metadata.
+        """
+        values = self.cache.lookup(key) if self.cache is not None else None
+        if values is None:
+            values = extract_metadata(path)
+            if self.cache is not None:
+                self.cache.store([(key, values)])
+        if digest:
+            return dict(values, hash=digest_files([path], [key], self.cache, workers=1)[0] or "")
+        return values
+
+    def read_many(self, paths, keys, digest=False):
+        """
+        Get the metadata of many files, extracting the ones missing from the cache in parallel.
+
+        Args:
+            paths (list): The file paths.
+            keys (list): The cache key of each file.
+            digest (bool, optional): Also get the content digests, hashing files on a process pool.
+
+        Returns:
+            list: The metadata of each file.
+        """
+        results = [self.cache.lookup(key) for key in keys] if self.cache is not None else [None] * len(paths)
+        missing = [position for position, values in enumerate(results) if values is None]
+        extracted = self._pool.map(extract_metadata, [paths[position] for position in missing])
+        for position, values in zip(missing, extracted):
+            results[position] = values
+        if self.cache is not None and missing:
+            self.cache.store([(keys[position], results[position]) for position in missing])
+        if digest:
+            digests = digest_files(paths, keys, self.cache, self.hash_workers)
+            results = [dict(values, hash=content_digest or "") for values, content_digest in zip(results, digests)]
+        return results
+
+    def submit(self, path, key, callback, digest=False):
+        """
+        Read the metadata of a file in the background.
+
+        Args:
+            path (str): The file.
+            key (tuple): Its cache key.
+            callback (callable): Called with the metadata on a worker thread, even if reading fails, in which case the
+                metadata is empty.
+            digest (bool, optional): Also hash the file.
+        """
+        def read():
+            values = {"hash": ""} if digest else {}
+            try:
+                values = self.read(path, key, digest)
+            finally:
+                callback(values)
+
+        self._pool.submit(read)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+
+
+def open_reader(workers=DEFAULT_WORKERS):
+    """
+    Open a metadata reader using the default cache, or no cache if it cannot be opened.
+
+    Args:
+        workers (int, optional): Number of files read at once.
+
+    Returns:
+        MetadataReader: The reader.
+    """
+    try:
+        cache = MetadataCache()
+    except (OSError, sqlite3.Error):
+        cache = None
+    return MetadataReader(cache, workers)
+
+
+def file_key(path):
+    try:
+        return metadata_key(os.stat(path))
+    except OSError:
+        return 0, 0, 0, 0
+
+
+def read_metadata(folder_path, file_names, reader=None, digest=False):
+    """
+    Get the metadata of files given by name, for callers that have no scan data such as the command line.
+
+    Args:
+        folder_path (str): The folder the files live in.
+        file_names (list): The file names, relative to folder_path.
+        reader (MetadataReader, optional): The reader to use. Defaults to one using the default cache.
+        digest (bool, optional): Also get the content digests, as the "hash" field.
+
+    Returns:
+        list: The metadata of each file.
+    """
+    own_reader = reader is None
+    if own_reader:
+        reader = open_reader()
+    try:
+        paths = [os.path.join(folder_path, file_name) for file_name in file_names]
+        return reader.read_many(paths, [file_key(path) for path in paths], digest)
+    finally:
+        if own_reader:
+            reader.close()
+
+
+class FolderMetadata:
+    """
+    The metadata of the files in a FileModel, for the preview: cached values are returned at once, and missing ones
+    are extracted in the background while the preview shows a placeholder.
+
+    The cache key comes from the scan, so reopening a folder reads no file whose metadata is already cached.
+
+    Attributes:
+        folder_path (str): The folder the model was scanned from.
+        model (FileModel): The files.
+        reader (MetadataReader): Where the metadata comes from.
+    """
+
+    def __init__(self, folder_path, model, reader):
+        self.folder_path = folder_path
+        self.model = model
+        self.reader = reader
+        self._values = {}
+        self._pending = set()
+        self._ready = []
+        self._lock = threading.Lock()
+
+    def key(self, index):
+        model = self.model
+        return model.devices[index], model.inodes[index], model.sizes[index], model.mtime_ns[index]
+
+    def path(self, index):
+        return os.path.join(self.folder_path, self.model.name(index))
+
+    def _complete(self, values, digest):
+        return values is not None and (not digest or "hash" in values)
+
+    def get(self, index, digest=False):
+        """
+        Get the metadata of a file if it is at hand, or start extracting it.
+
+        Args:
+            index (int): The file index.
+            digest (bool, optional): Also get the content digest, as the "hash" field.
+
+        Returns:
+            dict: The metadata, or None while it is being extracted.
+        """
+        values = self._values.get(index)
+        if self._complete(values, digest):
+            return values
+        if index in self._pending:
+            return None
+        values = self.reader.lookup(self.key(index), digest)
+        if values is not None:
+            self._values[index] = values
+            return values
+        self._pending.add(index)
+        self.reader.submit(self.path(index), self.key(index), lambda values: self._extracted(index, values), digest)
+        return None
+
+    def _extracted(self, index, values):
+        with self._lock:
+            self._values[index] = values
+            self._ready.append(index)
+
+    def get_all(self, indices, digest=False):
+        """
+        Get the metadata of many files, waiting for the extraction of the missing ones, done in parallel.
+
+        Args:
+            indices (list): File indices.
+            digest (bool, optional): Also get the content digests, as the "hash" field.
+
+        Returns:
+            list: The metadata of each file.
+        """
+        missing = [index for index in indices if not self._complete(self._values.get(index), digest)]
+        for index, values in zip(missing, self.reader.read_many([self.path(index) for index in missing],
+                                                                [self.key(index) for index in missing], digest)):
+            self._values[index] = values
+        return [self._values[index] for index in indices]
+
+    def take_ready(self):
+        """
+        Collect the files whose metadata was extracted since the last call, so their preview can be redrawn.
+
+        Returns:
+            list: File indices.
+        """
+        with self._lock:
+            ready, self._ready = self._ready, []
+        self._pending.difference_update(ready)
+        return ready
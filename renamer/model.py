@@ -0,0 +1,372 @@
+"""
+In-memory list of the files in the loaded folder, kept separately from any widget that displays it.
+"""
+import os
+import re
+from array import array
+
+from renamer.selection import runs
+from renamer.trace import tracer
+
+# Position of the files left out of the unfiltered order, such as files outside the duplicates view.
+HIDDEN = 0xFFFFFFFF
+# Columns the display order can be sorted by, see FileModel.sort_keys.
+SORT_COLUMNS = ("name", "extension", "size", "date")
+# Runs of digits, without their leading zeros.
+DIGIT_RUNS = re.compile(r"0*(\d+)")
+
+
+def _number_key(match):
+    digits = match.group(1)
+    return f"{len(digits):02d}{digits}"
+
+
+def natural_key(name):
+    """
+    Get a sort key comparing names regardless of case, with runs of digits compared as numbers, so "file2" comes
+    before "file10".
+
+    Each run of digits is prefixed with its length, which keeps the key a plain string: strings compare several
+    times faster than tuples of text and numbers, and take less memory for a large folder.
+
+    Args:
+        name (str): The name.
+
+    Returns:
+        str: The key.
+    """
+    return DIGIT_RUNS.sub(_number_key, name.casefold())
+
+
+class FileModel:
+    """
+    The scanned files of a folder and the order they are displayed in, stored as parallel arrays.
+
+    A file is identified by its index, which is the same in every array and never changes until the model is
+    cleared. Numbers are kept in typed arrays instead of one object per file, so a million files cost a few tens
+    of megabytes on top of the names themselves. Sorting only reorders the order array.
+
+    Attributes:
+        names (list): The file names, as paths relative to the loaded folder when subfolders are included.
+        name_starts (array): Where the base name starts in each file name, after its folder part.
+        split_points (array): Where the extension starts in each file name.
+        mtimes (array): Modification times, as seconds since the epoch.
+        mtime_ns (array): Modification times in nanoseconds, exact enough to tell whether a file changed.
+        sizes (array): File sizes in bytes.
+        inodes (array): Inode numbers (file index numbers on Windows).
+        devices (array): Device numbers of the file systems holding the files.
+        base_order (array): File indices in display order, before the filter.
+        filtered (set): Indices of the files the filter lets through, or None without a filter.
+        order (array): File indices in display order, after the filter. The same array as base_order without a
+            filter.
+    """
+
+    __slots__ = ("names", "name_starts", "split_points", "mtimes", "mtime_ns", "sizes", "inodes", "devices",
+                 "base_order", "filtered", "order", "_positions", "_scan_order", "_name_keys", "_extension_keys")
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self.order)
+
+    def clear(self):
+        """
+        Remove every file.
+        """
+        self.names = []
+        self.name_starts = array("I")
+        self.split_points = array("I")
+        self.mtimes = array("d")
+        self.mtime_ns = array("q")
+        self.sizes = array("q")
+        self.inodes = array("Q")
+        self.devices = array("Q")
+        self.base_order = array("I")
+        self.filtered = None
+        self.order = self.base_order
+        self._positions = None
+        self._scan_order = True
+        self._name_keys = []
+        self._extension_keys = []
+
+    def extend(self, scanned_files):
+        """
+        Append scanned files at the end of the display order. With a filter, they stay hidden until the filter is
+        set again.
+
+        Args:
+            scanned_files (list): ScannedFile tuples.
+        """
+        mark = tracer.start()
+        start = len(self.names)
+        names = self.names
+        name_starts = self.name_starts
+        split_points = self.split_points
+        splitext = os.path.splitext
+        separator = os.sep
+        for scanned_file in scanned_files:
+            name = scanned_file.name
+            names.append(name)
+            name_starts.append(name.rfind(separator) + 1)
+            split_points.append(len(name) - len(splitext(name)[1]))
+        self.mtimes.extend(scanned_file.mtime for scanned_file in scanned_files)
+        self.mtime_ns.extend(scanned_file.mtime_ns for scanned_file in scanned_files)
+        self.sizes.extend(scanned_file.size for scanned_file in scanned_files)
+        self.inodes.extend(scanned_file.inode for scanned_file in scanned_files)
+        self.devices.extend(scanned_file.device for scanned_file in scanned_files)
+        self.base_order.extend(range(start, len(names)))
+        self._positions = None
+        tracer.stop("model", mark, len(names) - start)
+
+    def index_at(self, position):
+        """
+        Get the index of the file displayed at a position.
+
+        Args:
+            position (int): The display position.
+
+        Returns:
+            int: The file index.
+        """
+        return self.order[position]
+
+    def name(self, index):
+        return self.names[index]
+
+    def split(self, index):
+        """
+        Get the name part and extension part of a file's base name, as os.path.splitext would return them.
+
+        Args:
+            index (int): The file index.
+
+        Returns:
+            tuple: The name part and the extension part.
+        """
+        name = self.names[index]
+        split_point = self.split_points[index]
+        return name[self.name_starts[index]:split_point], name[split_point:]
+
+    def directory(self, index):
+        """
+        Get the folder part of a file name, relative to the loaded folder.
+
+        Args:
+            index (int): The file index.
+
+        Returns:
+            str: The folder part, ending with a path separator, or "" for files directly in the loaded folder.
+        """
+        return self.names[index][:self.name_starts[index]]
+
+    def find(self, names, candidates=None):
+        """
+        Look up the indices of files by name.
+
+        Args:
+            names (iterable): The file names to look for.
+            candidates (iterable, optional): File indices to search first, such as the selection. The whole model is
+                only searched for names not found among them.
+
+        Returns:
+            dict: File index by name, for the names that were found.
+        """
+        wanted = set(names)
+        found = {}
+        if candidates is not None:
+            model_names = self.names
+            for index in candidates:
+                name = model_names[index]
+                if name in wanted:
+                    found[name] = index
+        if len(found) < len(wanted):
+            found.update((name, index) for index, name in enumerate(self.names) if name in wanted and name not in found)
+        return found
+
+    def rename(self, index, new_name):
+        """
+        Update the name of a file in place, keeping its position, metadata and index.
+
+        Args:
+            index (int): The file index.
+            new_name (str): The new file name.
+        """
+        self.names[index] = new_name
+        self.name_starts[index] = new_name.rfind(os.sep) + 1
+        self.split_points[index] = len(new_name) - len(os.path.splitext(new_name)[1])
+        if index < len(self._name_keys):
+            self._name_keys[index] = natural_key(new_name)
+        if index < len(self._extension_keys):
+            self._extension_keys[index] = new_name[self.split_points[index]:].casefold()
+
+    def apply_renames(self, renames, candidates=None):
+        """
+        Patch the model after a batch of renames, instead of scanning the folder again.
+
+        Args:
+            renames (list): (original_file_name, new_file_name) pairs, as returned by apply_plan.
+            candidates (iterable, optional): File indices likely to hold the renamed files, such as the selection.
+
+        Returns:
+            list: The indices of the renamed files.
+        """
+        index_by_name = self.find((original_file_name for original_file_name, new_file_name in renames), candidates)
+        renamed = []
+        for original_file_name, new_file_name in renames:
+            index = index_by_name.get(original_file_name)
+            if index is not None:
+                self.rename(index, new_file_name)
+                renamed.append(index)
+        return renamed
+
+    def set_order(self, indices):
+        """
+        Display only some files, in the given order. Sorting then reorders only these files.
+
+        Args:
+            indices (iterable): The file indices to display.
+        """
+        self._scan_order = isinstance(indices, range) and indices == range(len(self.names))
+        self.base_order = array("I", indices)
+        self._positions = None
+        self.apply_filter()
+
+    def reset_order(self):
+        """
+        Display every file again, in the order they were scanned.
+        """
+        self.set_order(range(len(self.names)))
+
+    def sort(self, key, reverse=False):
+        """
+        Reorder the display order.
+
+        Args:
+            key (callable): Function of a file index returning its sort key.
+            reverse (bool, optional): Sort in descending order.
+        """
+        self.set_order(sorted(self.base_order, key=key, reverse=reverse))
+
+    def sort_keys(self, column):
+        """
+        Get the sort key of every file for a column, indexed by file index.
+
+        Name and extension keys are computed the first time they are asked for, then only for files added or
+        renamed since, so sorting again costs a sort of the order and nothing per name.
+
+        Args:
+            column (str): One of SORT_COLUMNS.
+
+        Returns:
+            list: The keys, or the size or modification time array itself.
+
+        Raises:
+            ValueError: If the column is not one of SORT_COLUMNS.
+        """
+        names = self.names
+        if column == "name":
+            keys = self._name_keys
+            keys.extend(natural_key(name) for name in names[len(keys):])
+        elif column == "extension":
+            keys = self._extension_keys
+            split_points = self.split_points
+            keys.extend(names[index][split_points[index]:].casefold() for index in range(len(keys), len(names)))
+        elif column == "size":
+            keys = self.sizes
+        elif column == "date":
+            keys = self.mtimes
+        else:
+            raise ValueError(f"Cannot sort by {column!r}, expected one of {', '.join(SORT_COLUMNS)}")
+        return keys
+
+    def sort_by(self, columns):
+        """
+        Reorder the display order by several columns. Files equal in every column keep their relative order.
+
+        Args:
+            columns (list): (column, reverse) pairs, most significant first, where column is one of SORT_COLUMNS
+                and reverse sorts that column in descending order.
+        """
+        with tracer.span("sort", len(self.base_order)):
+            order = list(self.base_order)
+            # Sorting is stable, so sorting by each column from the least significant one gives the combined order.
+            for column, reverse in reversed(columns):
+                order.sort(key=self.sort_keys(column).__getitem__, reverse=reverse)
+            self.set_order(order)
+
+    @property
+    def in_scan_order(self):
+        """
+        Whether every file is displayed in the order it was scanned, so display positions are file indices.
+        """
+        return self._scan_order and self.filtered is None
+
+    def index_runs(self, start, stop):
+        """
+        Get the files displayed between two positions as ranges of consecutive file indices.
+
+        In scan order, or when every file is displayed and the positions cover them all, this is a single range
+        whatever its length.
+
+        Args:
+            start (int): The first display position.
+            stop (int): The position after the last one.
+
+        Returns:
+            list: (start, stop) pairs of file indices, stop excluded.
+        """
+        if self.in_scan_order:
+            return [(start, stop)] if start < stop else []
+        if start <= 0 and stop >= len(self.order) == len(self.names):
+            return [(0, len(self.names))] if self.names else []
+        return runs(sorted(self.order[start:stop]))
+
+    def indices_in_order(self, selection):
+        """
+        Get the selected files that are displayed, in display order.
+
+        Args:
+            selection (Selection): The selected file indices.
+
+        Returns:
+            list: File indices.
+        """
+        if self.in_scan_order:
+            return list(selection)
+        # A set answers membership faster than the binary search of the ranges, for a pass over every file.
+        selected = set(selection)
+        return [index for index in self.order if index in selected]
+
+    def set_filter(self, indices):
+        """
+        Display only the files among some indices, in the current order.
+
+        Args:
+            indices (set): Indices of the files to display, such as the matches of a NameIndex search, or None to
+                display every file.
+        """
+        self.filtered = indices
+        self.apply_filter()
+
+    def apply_filter(self):
+        """
+        Rebuild the filtered order after the filter or the order before it changed.
+
+        The matches are sorted by their position in the unfiltered order, so a filter letting few files through
+        costs little however many files are loaded. The positions are computed once per order.
+        """
+        if self.filtered is None:
+            self.order = self.base_order
+            return
+        if len(self.filtered) * 8 > len(self.base_order):
+            filtered = self.filtered
+            self.order = array("I", [index for index in self.base_order if index in filtered])
+            return
+        positions = self._positions
+        if positions is None or len(positions) != len(self.names):
+            positions = self._positions = array("I", [HIDDEN]) * len(self.names)
+            for position, index in enumerate(self.base_order):
+                positions[index] = position
+        self.order = array("I", sorted((index for index in self.filtered if positions[index] != HIDDEN),
+                                       key=positions.__getitem__))
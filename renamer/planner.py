@@ -0,0 +1,304 @@
+"""
+Turn a list of file names and a set of rules into a checked, ordered rename plan.
+"""
+import os
+
+from renamer.errors import RenameConflictError, RenameError
+from renamer.metadata import read_metadata
+from renamer.scanner import walk_folder
+from renamer.trace import tracer
+
+
+TEMPORARY_NAME = ".batch-renamer-{pid}-{number}.tmp"
+
+
+class RenamePlan:
+    """
+    The renames needed to apply a set of rules to a folder, checked as a whole before anything is renamed.
+
+    File names are relative to folder_path, so one plan can rename files in several subfolders. A file is never
+    moved to another folder.
+
+    Attributes:
+        folder_path (str): The folder the files live in.
+        renames (list): (original_file_name, new_file_name) pairs, one per file being renamed.
+        chains (list): Lists of (from_name, to_name) steps. Steps within a chain must be applied in order, so every
+            name is freed before it is reused and cycles go through a temporary name. Separate chains are
+            independent of each other and can be applied in any order, or in parallel.
+        steps (list): All steps, chain after chain.
+        unchanged (int): Number of files the rules left untouched.
+    """
+
+    def __init__(self, folder_path, renames, chains=None, unchanged=0):
+        self.folder_path = folder_path
+        self.renames = renames
+        self.chains = [[rename] for rename in renames] if chains is None else chains
+        self.steps = [step for chain in self.chains for step in chain]
+        self.unchanged = unchanged
+
+    def __len__(self):
+        return len(self.renames)
+
+    def __iter__(self):
+        return iter(self.renames)
+
+
+def list_files(folder_path, recursive=False, path_filter=None):
+    """
+    List the regular files in a folder.
+
+    Args:
+        folder_path (str): The folder to list.
+        recursive (bool, optional): Also list the files in every subfolder, as relative paths.
+        path_filter (PathFilter, optional): Include and exclude patterns.
+
+    Returns:
+        list: The file names, in directory order.
+    """
+    if recursive:
+        return [scanned_file.name for batch in walk_folder(folder_path, path_filter=path_filter)
+                for scanned_file in batch]
+    with tracer.span("scan") as span, os.scandir(folder_path) as entries:
+        file_names = [entry.name for entry in entries
+                      if entry.is_file() and (not path_filter or path_filter.accepts_file(entry.name, entry.name))]
+        span.items = len(file_names)
+    return file_names
+
+
+def list_names(folder_path, directories):
+    """
+    List everything present in some subfolders of a folder, to check new names against.
+
+    Args:
+        folder_path (str): The folder.
+        directories (iterable): Subfolder paths relative to folder_path, "" for the folder itself.
+
+    Returns:
+        list: The names of the files and folders found, relative to folder_path.
+    """
+    names = []
+    for directory in directories:
+        if directory:
+            prefix = directory + os.sep
+            names.extend(prefix + name for name in os.listdir(os.path.join(folder_path, directory)))
+        else:
+            names.extend(os.listdir(folder_path))
+    return names
+
+
+def list_existing(folder_path, file_names):
+    """
+    List everything present in the folders holding some files, so a plan can report every clash with a file outside
+    the batch before anything is renamed.
+
+    Args:
+        folder_path (str): The folder.
+        file_names (iterable): File names relative to folder_path.
+
+    Returns:
+        list: The names of the files and folders found, relative to folder_path.
+    """
+    return list_names(folder_path, {file_name.rpartition(os.sep)[0] for file_name in file_names})
+
+
+def stat_files(folder_path, file_names):
+    """
+    Read the modification time and size of files.
+
+    Args:
+        folder_path (str): The folder the files live in.
+        file_names (list): The file names, relative to folder_path.
+
+    Returns:
+        list: (mtime, size) of each file.
+
+    Raises:
+        RenameError: If a file cannot be read.
+    """
+    file_stats = []
+    for file_name in file_names:
+        try:
+            stat_result = os.stat(os.path.join(folder_path, file_name))
+        except OSError as e:
+            raise RenameError(f"Failed to read {file_name}. Error: {e}") from e
+        file_stats.append((stat_result.st_mtime, stat_result.st_size))
+    return file_stats
+
+
+def plan_renames(folder_path, file_names, rules, existing_files=None, file_stats=None, file_metadata=None):
+    """
+    Compute the new name of every file and check the whole batch before anything is renamed.
+
+    Args:
+        folder_path (str): The folder the files live in.
+        file_names (iterable): The names of the files to rename, relative to folder_path. The rules only change
+            the base name of files in subfolders.
+        rules (RenameRules): The rules to apply. Template counters number the files in the order given.
+        existing_files (iterable, optional): Names already present in the folder, such as the names the caller
+            just scanned. If omitted, the folders holding renamed files are listed.
+        file_stats (list, optional): (mtime, size) of each file, for templates using the date or size fields.
+            Read from disk if omitted and the template needs them.
+        file_metadata (list, optional): Metadata dict of each file, for templates using metadata fields. Read
+            through the metadata cache if omitted and the template needs it.
+
+    Returns:
+        RenamePlan: The renames to apply.
+
+    Raises:
+        RenameError: If the rules are invalid.
+        RenameConflictError: If the new names clash with each other or with files that are not being renamed.
+    """
+    rules.validate()
+    mark = tracer.start()
+    transform_batch = rules.compile_batch()
+    file_names = list(file_names)
+    mtimes = sizes = None
+    if rules.template_fields() & {"date", "taken", "size"}:
+        if file_stats is None:
+            file_stats = stat_files(folder_path, file_names)
+        mtimes = [mtime for mtime, size in file_stats]
+        sizes = [size for mtime, size in file_stats]
+    if file_metadata is None and rules.uses_metadata():
+        file_metadata = read_metadata(folder_path, file_names, digest=rules.uses_digest())
+
+    separator = os.sep
+    splitext = os.path.splitext
+    parts = [original_file_name.rpartition(separator) for original_file_name in file_names]
+    split_names = [splitext(base_name) for directory, separator_found, base_name in parts]
+    new_base_names = transform_batch([name_part for name_part, extension_part in split_names],
+                                     [extension_part for name_part, extension_part in split_names], mtimes, sizes,
+                                     file_metadata)
+
+    renames = []
+    unchanged = 0
+    for original_file_name, (directory, separator_found, base_name), new_file_name in zip(file_names, parts,
+                                                                                          new_base_names):
+        if separator_found:
+            new_file_name = directory + separator + new_file_name
+        if new_file_name == original_file_name:
+            unchanged += 1
+        else:
+            renames.append((original_file_name, new_file_name))
+
+    plan = plan_mapping(folder_path, renames, existing_files, unchanged)
+    tracer.stop("plan", mark, len(file_names))
+    return plan
+
+
+def plan_mapping(folder_path, renames, existing_files=None, unchanged=0):
+    """
+    Check a set of renames as a whole and order them so they can be applied one at a time.
+
+    Duplicate new names and clashes with files outside the batch are found in a single pass over hash tables, so
+    a rejected batch never touches the disk. Renames whose new name is still held by another file in the batch
+    are ordered after it, and cycles such as swaps are broken through a temporary name.
+
+    Args:
+        folder_path (str): The folder the files live in.
+        renames (list): (original_file_name, new_file_name) pairs, relative to folder_path.
+        existing_files (iterable, optional): Names already present in the folder. Listed from disk if omitted, for
+            every subfolder the renames touch. A file created after the plan is made is still never overwritten:
+            apply_plan stops and rolls back instead.
+        unchanged (int, optional): Number of files left untouched, recorded in the plan.
+
+    Returns:
+        RenamePlan: The checked and ordered plan.
+
+    Raises:
+        RenameConflictError: If the new names clash with each other or with files that are not being renamed.
+    """
+    separator = os.sep
+    if existing_files is None:
+        existing_files = list_existing(folder_path, [original_file_name for original_file_name, new_file_name
+                                                     in renames])
+    # Names are compared the way the file system compares them, so "A.txt" and "a.txt" clash on Windows.
+    normcase = os.path.normcase
+    existing_keys = {normcase(file_name) for file_name in existing_files}
+    target_by_source = {normcase(original_file_name): normcase(new_file_name)
+                        for original_file_name, new_file_name in renames}
+
+    conflicts = []
+    source_by_target = {}
+    for original_file_name, new_file_name in renames:
+        # The rules reject invalid characters in what the user typed; characters carried over from the original
+        # name are fine, except for path separators, which would move the file.
+        directory, separator_found, base_name = new_file_name.rpartition(separator)
+        if directory != original_file_name.rpartition(separator)[0] or "/" in base_name or "\0" in base_name:
+            raise RenameError(f"'{original_file_name}' would be renamed to '{new_file_name}', which is not a valid "
+                              f"file name.")
+        if base_name in ("", ".", ".."):
+            raise RenameError(f"'{original_file_name}' would be renamed to an empty name.")
+
+        target_key = normcase(new_file_name)
+        if target_key in source_by_target:
+            conflicts.append((original_file_name, new_file_name,
+                              f"'{source_by_target[target_key]}' and '{original_file_name}' would both be renamed "
+                              f"to '{new_file_name}'."))
+        elif target_key in existing_keys and target_key not in target_by_source:
+            conflicts.append((original_file_name, new_file_name,
+                              f"A file named '{new_file_name}' already exists."))
+        source_by_target[target_key] = original_file_name
+    if conflicts:
+        raise RenameConflictError(conflicts)
+
+    chains = order_steps(folder_path, renames, existing_keys | set(source_by_target))
+    return RenamePlan(folder_path, renames, chains, unchanged)
+
+
+def order_steps(folder_path, renames, taken_keys):
+    """
+    Order renames so no step overwrites a name another file in the batch still holds.
+
+    Every file has one new name and no two files share one, so the renames form simple chains and cycles. Each
+    chain is applied from its free end backwards; each cycle first moves one file to a temporary name.
+
+    Args:
+        folder_path (str): The folder the files live in, checked for a temporary name already on disk.
+        renames (list): (original_file_name, new_file_name) pairs without conflicts.
+        taken_keys (set): Normalized names that a temporary name must not reuse.
+
+    Returns:
+        list: One list of (from_name, to_name) steps per chain or cycle, each in the order to apply it.
+    """
+    normcase = os.path.normcase
+    rename_by_source = {normcase(original_file_name): (original_file_name, new_file_name)
+                        for original_file_name, new_file_name in renames}
+    # Maps a name to the rename that wants it as new name, i.e. the rename that has to wait for it to be freed.
+    waiting_on = {normcase(new_file_name): normcase(original_file_name)
+                  for original_file_name, new_file_name in renames}
+
+    chains = []
+    done = set()
+
+    def unwind(source_key, steps):
+        while source_key is not None and source_key not in done:
+            done.add(source_key)
+            steps.append(rename_by_source[source_key])
+            source_key = waiting_on.get(source_key)
+        return steps
+
+    for source_key, (original_file_name, new_file_name) in rename_by_source.items():
+        target_key = normcase(new_file_name)
+        # Same name up to case is a chain of its own: the file does not wait for itself.
+        if target_key not in rename_by_source or target_key == source_key:
+            chains.append(unwind(source_key, []))
+
+    temporary_number = 0
+    for source_key, (original_file_name, new_file_name) in rename_by_source.items():
+        if source_key in done:
+            continue
+        while True:
+            # In the folder of the cycle, since a rename cannot cross file systems.
+            temporary_name = os.path.join(os.path.dirname(original_file_name),
+                                          TEMPORARY_NAME.format(pid=os.getpid(), number=temporary_number))
+            temporary_number += 1
+            # The existing files given may be the scan of the caller, which does not list hidden or excluded files.
+            if (normcase(temporary_name) not in taken_keys
+                    and not os.path.lexists(os.path.join(folder_path, temporary_name))):
+                break
+        done.add(source_key)
+        steps = unwind(waiting_on.get(source_key), [(original_file_name, temporary_name)])
+        steps.append((temporary_name, new_file_name))
+        chains.append(steps)
+
+    return chains
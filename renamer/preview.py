@@ -0,0 +1,149 @@
+"""
+Previews of the new file names, computed on demand and cached until the rules change.
+"""
+from renamer.rules import RenameRules
+from renamer.template import EMPTY
+
+DEFAULT_CACHE_SIZE = 100_000
+# Shown instead of the new name while the file's metadata is being read.
+PENDING_PREVIEW = "(reading metadata...)"
+
+
+class PreviewEngine:
+    """
+    Compile the rename rules once per change and compute previews only for the files that are asked for.
+
+    The GUI asks for the rows it draws, so a keystroke costs one compile plus one transform per visible row,
+    however many files are selected. Previews are cached per file index until the rules change.
+
+    Attributes:
+        model (FileModel): The files being previewed.
+        sequence (callable): Returns the indices of the files a rename would apply to, in the order template
+            counters number them. Only called when the template uses a counter.
+        rules (RenameRules): The rules the cached previews were computed with.
+        transform (callable): The compiled rules.
+        cache_size (int): Maximum number of cached previews before the cache is emptied.
+        metadata (FolderMetadata): Where the metadata of the files comes from, for templates using metadata
+            fields. None previews them as if the files had no metadata.
+    """
+
+    def __init__(self, model, cache_size=DEFAULT_CACHE_SIZE, sequence=None, metadata=None):
+        self.model = model
+        self.sequence = sequence
+        self.metadata = metadata
+        self.rules = RenameRules()
+        self.transform = self.rules.compile()
+        self.uses_counter = False
+        self.uses_metadata = False
+        self.uses_digest = False
+        self.cache_size = cache_size
+        self._cache = {}
+        self._positions = None
+
+    def set_rules(self, rules):
+        """
+        Switch to new rules, recompiling them only if they differ from the current ones.
+
+        Args:
+            rules (RenameRules): The new rules.
+
+        Returns:
+            bool: True if the rules changed and previews must be redrawn.
+
+        Raises:
+            RenameError: If the rules cannot be compiled. The current rules are kept.
+        """
+        if rules == self.rules:
+            return False
+        self.transform = rules.compile()
+        self.rules = rules
+        self.uses_counter = "counter" in rules.template_fields()
+        self.uses_metadata = rules.uses_metadata()
+        self.uses_digest = rules.uses_digest()
+        # The file pattern decides which files counters number.
+        self._positions = None
+        self._cache.clear()
+        return True
+
+    def sequence_changed(self):
+        """
+        Note that the files a rename would apply to, or their order, changed. Only forgets the cached previews if
+        the template numbers the files.
+        """
+        self._positions = None
+        if self.uses_counter:
+            self._cache.clear()
+
+    def selection_changed(self, added, removed):
+        """
+        Note a change of the selection. Previews only depend on it through template counters, which number the
+        selected files in display order.
+
+        In scan order, only the files after the first added or removed one are renumbered, so the previews before
+        it stay cached.
+
+        Args:
+            added (Selection): The files selected by the change.
+            removed (Selection): The files deselected by the change.
+        """
+        if not self.uses_counter or not (added or removed):
+            return
+        self._positions = None
+        if not self.model.in_scan_order:
+            self._cache.clear()
+            return
+        first = min(changed.starts[0] for changed in (added, removed) if changed)
+        for index in [index for index in self._cache if index >= first]:
+            del self._cache[index]
+
+    def preview(self, index):
+        """
+        Get the new name of a file under the current rules, including its folder part.
+
+        Args:
+            index (int): The file index in the model.
+
+        Returns:
+            str: The new file name, or PENDING_PREVIEW while the metadata it depends on is being read. A pending
+            preview is not cached; the caller redraws it once the metadata is ready.
+        """
+        cache = self._cache
+        new_file_name = cache.get(index)
+        if new_file_name is None:
+            if len(cache) >= self.cache_size:
+                cache.clear()
+            model = self.model
+            if self.uses_counter:
+                if self._positions is None:
+                    sequence = self.sequence() if self.sequence is not None else ()
+                    file_filter = self.rules.file_filter()
+                    if file_filter is not None:
+                        # Counters skip the files the file pattern leaves alone, as in the renamed batch.
+                        sequence = [file_index for file_index in sequence
+                                    if file_filter("".join(model.split(file_index)))]
+                    self._positions = {file_index: number for number, file_index in enumerate(sequence)}
+                number = self._positions.get(index, 0)
+            else:
+                number = 0
+            metadata = EMPTY
+            if self.uses_metadata and self.metadata is not None:
+                metadata = self.metadata.get(index, self.uses_digest)
+                if metadata is None:
+                    return PENDING_PREVIEW
+            new_file_name = model.directory(index) + self.transform(*model.split(index), number, model.mtimes[index],
+                                                                     model.sizes[index], metadata)
+            cache[index] = new_file_name
+        return new_file_name
+
+    def invalidate(self, indices=None):
+        """
+        Forget cached previews, for example after the model changed.
+
+        Args:
+            indices (iterable, optional): The file indices to forget. Forgets everything if omitted.
+        """
+        if indices is None:
+            self._cache.clear()
+        else:
+            for index in indices:
+                self._cache.pop(index, None)
@@ -0,0 +1,128 @@
+"""
+Rename recipes: the rules and scan options of a rename, saved as JSON so the same rename can be applied to many
+folders, from the GUI or the command line.
+"""
+import json
+
+from renamer.errors import RenameError
+from renamer.rules import RenameRules
+from renamer.scanner import PathFilter
+
+RECIPE_VERSION = 1
+# The RenameRules attributes saved in a recipe, with the type each must have.
+RULE_FIELDS = {"replace_text": str, "new_text": str, "case_conversion": str, "prefix": str, "suffix": str,
+               "use_regex": bool, "ignore_case": bool, "file_pattern": str, "template": str}
+
+
+class Recipe:
+    """
+    The rules of a rename and the files of a folder they apply to.
+
+    The rules already chain every rename step in one pass, case conversion, replace, prefix/suffix and template, so
+    a recipe holds a single RenameRules.
+
+    Attributes:
+        rules (RenameRules): The rename rules.
+        recursive (bool): Also rename the files in every subfolder.
+        include (list): Glob patterns a file name must match to be renamed, or empty for every file.
+        exclude (list): Glob patterns of files and subfolders to skip.
+    """
+
+    def __init__(self, rules=None, recursive=False, include=(), exclude=()):
+        self.rules = rules if rules is not None else RenameRules()
+        self.recursive = recursive
+        self.include = list(include)
+        self.exclude = list(exclude)
+
+    def __eq__(self, other):
+        if not isinstance(other, Recipe):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def path_filter(self):
+        """
+        Returns:
+            PathFilter: The include and exclude patterns, or None if there are none.
+        """
+        return PathFilter(self.include, self.exclude) if self.include or self.exclude else None
+
+    def to_dict(self):
+        """
+        Convert the recipe to plain values, as saved in a recipe file.
+
+        Returns:
+            dict: The recipe.
+        """
+        return {"version": RECIPE_VERSION, "rules": {field: getattr(self.rules, field) for field in RULE_FIELDS},
+                "recursive": self.recursive, "include": list(self.include), "exclude": list(self.exclude)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a recipe from the plain values of a recipe file, checking them on the way.
+
+        Missing rule fields keep their default, so recipes saved before a field existed still load.
+
+        Args:
+            data (dict): The recipe, as returned by to_dict.
+
+        Returns:
+            Recipe: The recipe.
+
+        Raises:
+            RenameError: If the values are not a valid recipe, or the rules are invalid.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("rules", {}), dict):
+            raise RenameError("A recipe must be a JSON object with a \"rules\" object.")
+        version = data.get("version", RECIPE_VERSION)
+        if not isinstance(version, int) or version > RECIPE_VERSION:
+            raise RenameError(f"Unsupported recipe format {version!r}; it may come from a newer version.")
+        rule_values = data.get("rules", {})
+        for field, value in rule_values.items():
+            if field not in RULE_FIELDS:
+                raise RenameError(f"Unknown rule '{field}' in the recipe.")
+            if not isinstance(value, RULE_FIELDS[field]):
+                raise RenameError(f"The rule '{field}' of the recipe must be a {RULE_FIELDS[field].__name__}.")
+        patterns = {key: data.get(key, []) for key in ("include", "exclude")}
+        for key, value in patterns.items():
+            if not isinstance(value, list) or not all(isinstance(pattern, str) for pattern in value):
+                raise RenameError(f"The '{key}' patterns of the recipe must be a list of strings.")
+        rules = RenameRules(**rule_values)
+        rules.validate()
+        return cls(rules, bool(data.get("recursive", False)), patterns["include"], patterns["exclude"])
+
+    def save(self, path):
+        """
+        Write the recipe to a JSON file.
+
+        Args:
+            path (str): The file to write.
+
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
+            file.write("\n")
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a recipe from a JSON file.
+
+        Args:
+            path (str): The file to read.
+
+        Returns:
+            Recipe: The recipe.
+
+        Raises:
+            OSError: If the file cannot be read.
+            RenameError: If the file is not a valid recipe.
+        """
+        with open(path, encoding="utf-8") as file:
+            try:
+                data = json.load(file)
+            except ValueError as e:
+                raise RenameError(f"{path} is not a recipe file: {e}") from e
+        return cls.from_dict(data)
@@ -0,0 +1,349 @@
+"""
+Rename rules shared by the GUI preview, the rename buttons and the command line.
+"""
+import functools
+import os
+import re
+from itertools import accumulate, count, repeat
+
+from renamer.errors import RenameError
+from renamer.scanner import compile_patterns, split_patterns
+from renamer.template import EMPTY, parse_template
+
+INVALID_CHARACTERS = ("<", ">", ":", "\"", "/", "\\", "|", "?", "*")
+CASE_CONVERSIONS = {
+    "none": None,
+    "lowercase": str.lower,
+    "uppercase": str.upper,
+    "titlecase": str.title,
+}
+# Number of compiled patterns kept, so editing the pattern and going back does not recompile it.
+PATTERN_CACHE_SIZE = 256
+# Escapes in a regex replacement: group references and escaped characters.
+TEMPLATE_ESCAPE = re.compile(r"\\(?:g<[^>]*>|\d{1,2}|.)")
+
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_regex(pattern, flags=0):
+    """
+    Compile a regular expression, keeping the most recently used ones.
+
+    Args:
+        pattern (str): The regular expression.
+        flags (int, optional): re flags such as re.IGNORECASE.
+
+    Returns:
+        re.Pattern: The compiled expression.
+
+    Raises:
+        RenameError: If the pattern is not a valid regular expression.
+    """
+    try:
+        return re.compile(pattern, flags)
+    except re.error as e:
+        raise RenameError(f"'{pattern}' is not a valid regular expression: {e}.") from e
+
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_template(regex, template):
+    """
+    Turn a regex replacement into a function of the match built on str.format, keeping the most recently used ones.
+
+    re expands group references in Python code for every match, which makes a regex rename several times slower
+    than the match itself. Templates using other escapes than group references and \\\\ are returned unchanged.
+
+    Args:
+        regex (re.Pattern): The compiled expression the template refers to.
+        template (str): A valid replacement, such as "photo-\\1" or "\\g<year>".
+
+    Returns:
+        The replacement to pass to regex.sub: a function of the match, or the template itself.
+    """
+    if "\\" not in template:
+        return template
+    parts = []
+    position = 0
+    for reference in TEMPLATE_ESCAPE.finditer(template):
+        text = reference.group()[1:]
+        if text == "\\":
+            replacement = "\\"
+        elif text.startswith("g<"):
+            name = text[2:-1]
+            replacement = f"{{{int(name) if name.isdigit() else regex.groupindex[name]}}}"
+        elif text.isdigit() and text[0] != "0" and not template[reference.end():reference.end() + 1].isdigit():
+            replacement = f"{{{int(text)}}}"
+        else:
+            return template
+        parts.append(template[position:reference.start()].replace("{", "{{").replace("}", "}}"))
+        parts.append(replacement)
+        position = reference.end()
+    parts.append(template[position:].replace("{", "{{").replace("}", "}}"))
+    format_replacement = "".join(parts).format
+    return lambda match: format_replacement(match.group(), *match.groups(""))
+
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_glob(patterns):
+    """
+    Compile glob patterns separated by ";", keeping the most recently used ones.
+
+    Args:
+        patterns (str): The patterns, such as "*.jpg; IMG_*".
+
+    Returns:
+        callable: Returns a match for a normalized file name matching any of the patterns, or None if there are no
+        patterns.
+    """
+    return compile_patterns(split_patterns(patterns))
+
+
+def replacement_text(regex, template):
+    """
+    Get the text a regex replacement adds to a name besides the groups it copies from the match, with its escapes
+    expanded, so "\\\\" is checked as the backslash it produces.
+
+    Args:
+        regex (re.Pattern): The compiled expression the template refers to.
+        template (str): A valid replacement.
+
+    Returns:
+        str: The replacement with every group reference empty.
+    """
+    names = {index: name for name, index in regex.groupindex.items()}
+    # The same groups, named the same way, all matching the empty string, expand the template through re itself.
+    empty_groups = "".join(f"(?P<{names[index]}>)" if index in names else "()" for index in range(1, regex.groups + 1))
+    return compile_regex(empty_groups).sub(template, "", count=1)
+
+
+def check_invalid_characters(text):
+    """
+    Find the first character in text that is not allowed in a file name.
+
+    Args:
+        text (str): The text to check.
+
+    Returns:
+        str: The offending character, or None if the text is valid.
+    """
+    for character in INVALID_CHARACTERS:
+        if character in text:
+            return character
+    return None
+
+
+class RenameRules:
+    """
+    The rename options entered by the user, applied to the name part of a file in a fixed order:
+    case conversion, then replace, then prefix/suffix, then the template. Only the template can change the extension.
+
+    Attributes:
+        replace_text (str): Text to search for in the name part. Empty disables the replace step.
+        new_text (str): Text that replaces every occurrence of replace_text.
+        case_conversion (str): One of "none", "lowercase", "uppercase" or "titlecase".
+        prefix (str): Text added in front of the name part.
+        suffix (str): Text added after the name part, before the extension.
+        use_regex (bool): Treat replace_text as a regular expression and new_text as its replacement, which may
+            refer to groups as \\1 or \\g<name>.
+        ignore_case (bool): Match replace_text regardless of case.
+        file_pattern (str): Glob patterns separated by ";". Only files whose name matches one are renamed; empty
+            renames every file.
+        template (str): Name template building the whole new name, such as "{date:%Y%m%d}_{counter:05}_{stem}{ext}",
+            where {stem} is the name part after the other rules. See renamer.template. Empty keeps "{stem}{ext}".
+    """
+
+    def __init__(self, replace_text="", new_text="", case_conversion="none", prefix="", suffix="", use_regex=False,
+                 ignore_case=False, file_pattern="", template=""):
+        self.replace_text = replace_text
+        self.new_text = new_text
+        self.case_conversion = case_conversion or "none"
+        self.prefix = prefix
+        self.suffix = suffix
+        self.use_regex = use_regex
+        self.ignore_case = ignore_case
+        self.file_pattern = file_pattern
+        self.template = template
+
+    def __eq__(self, other):
+        if not isinstance(other, RenameRules):
+            return NotImplemented
+        return vars(self) == vars(other)
+
+    def validate(self):
+        """
+        Check that the rules can only produce valid file names.
+
+        Raises:
+            RenameError: If a rule contains an invalid character or an unknown case conversion, or if the regular
+                expression, its replacement or the template is invalid.
+        """
+        if self.case_conversion not in CASE_CONVERSIONS:
+            raise RenameError(f"Unknown case conversion '{self.case_conversion}'.")
+        new_text = self.new_text
+        if self.use_regex:
+            regex, replacement = self.compile_replace()
+            if regex is not None:
+                new_text = replacement_text(regex, new_text)
+        literals = parse_template(self.template).literals if self.template else []
+        for text in (new_text, self.prefix, self.suffix, *literals):
+            invalid_char = check_invalid_characters(text)
+            if invalid_char:
+                raise RenameError(f"You can't use '{invalid_char}' in the file name")
+
+    def compile_replace(self):
+        """
+        Compile the replace step into a regular expression, unless it is a plain case-sensitive replace.
+
+        Returns:
+            tuple: The compiled expression and the replacement to pass to its sub method, or (None, None) for a
+            plain replace.
+
+        Raises:
+            RenameError: If the regular expression or its replacement is invalid.
+        """
+        if not self.replace_text or not (self.use_regex or self.ignore_case):
+            return None, None
+        flags = re.IGNORECASE if self.ignore_case else 0
+        if not self.use_regex:
+            return compile_regex(re.escape(self.replace_text), flags), self.new_text.replace("\\", "\\\\")
+        regex = compile_regex(self.replace_text, flags)
+        try:
+            # The replacement is parsed even when nothing matches, which catches bad escapes and group references.
+            regex.sub(self.new_text, "")
+        except (re.error, IndexError) as e:
+            raise RenameError(f"'{self.new_text}' is not a valid replacement: {e}.") from e
+        return regex, compile_template(regex, self.new_text)
+
+    def template_fields(self):
+        """
+        Get the fields the template uses, so callers only gather the file data it needs.
+
+        Returns:
+            set: Field names such as "counter", "date" or "size". Empty without a template.
+        """
+        return parse_template(self.template).fields if self.template else set()
+
+    def uses_metadata(self):
+        """
+        Check whether the template uses fields read from the files' metadata, such as a photo's capture date.
+
+        Returns:
+            bool: True if metadata must be read before applying the rules.
+        """
+        return bool(self.template) and parse_template(self.template).uses_metadata()
+
+    def uses_digest(self):
+        """
+        Check whether the template uses the content digest of the files, which means reading them whole.
+
+        Returns:
+            bool: True if the template uses the hash field.
+        """
+        return "hash" in self.template_fields()
+
+    def file_filter(self):
+        """
+        Build the test of file_pattern, which template counters also follow: they only number the files it matches.
+
+        Returns:
+            callable: Tells whether a file name, without its folder part, matches the pattern. None if every file
+            is renamed.
+        """
+        file_match = compile_glob(self.file_pattern) if self.file_pattern else None
+        if file_match is None:
+            return None
+        normcase = os.path.normcase
+        return lambda file_name: file_match(normcase(file_name)) is not None
+
+    def template_only(self):
+        """
+        Check whether the template is the only active rule, so it can be evaluated without the other steps.
+
+        Returns:
+            bool: True if there is a template and no other rule.
+        """
+        return bool(self.template and not self.file_pattern and self.case_conversion == "none"
+                    and not self.replace_text and not self.prefix and not self.suffix)
+
+    def compile_batch(self):
+        """
+        Build a function that applies the rules to a whole batch at once, numbering the files in order. Files that
+        file_pattern skips are not numbered.
+
+        A template on its own is evaluated in a single list comprehension, without a function call per file.
+
+        Returns:
+            callable: A function taking lists (name_parts, extension_parts, mtimes=None, sizes=None,
+            file_metadata=None) and returning the list of new file names.
+
+        Raises:
+            RenameError: If the regular expression, its replacement or the template is invalid.
+        """
+        if self.template_only():
+            return parse_template(self.template).compile_batch()
+        transform = self.compile()
+        file_filter = self.file_filter()
+
+        def transform_batch(name_parts, extension_parts, mtimes=None, sizes=None, file_metadata=None):
+            numbers = count()
+            if file_filter is not None:
+                # Each file's number is the count of matching files before it.
+                numbers = accumulate(map(file_filter, map(str.__add__, name_parts, extension_parts)), initial=0)
+            return list(map(transform, name_parts, extension_parts, numbers,
+                            repeat(0.0) if mtimes is None else mtimes, repeat(0) if sizes is None else sizes,
+                            repeat(EMPTY) if file_metadata is None else file_metadata))
+
+        return transform_batch
+
+    def compile(self):
+        """
+        Build a single function that applies all active rules.
+
+        Patterns and templates come from caches, so recompiling the rules on every keystroke only compiles what
+        changed. A template on its own compiles to the template's function, with no wrapper around it.
+
+        Returns:
+            callable: A function taking (name_part, extension_part, number=0, mtime=0.0, size=0, metadata=EMPTY)
+            and returning the new file name. number is the 0-based position of the file in the batch; it and the
+            file's modification time, size and metadata dict are only used by templates.
+
+        Raises:
+            RenameError: If the regular expression, its replacement or the template is invalid.
+        """
+        case_function = CASE_CONVERSIONS.get(self.case_conversion)
+        replace_text = self.replace_text
+        new_text = self.new_text
+        prefix = self.prefix
+        suffix = self.suffix
+        regex, replacement = self.compile_replace()
+        file_match = compile_glob(self.file_pattern) if self.file_pattern else None
+        if self.template_only():
+            return parse_template(self.template).compile()
+        name_template = parse_template(self.template).compile() if self.template else None
+        normcase = os.path.normcase
+
+        def transform(name_part, extension_part, number=0, mtime=0.0, size=0, metadata=EMPTY):
+            if file_match is not None and not file_match(normcase(name_part + extension_part)):
+                return name_part + extension_part
+            if case_function is not None:
+                name_part = case_function(name_part)
+            if regex is not None:
+                name_part = regex.sub(replacement, name_part)
+            elif replace_text:
+                name_part = name_part.replace(replace_text, new_text)
+            if name_template is not None:
+                return name_template(f"{prefix}{name_part}{suffix}", extension_part, number, mtime, size, metadata)
+            return f"{prefix}{name_part}{suffix}{extension_part}"
+
+        return transform
+
+    def apply(self, file_name):
+        """
+        Apply the rules to a single file name.
+
+        Args:
+            file_name (str): The original file name.
+
+        Returns:
+            str: The new file name.
+        """
+        return self.compile()(*os.path.splitext(file_name))
@@ -0,0 +1,306 @@
+"""
+Directory scanning with os.scandir, in batches and optionally on a background thread.
+"""
+import fnmatch
+import os
+import queue
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from renamer.trace import tracer
+
+# mtime_ns and device complete the key of the metadata cache; they default to 0 when unknown.
+ScannedFile = namedtuple("ScannedFile", ["name", "mtime", "size", "inode", "mtime_ns", "device"], defaults=(0, 0))
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_WALK_WORKERS = 8
+# Maximum number of batches waiting for the consumer before the walk workers pause.
+WALK_QUEUE_SIZE = 64
+# Separates glob patterns typed in a single field.
+PATTERN_SEPARATOR = ";"
+
+
+def split_patterns(text):
+    """
+    Split a field of glob patterns separated by PATTERN_SEPARATOR, dropping empty ones.
+
+    Args:
+        text (str): The patterns, such as "*.jpg; *.png".
+
+    Returns:
+        list: The patterns.
+    """
+    return [pattern.strip() for pattern in text.split(PATTERN_SEPARATOR) if pattern.strip()]
+
+
+def compile_patterns(patterns):
+    """
+    Compile glob patterns into a single regular expression.
+
+    Args:
+        patterns (iterable): Glob patterns such as "*.jpg". Matching follows the platform's case rules.
+
+    Returns:
+        callable: Returns a match for a name matching any of the patterns, or None if there are no patterns.
+    """
+    patterns = [os.path.normcase(pattern) for pattern in patterns or () if pattern]
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in patterns)).match
+
+
+class PathFilter:
+    """
+    Include and exclude glob patterns, applied while walking so excluded subtrees are never read.
+
+    Include patterns are matched against file names. Exclude patterns are matched against both the name and the
+    path relative to the scanned folder, of files and of folders.
+
+    Attributes:
+        include (list): The include patterns. Every file is included if empty.
+        exclude (list): The exclude patterns.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        self.include = list(include or ())
+        self.exclude = list(exclude or ())
+        self._include_match = compile_patterns(self.include)
+        self._exclude_match = compile_patterns(self.exclude)
+
+    def __bool__(self):
+        return bool(self.include or self.exclude)
+
+    def excluded(self, name, relative_path):
+        exclude_match = self._exclude_match
+        if exclude_match is None:
+            return False
+        return bool(exclude_match(os.path.normcase(name)) or exclude_match(os.path.normcase(relative_path)))
+
+    def accepts_file(self, name, relative_path):
+        include_match = self._include_match
+        if include_match is not None and not include_match(os.path.normcase(name)):
+            return False
+        return not self.excluded(name, relative_path)
+
+
+def scan_entries(directory_path, relative_directory, path_filter, batch_size, cancel_event, on_directory=None):
+    """
+    Scan one directory, yielding its files in batches.
+
+    The file type and stat data come from the DirEntry objects returned by os.scandir, so no extra isfile or
+    getmtime call is made per file. Files that disappear during the scan are skipped.
+
+    Args:
+        directory_path (str): The directory to scan.
+        relative_directory (str): Its path relative to the scanned folder, prepended to the file names.
+        path_filter (PathFilter): Include and exclude patterns, or None.
+        batch_size (int): Maximum number of files per batch.
+        cancel_event (threading.Event): Stops the scan early when set, or None.
+        on_directory (callable, optional): Called with the relative path of each subdirectory that is not
+            excluded. Subdirectories are ignored if omitted.
+
+    Yields:
+        list: ScannedFile tuples.
+    """
+    batch = []
+    mark = tracer.start()
+    with os.scandir(directory_path) as entries:
+        for entry in entries:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            name = entry.name
+            relative_path = os.path.join(relative_directory, name) if relative_directory else name
+            try:
+                if not entry.is_file():
+                    if on_directory is not None and entry.is_dir(follow_symlinks=False):
+                        if not (path_filter and path_filter.excluded(name, relative_path)):
+                            on_directory(relative_path)
+                    continue
+                if path_filter and not path_filter.accepts_file(name, relative_path):
+                    continue
+                stat_result = entry.stat()
+            except OSError:
+                continue
+            batch.append(ScannedFile(relative_path, stat_result.st_mtime, stat_result.st_size, stat_result.st_ino,
+                                     stat_result.st_mtime_ns, stat_result.st_dev))
+            if len(batch) >= batch_size:
+                # Timed per batch, so the time spent by the consumer between batches is left out.
+                tracer.stop("scan", mark, len(batch))
+                yield batch
+                batch = []
+                mark = tracer.start()
+    tracer.stop("scan", mark, len(batch))
+    if batch:
+        yield batch
+
+
+def scan_folder(folder_path, batch_size=DEFAULT_BATCH_SIZE, cancel_event=None, path_filter=None):
+    """
+    Scan the regular files of a folder in batches, without descending into subfolders.
+
+    Args:
+        folder_path (str): The folder to scan.
+        batch_size (int, optional): Maximum number of files per batch.
+        cancel_event (threading.Event, optional): Stops the scan early when set.
+        path_filter (PathFilter, optional): Include and exclude patterns.
+
+    Yields:
+        list: ScannedFile tuples.
+    """
+    yield from scan_entries(folder_path, "", path_filter, batch_size, cancel_event)
+
+
+def walk_folder(folder_path, batch_size=DEFAULT_BATCH_SIZE, cancel_event=None, path_filter=None,
+                workers=DEFAULT_WALK_WORKERS):
+    """
+    Scan the regular files of a folder and all its subfolders in batches, scanning several folders in parallel.
+
+    Each worker scans one folder at a time and queues the subfolders it finds for the others. Batches go through a
+    bounded queue, so the workers wait for the consumer instead of building up the whole tree in memory, and the
+    first batches arrive while the walk is still going. File names are paths relative to folder_path. Subfolders
+    that cannot be read are skipped; symbolic links to folders are not followed.
+
+    Args:
+        folder_path (str): The folder to scan.
+        batch_size (int, optional): Maximum number of files per batch.
+        cancel_event (threading.Event, optional): Stops the walk early when set.
+        path_filter (PathFilter, optional): Include and exclude patterns, also used to prune subfolders.
+        workers (int, optional): Number of folders scanned at once.
+
+    Yields:
+        list: ScannedFile tuples.
+
+    Raises:
+        OSError: If folder_path itself cannot be read.
+    """
+    os.scandir(folder_path).close()
+    output = queue.Queue(maxsize=WALK_QUEUE_SIZE)
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = [0]
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def submit(relative_directory):
+        with lock:
+            pending[0] += 1
+        pool.submit(scan_directory, relative_directory)
+
+    def scan_directory(relative_directory):
+        try:
+            if not stop.is_set() and not (cancel_event is not None and cancel_event.is_set()):
+                for batch in scan_entries(os.path.join(folder_path, relative_directory), relative_directory,
+                                          path_filter, batch_size, cancel_event, submit):
+                    put(batch)
+        except OSError:
+            pass
+        finally:
+            with lock:
+                pending[0] -= 1
+                finished = pending[0] == 0
+            if finished:
+                put(None)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="walk")
+    try:
+        submit("")
+        while True:
+            batch = output.get()
+            if batch is None:
+                return
+            yield batch
+    finally:
+        stop.set()
+        pool.shutdown(wait=False)
+
+
+class FolderScan:
+    """
+    Run scan_folder or walk_folder on a worker thread and hand the batches over through a queue.
+
+    The consumer polls next_batch() from its own thread (the Tk main loop, for the GUI), so the scan never blocks it.
+    The queue is bounded, so a scan that runs ahead of the consumer waits instead of holding the whole folder tree.
+
+    Attributes:
+        folder_path (str): The folder being scanned.
+        recursive (bool): Whether subfolders are scanned too.
+        path_filter (PathFilter): Include and exclude patterns, or None.
+        row_factory (callable): Converts a ScannedFile into the row handed to the consumer. Runs on the worker thread.
+        batch_size (int): Maximum number of rows per batch.
+        scanned_count (int): Number of files scanned so far.
+        error (OSError): The error that stopped the scan, if any.
+    """
+
+    def __init__(self, folder_path, row_factory=None, batch_size=DEFAULT_BATCH_SIZE, recursive=False,
+                 path_filter=None):
+        self.folder_path = folder_path
+        self.row_factory = row_factory
+        self.batch_size = batch_size
+        self.recursive = recursive
+        self.path_filter = path_filter
+        self.scanned_count = 0
+        self.error = None
+        self._batches = queue.Queue(maxsize=WALK_QUEUE_SIZE)
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="FolderScan", daemon=True)
+
+    def start(self):
+        """
+        Start scanning on the worker thread.
+        """
+        self._thread.start()
+
+    def cancel(self):
+        """
+        Ask the worker to stop. Batches already queued can still be read.
+        """
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def done(self):
+        """
+        bool: True once the worker has stopped and every queued batch has been read.
+        """
+        return not self._thread.is_alive() and self._batches.empty()
+
+    def next_batch(self):
+        """
+        Get the next scanned batch without waiting.
+
+        Returns:
+            list: The next batch of rows, or None if none is ready yet.
+        """
+        try:
+            return self._batches.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        row_factory = self.row_factory
+        scan = walk_folder if self.recursive else scan_folder
+        try:
+            for batch in scan(self.folder_path, self.batch_size, self._cancel_event, self.path_filter):
+                if row_factory is not None:
+                    batch = [row_factory(scanned_file) for scanned_file in batch]
+                self.scanned_count += len(batch)
+                while True:
+                    try:
+                        self._batches.put(batch, timeout=0.1)
+                        break
+                    except queue.Full:
+                        if self._cancel_event.is_set():
+                            return
+        except OSError as e:
+            self.error = e
@@ -0,0 +1,119 @@
+"""
+Find files by part of their name without scanning every name, for the filter box above the file list.
+"""
+from array import array
+
+
+def trigrams(text):
+    """
+    Get the distinct three-character substrings of a text.
+
+    Args:
+        text (str): The text, already lowercased.
+
+    Returns:
+        set: The trigrams.
+    """
+    return set(map("".join, zip(text, text[1:], text[2:])))
+
+
+class NameIndex:
+    """
+    Trigram index over the lowercased names of a FileModel.
+
+    Each trigram maps to the indices of the files whose name contains it, so a search only looks at the files that
+    hold every trigram of the text searched for, then checks those few names. Texts shorter than three characters
+    have no trigram and are matched against the lowercased names directly, or against the previous matches when
+    the text extends the previous search, as it does while the user types.
+
+    The index is built as the folder loads, through catch_up, and kept up to date as files are renamed.
+
+    Attributes:
+        model (FileModel): The files.
+        lower_names (list): The lowercased name of each indexed file.
+        postings (dict): File indices by trigram, in arrays.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.clear()
+
+    def clear(self):
+        """
+        Forget every file, for when the model is emptied.
+        """
+        self.lower_names = []
+        self.postings = {}
+        self._last_text = None
+        self._last_matches = None
+
+    def _add(self, index, lower_name):
+        postings = self.postings
+        for trigram in trigrams(lower_name):
+            posting = postings.get(trigram)
+            if posting is None:
+                posting = postings[trigram] = array("I")
+            posting.append(index)
+
+    def catch_up(self):
+        """
+        Index the files added to the model since the last call. Searching calls it first.
+        """
+        names = self.model.names
+        lower_names = self.lower_names
+        if len(lower_names) == len(names):
+            return
+        for index in range(len(lower_names), len(names)):
+            lower_name = names[index].lower()
+            lower_names.append(lower_name)
+            self._add(index, lower_name)
+        self._last_text = None
+
+    def update(self, indices):
+        """
+        Index the new names of renamed files.
+
+        The old names' trigrams are left in place: a search checks every candidate's current name, so they only
+        cost a check until the index is built again.
+
+        Args:
+            indices (iterable): Indices of the renamed files.
+        """
+        names = self.model.names
+        for index in indices:
+            if index < len(self.lower_names):
+                lower_name = self.lower_names[index] = names[index].lower()
+                self._add(index, lower_name)
+        self._last_text = None
+
+    def search(self, text):
+        """
+        Find the files whose name contains every word of a text, regardless of case.
+
+        Args:
+            text (str): The words to look for, separated by spaces.
+
+        Returns:
+            set: The indices of the matching files.
+        """
+        self.catch_up()
+        text = text.lower()
+        words = text.split()
+        if not words:
+            return set(range(len(self.lower_names)))
+        if self._last_text is not None and text.startswith(self._last_text):
+            # Typing one more character only narrows the previous matches.
+            candidates = self._last_matches
+        else:
+            candidates = None
+            for word in words:
+                postings = sorted((self.postings.get(trigram, ()) for trigram in trigrams(word)), key=len)
+                for posting in postings:
+                    candidates = set(posting) if candidates is None else candidates.intersection(posting)
+            if candidates is None:
+                candidates = range(len(self.lower_names))
+        lower_names = self.lower_names
+        for word in words:
+            candidates = {index for index in candidates if word in lower_names[index]}
+        self._last_text, self._last_matches = text, candidates
+        return candidates
@@ -0,0 +1,260 @@
+"""
+The set of selected files, stored as ranges of file indices so selecting a whole folder costs the same as one file.
+"""
+from bisect import bisect_left, bisect_right
+
+
+class Selection:
+    """
+    Selected file indices, kept as sorted, disjoint half-open ranges.
+
+    Selecting all files of a folder listed in scan order, or a block of rows dragged over, is a single range, so
+    it costs the same as selecting one file. Membership is a binary search over the ranges.
+
+    Every change is recorded as the indices actually added and removed, so consumers can update only what
+    changed since they last looked, through take_changes.
+
+    Attributes:
+        starts (list): Start of each range.
+        stops (list): End of each range, excluded.
+    """
+
+    def __init__(self, indices=(), track_changes=True):
+        self.starts = []
+        self.stops = []
+        self._count = 0
+        self._added = Selection(track_changes=False) if track_changes else None
+        self._removed = Selection(track_changes=False) if track_changes else None
+        self.add_indices(indices)
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def __contains__(self, index):
+        position = bisect_right(self.starts, index) - 1
+        return position >= 0 and index < self.stops[position]
+
+    def __iter__(self):
+        for start, stop in zip(self.starts, self.stops):
+            yield from range(start, stop)
+
+    def ranges(self):
+        """
+        Get the selected ranges.
+
+        Returns:
+            list: (start, stop) pairs, in increasing order, stop excluded.
+        """
+        return list(zip(self.starts, self.stops))
+
+    def copy(self):
+        """
+        Copy the selected ranges, without the recorded changes.
+
+        Returns:
+            Selection: The copy.
+        """
+        selection = Selection()
+        selection.starts = list(self.starts)
+        selection.stops = list(self.stops)
+        selection._count = self._count
+        return selection
+
+    def _record(self, added, removed):
+        if self._added is None:
+            return
+        # Selecting an index deselected since the last take_changes only cancels that change, and the other way round.
+        for start, stop in added:
+            for new_start, new_stop in self._removed.clip(start, stop, inside=False):
+                self._added.add_range(new_start, new_stop)
+            self._removed.remove_range(start, stop)
+        for start, stop in removed:
+            for new_start, new_stop in self._added.clip(start, stop, inside=False):
+                self._removed.add_range(new_start, new_stop)
+            self._added.remove_range(start, stop)
+
+    def add_range(self, start, stop):
+        """
+        Select the indices from start to stop, stop excluded.
+
+        Returns:
+            list: The (start, stop) ranges that were not selected before.
+        """
+        if start >= stop:
+            return []
+        starts, stops = self.starts, self.stops
+        # Ranges overlapping or touching the new one are merged into it.
+        first = bisect_left(stops, start)
+        last = bisect_right(starts, stop)
+        added = []
+        cursor = start
+        for position in range(first, last):
+            if starts[position] > cursor:
+                added.append((cursor, starts[position]))
+            cursor = max(cursor, stops[position])
+        if cursor < stop:
+            added.append((cursor, stop))
+        if first < last:
+            start = min(start, starts[first])
+            stop = max(stop, stops[last - 1])
+        starts[first:last] = [start]
+        stops[first:last] = [stop]
+        self._count += sum(added_stop - added_start for added_start, added_stop in added)
+        self._record(added, ())
+        return added
+
+    def remove_range(self, start, stop):
+        """
+        Deselect the indices from start to stop, stop excluded.
+
+        Returns:
+            list: The (start, stop) ranges that were selected before.
+        """
+        if start >= stop:
+            return []
+        starts, stops = self.starts, self.stops
+        first = bisect_right(stops, start)
+        last = bisect_left(starts, stop)
+        if first >= last:
+            return []
+        removed = [(max(start, starts[position]), min(stop, stops[position])) for position in range(first, last)]
+        kept = []
+        if starts[first] < start:
+            kept.append((starts[first], start))
+        if stops[last - 1] > stop:
+            kept.append((stop, stops[last - 1]))
+        starts[first:last] = [kept_start for kept_start, kept_stop in kept]
+        stops[first:last] = [kept_stop for kept_start, kept_stop in kept]
+        self._count -= sum(removed_stop - removed_start for removed_start, removed_stop in removed)
+        self._record((), removed)
+        return removed
+
+    def add_indices(self, indices):
+        """
+        Select file indices given one by one, grouping consecutive ones into ranges.
+
+        Args:
+            indices (iterable): The indices, in any order.
+        """
+        for start, stop in runs(sorted(set(indices))):
+            self.add_range(start, stop)
+
+    def remove_indices(self, indices):
+        """
+        Deselect file indices given one by one.
+
+        Args:
+            indices (iterable): The indices, in any order.
+        """
+        for start, stop in runs(sorted(set(indices))):
+            self.remove_range(start, stop)
+
+    def toggle(self, index):
+        """
+        Select a file if it is not selected, deselect it otherwise.
+        """
+        if index in self:
+            self.remove_range(index, index + 1)
+        else:
+            self.add_range(index, index + 1)
+
+    def update(self, other):
+        """
+        Select every index of another selection as well.
+
+        Args:
+            other (Selection): The other selection.
+        """
+        for start, stop in zip(other.starts, other.stops):
+            self.add_range(start, stop)
+
+    def clear(self):
+        """
+        Deselect everything.
+        """
+        self._record((), self.ranges())
+        self.starts = []
+        self.stops = []
+        self._count = 0
+
+    def replace(self, ranges):
+        """
+        Select exactly the given ranges, recording only the difference with the current selection as changes.
+
+        Args:
+            ranges (list): (start, stop) pairs, in increasing order and disjoint.
+        """
+        wanted = Selection(track_changes=False)
+        wanted.starts = [start for start, stop in ranges]
+        wanted.stops = [stop for start, stop in ranges]
+        wanted._count = sum(stop - start for start, stop in ranges)
+        for start, stop in self.ranges():
+            for kept_start, kept_stop in wanted.clip(start, stop, inside=False):
+                self.remove_range(kept_start, kept_stop)
+        self.update(wanted)
+
+    def clip(self, start, stop, inside=True):
+        """
+        Get the parts of a range that are selected, or that are not.
+
+        Args:
+            start (int): Start of the range.
+            stop (int): End of the range, excluded.
+            inside (bool, optional): Return the selected parts if True, the unselected parts otherwise.
+
+        Returns:
+            list: (start, stop) pairs.
+        """
+        first = bisect_right(self.stops, start)
+        last = bisect_left(self.starts, stop)
+        selected = [(max(start, self.starts[position]), min(stop, self.stops[position]))
+                    for position in range(first, last)]
+        if inside:
+            return selected
+        gaps = []
+        cursor = start
+        for selected_start, selected_stop in selected:
+            if selected_start > cursor:
+                gaps.append((cursor, selected_start))
+            cursor = selected_stop
+        if cursor < stop:
+            gaps.append((cursor, stop))
+        return gaps
+
+    def take_changes(self):
+        """
+        Get the indices added to and removed from the selection since the last call, and start recording anew.
+
+        Returns:
+            tuple: (added, removed) Selections. An index selected then deselected in between appears in neither.
+        """
+        added, removed = self._added, self._removed
+        self._added = Selection(track_changes=False)
+        self._removed = Selection(track_changes=False)
+        return added, removed
+
+
+def runs(indices):
+    """
+    Group sorted indices into ranges of consecutive indices.
+
+    Args:
+        indices (iterable): Increasing indices.
+
+    Returns:
+        list: (start, stop) pairs, stop excluded.
+    """
+    ranges = []
+    start = previous = None
+    for index in indices:
+        if previous is None or index != previous + 1:
+            if previous is not None:
+                ranges.append((start, previous + 1))
+            start = index
+        previous = index
+    if previous is not None:
+        ranges.append((start, previous + 1))
+    return ranges
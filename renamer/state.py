@@ -0,0 +1,14 @@
+"""
+Where Batch Renamer keeps its state between runs: the rename journal and the metadata cache.
+"""
+import os
+
+
+def default_state_directory():
+    """
+    Get the directory where Batch Renamer keeps its journal and caches.
+
+    Returns:
+        str: $BATCH_RENAMER_HOME if set, otherwise ~/.batch-renamer.
+    """
+    return os.environ.get("BATCH_RENAMER_HOME") or os.path.join(os.path.expanduser("~"), ".batch-renamer")
@@ -0,0 +1,258 @@
+"""
+Name templates such as "{date:%Y%m%d}_{counter:05}_{stem}{ext}", parsed once and compiled to a single function.
+
+A template is made of literal text and fields in braces, written {field[slice]|filter:spec}:
+
+    stem        The name without its extension, after the other rules.
+    ext         The extension, with its leading dot.
+    name        stem and ext together.
+    counter     The position of the file in the batch, counted from 1 in steps of 1. {counter(100, 10)} starts at
+                100 and steps by 10. The spec pads it, as in {counter:05}.
+    date        The modification time. The spec is a strftime format, %Y-%m-%d by default.
+    size        The size in bytes. The spec is a number format, as in {size:,}.
+
+Photos and audio files add fields read from their metadata (see renamer.metadata), empty or 0 when missing:
+
+    taken       The EXIF capture date of a photo, formatted like date. Falls back to the modification time.
+    camera      The camera model of a photo.
+    artist, album, title
+                The ID3 tags of an audio file.
+    track, year The track number and year of an audio file, as numbers: {track:02}.
+    hash        The SHA-256 digest of the file's content, in hexadecimal. {hash[:12]} keeps the first 12 digits.
+
+The spec is applied first, then the slice (as in {stem[0:8]}), then the filters: lower, upper, title and strip.
+Literal braces are written {{ and }}.
+"""
+import functools
+import re
+import string
+import time
+from itertools import count
+
+from renamer.errors import RenameError
+
+METADATA_FIELDS = ("taken", "camera", "artist", "album", "title", "track", "year", "hash")
+FIELDS = ("stem", "ext", "name", "counter", "date", "size") + METADATA_FIELDS
+NUMBER_FIELDS = ("counter", "size", "track", "year")
+FILTERS = {"lower": ".lower()", "upper": ".upper()", "title": ".title()", "strip": ".strip()"}
+DEFAULT_DATE_FORMAT = "%Y-%m-%d"
+# Metadata of a file that has none, or whose metadata was not asked for.
+EMPTY = {}
+# Maximum number of formatted dates kept per date field.
+DATE_CACHE_SIZE = 100_000
+# Every UTC offset in use is a multiple of 15 minutes, so a format that stops at the hour gives the same text for
+# every time in the same 15-minute slot.
+DATE_SLOT_SECONDS = 900
+COARSE_DATE_DIRECTIVES = set("aAbBCdDeFgGhHIjmnpuUVwWxyYzZt%")
+# Literals and specs made only of these characters are written into the generated f-string as they are; anything
+# else is passed in as a named constant.
+PLAIN_TEXT = re.compile(r"^[\w .,;+=#%&@!~^()\[\]<>$'-]*$")
+FIELD_PATTERN = re.compile(r"^(?P<field>[a-z]+)(?:\((?P<arguments>[^)]*)\))?(?:\[(?P<slice>-?\d+|-?\d*:-?\d*)\])?"
+                           r"(?P<filters>(?:\|[a-z]+)*)$")
+
+
+def date_formatter(date_format):
+    """
+    Build a function formatting modification times, caching the text of each time slot.
+
+    The generated template code looks the slot up in the cache itself and only calls the function on a miss.
+
+    Args:
+        date_format (str): A strftime format.
+
+    Returns:
+        tuple: The cache lookup function, the slot length in seconds, and a function formatting a timestamp and
+        caching the result.
+    """
+    directives = set(re.findall(r"%(.)", date_format))
+    slot_seconds = DATE_SLOT_SECONDS if directives <= COARSE_DATE_DIRECTIVES else 1
+    cache = {}
+    strftime = time.strftime
+    localtime = time.localtime
+
+    def format_date(mtime):
+        slot = mtime // slot_seconds
+        if len(cache) >= DATE_CACHE_SIZE:
+            cache.clear()
+        text = cache[slot] = strftime(date_format, localtime(slot * slot_seconds))
+        return text
+
+    return cache.get, slot_seconds, format_date
+
+
+class NameTemplate:
+    """
+    A parsed name template.
+
+    Attributes:
+        text (str): The template as typed.
+        fields (set): The names of the fields the template uses.
+        literals (list): The literal text between the fields.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.fields = set()
+        self.literals = []
+        self._source = None
+        self._namespace = {"EMPTY": EMPTY}
+        self.parse()
+
+    def constant(self, prefix, value):
+        """
+        Add a named constant to the namespace of the generated code.
+
+        Returns:
+            str: The name of the constant.
+        """
+        name = f"{prefix}{len(self._namespace)}"
+        self._namespace[name] = value
+        return name
+
+    def parse(self):
+        """
+        Check the template and generate the source of its function.
+
+        Literals and specs are only pasted into the source when they are made of plain characters; anything else
+        becomes a named constant, so nothing typed in the template can change the generated code.
+
+        Raises:
+            RenameError: If the template is malformed or uses an unknown field or filter.
+        """
+        parts = []
+        try:
+            parsed = list(string.Formatter().parse(self.text))
+        except ValueError as e:
+            raise RenameError(f"Invalid template '{self.text}': {e}.") from e
+        for literal, field_text, spec, conversion in parsed:
+            if literal:
+                self.literals.append(literal)
+                parts.append(literal if PLAIN_TEXT.match(literal) else f"{{{self.constant('L', literal)}}}")
+            if field_text is None:
+                continue
+            if conversion is not None:
+                raise RenameError(f"Invalid template field '{{{field_text}!{conversion}}}'.")
+            parts.append(self.compile_field(field_text, spec or ""))
+        self._source = 'f"' + "".join(parts) + '"'
+
+    def compile_field(self, field_text, spec):
+        """
+        Generate the f-string replacement field of one template field.
+
+        Args:
+            field_text (str): The field without its spec, such as "stem[0:8]|lower".
+            spec (str): The spec, possibly empty.
+
+        Returns:
+            str: The replacement field, in braces.
+        """
+        match = FIELD_PATTERN.match(field_text)
+        if match is None or match["field"] not in FIELDS:
+            raise RenameError(f"Unknown template field '{{{field_text}}}'. Use one of: {', '.join(FIELDS)}.")
+        field = match["field"]
+        self.fields.add(field)
+
+        arguments = match["arguments"]
+        if arguments is not None and field != "counter":
+            raise RenameError(f"Only the counter field takes arguments, not '{{{field_text}}}'.")
+        if field == "counter":
+            try:
+                numbers = [int(argument) for argument in arguments.split(",")] if arguments else []
+                if len(numbers) > 2:
+                    raise ValueError
+            except ValueError:
+                raise RenameError(f"The counter takes a start and a step, as in {{counter(1, 1)}}, "
+                                  f"not '{{{field_text}}}'.") from None
+            start, step = numbers + [1, 1][len(numbers):]
+            value = f"({start} + number)" if step == 1 else f"({start} + {step} * number)"
+        elif field in ("date", "taken"):
+            lookup, slot_seconds, format_date = date_formatter(spec or DEFAULT_DATE_FORMAT)
+            timestamp = "mtime" if field == "date" else "metadata.get('taken', mtime)"
+            value = (f"({self.constant('G', lookup)}({timestamp} // {slot_seconds}) or "
+                     f"{self.constant('D', format_date)}({timestamp}))")
+            spec = ""
+        elif field in METADATA_FIELDS:
+            value = f"metadata.get('{field}', {0 if field in NUMBER_FIELDS else repr('')})"
+        else:
+            value = {"stem": "stem", "ext": "ext", "name": "(stem + ext)", "size": "size"}[field]
+
+        if spec:
+            sample = 1 if field in NUMBER_FIELDS else ""
+            try:
+                format(sample, spec)
+            except ValueError as e:
+                raise RenameError(f"Invalid format '{spec}' for the {field} field: {e}.") from e
+            if not match["slice"] and not match["filters"]:
+                return f"{{{value}:{spec if PLAIN_TEXT.match(spec) else '{' + self.constant('S', spec) + '}'}}}"
+            value = f"format({value}, {self.constant('S', spec)})"
+        elif match["slice"] or match["filters"]:
+            value = f"str({value})" if field in NUMBER_FIELDS else value
+
+        if match["slice"]:
+            value = f"{value}[{match['slice']}]"
+        for filter_name in match["filters"].split("|")[1:]:
+            if filter_name not in FILTERS:
+                raise RenameError(f"Unknown template filter '{filter_name}'. Use one of: {', '.join(FILTERS)}.")
+            value += FILTERS[filter_name]
+        return f"{{{value}}}"
+
+    def uses_metadata(self):
+        """
+        Check whether the template uses fields read from the files' metadata.
+
+        Returns:
+            bool: True if it does, so callers only read metadata when needed.
+        """
+        return not self.fields.isdisjoint(METADATA_FIELDS)
+
+    def compile(self):
+        """
+        Build the function evaluating the template in a single f-string.
+
+        Returns:
+            callable: A function taking (stem, ext, number, mtime, size, metadata), where number is the 0-based
+            position of the file in the batch and metadata a dict of metadata fields, and returning the new file name.
+        """
+        return eval(f"lambda stem, ext, number=0, mtime=0.0, size=0, metadata=EMPTY: {self._source}",
+                    dict(self._namespace))
+
+    def compile_batch(self):
+        """
+        Build a function evaluating the template for a whole batch in one list comprehension.
+
+        This saves the function call per file, which is most of the cost of a simple template.
+
+        Returns:
+            callable: A function taking lists (stems, exts, mtimes, sizes, file_metadata) and returning the new file
+            names, numbering the files from 0. mtimes, sizes and file_metadata may be None if the template does not
+            use them.
+        """
+        columns = [("number", "count()"), ("stem", "stems"), ("ext", "exts")]
+        if self.fields & {"date", "taken"}:
+            columns.append(("mtime", "mtimes"))
+        if "size" in self.fields:
+            columns.append(("size", "sizes"))
+        if self.uses_metadata():
+            columns.append(("metadata", "file_metadata"))
+        names = ", ".join(name for name, source in columns)
+        sources = ", ".join(source for name, source in columns)
+        namespace = dict(self._namespace, count=count)
+        return eval(f"lambda stems, exts, mtimes=None, sizes=None, file_metadata=None: "
+                    f"[{self._source} for {names} in zip({sources})]", namespace)
+
+
+@functools.lru_cache(maxsize=64)
+def parse_template(text):
+    """
+    Parse a template, keeping the most recently used ones.
+
+    Args:
+        text (str): The template.
+
+    Returns:
+        NameTemplate: The parsed template.
+
+    Raises:
+        RenameError: If the template is invalid.
+    """
+    return NameTemplate(text)
@@ -0,0 +1,264 @@
+"""
+Timings of the main phases (scanning, building the model, drawing rows, sorting, previewing and renaming), recorded
+in a ring buffer when turned on, for finding out what a slow or frozen session was doing.
+
+Recording is off by default. While it is off, each instrumented phase costs one attribute check.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_CAPACITY = 10_000
+# /proc/self/io counts the read and write system calls of the whole process. Sampling it is itself one read.
+PROC_IO_PATH = "/proc/self/io"
+
+
+class TraceEvent:
+    """
+    One recorded phase.
+
+    Attributes:
+        name (str): The phase, such as "scan" or "sort".
+        start_ns (int): When it started, in time.perf_counter_ns() nanoseconds.
+        duration_ns (int): How long it took, in nanoseconds.
+        thread_id (int): The thread it ran on.
+        thread_name (str): The name of that thread.
+        items (int): Number of files or rows it handled.
+        io_syscalls (int): Read and write system calls the process made meanwhile, or None where unknown. Other
+            threads running at the same time are counted as well; calls such as stat or rename are not.
+    """
+
+    __slots__ = ("name", "start_ns", "duration_ns", "thread_id", "thread_name", "items", "io_syscalls")
+
+    def __init__(self, name, start_ns, duration_ns, thread_id, thread_name, items, io_syscalls):
+        self.name = name
+        self.start_ns = start_ns
+        self.duration_ns = duration_ns
+        self.thread_id = thread_id
+        self.thread_name = thread_name
+        self.items = items
+        self.io_syscalls = io_syscalls
+
+
+class _SyscallCounter:
+    """
+    Reads the read and write system call counts of the process from /proc, keeping the file open so each sample
+    is one call.
+    """
+
+    def __init__(self):
+        self.fd = None
+        self.available = True
+        self.lock = threading.Lock()
+
+    def sample(self):
+        """
+        Returns:
+            int: Read and write system calls made by the process so far, or None where /proc is not available.
+        """
+        if not self.available:
+            return None
+        try:
+            with self.lock:
+                if self.fd is None:
+                    self.fd = os.open(PROC_IO_PATH, os.O_RDONLY)
+                text = os.pread(self.fd, 512, 0).decode("ascii")
+        except (OSError, AttributeError):
+            self.available = False
+            return None
+        counts = dict(line.split(": ") for line in text.splitlines())
+        return int(counts["syscr"]) + int(counts["syscw"])
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "items", "mark")
+
+    def __init__(self, tracer, name, items):
+        self.tracer = tracer
+        self.name = name
+        self.items = items
+        self.mark = None
+
+    def __enter__(self):
+        self.mark = self.tracer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.stop(self.name, self.mark, self.items)
+        return False
+
+
+class _NullSpan:
+    """
+    Stands in for a span while recording is off. Setting its items does nothing useful, and needs no check.
+    """
+
+    __slots__ = ("items",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Records the duration, item count and read and write system call count of each phase in a ring buffer of
+    recent events.
+
+    Phases are timed either with the span context manager, or with start and stop where a context manager does
+    not fit, such as around the batches a generator yields.
+
+    Attributes:
+        enabled (bool): Whether phases are recorded.
+        events (deque): The most recent TraceEvents, oldest first.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.enabled = False
+        self.events = deque(maxlen=capacity)
+        self.syscall_counter = _SyscallCounter()
+
+    def enable(self, capacity=None):
+        """
+        Start recording.
+
+        Args:
+            capacity (int, optional): Number of events to keep. Older events are dropped first.
+        """
+        if capacity is not None and capacity != self.events.maxlen:
+            self.events = deque(self.events, maxlen=capacity)
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stop recording, keeping the events recorded so far.
+        """
+        self.enabled = False
+
+    def clear(self):
+        self.events.clear()
+
+    def start(self):
+        """
+        Mark the start of a phase.
+
+        Returns:
+            tuple: The mark to pass to stop, or None while recording is off.
+        """
+        if not self.enabled:
+            return None
+        return time.perf_counter_ns(), self.syscall_counter.sample()
+
+    def stop(self, name, mark, items=0):
+        """
+        Record a phase started with start. Does nothing if recording was off when it started.
+
+        Args:
+            name (str): The phase.
+            mark (tuple): What start returned.
+            items (int, optional): Number of files or rows the phase handled.
+        """
+        if mark is None:
+            return
+        end_ns = time.perf_counter_ns()
+        start_ns, io_syscalls_before = mark
+        io_syscalls = None
+        if io_syscalls_before is not None:
+            io_syscalls_after = self.syscall_counter.sample()
+            if io_syscalls_after is not None:
+                # Less the read of the second sample.
+                io_syscalls = max(0, io_syscalls_after - io_syscalls_before - 1)
+        thread = threading.current_thread()
+        self.events.append(TraceEvent(name, start_ns, end_ns - start_ns, thread.ident, thread.name, items,
+                                      io_syscalls))
+
+    def span(self, name, items=0):
+        """
+        Time the phase inside a with block.
+
+        Args:
+            name (str): The phase.
+            items (int, optional): Number of files or rows the phase handles. Can also be set on the span inside
+                the block, once known.
+
+        Returns:
+            The context manager, which is a shared object doing nothing while recording is off.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, items)
+
+    def summary(self):
+        """
+        Sum up the recorded events per phase.
+
+        Returns:
+            dict: By phase, in the order each was first recorded, a dict with the event count, the total and last
+            durations in milliseconds, the total items and the total read and write system calls (None where
+            unknown).
+        """
+        phases = {}
+        for event in list(self.events):
+            phase = phases.get(event.name)
+            if phase is None:
+                phase = phases[event.name] = {"count": 0, "total_ms": 0.0, "last_ms": 0.0, "items": 0,
+                                              "io_syscalls": None}
+            phase["count"] += 1
+            phase["total_ms"] += event.duration_ns / 1e6
+            phase["last_ms"] = event.duration_ns / 1e6
+            phase["items"] += event.items
+            if event.io_syscalls is not None:
+                phase["io_syscalls"] = (phase["io_syscalls"] or 0) + event.io_syscalls
+        return phases
+
+    def chrome_trace(self):
+        """
+        Convert the recorded events to the Chrome trace event format, as loaded by chrome://tracing or Perfetto.
+
+        Returns:
+            dict: The trace, ready to be written as JSON.
+        """
+        pid = os.getpid()
+        events = list(self.events)
+        trace_events = []
+        thread_names = {}
+        for event in events:
+            thread_names.setdefault(event.thread_id, event.thread_name)
+            args = {"items": event.items}
+            if event.io_syscalls is not None:
+                args["io_syscalls"] = event.io_syscalls
+            trace_events.append({"name": event.name, "cat": "renamer", "ph": "X", "pid": pid, "tid": event.thread_id,
+                                 "ts": event.start_ns / 1000, "dur": event.duration_ns / 1000, "args": args})
+        for thread_id, thread_name in thread_names.items():
+            trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id,
+                                 "args": {"name": thread_name}})
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        """
+        Write the recorded events to a Chrome trace event JSON file.
+
+        Args:
+            path (str): The file to write.
+
+        Returns:
+            int: The number of events written.
+
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        trace = self.chrome_trace()
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(trace, file)
+        return sum(1 for event in trace["traceEvents"] if event["ph"] == "X")
+
+
+# The tracer every instrumented phase records to.
+tracer = Tracer()
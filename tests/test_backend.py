@@ -0,0 +1,95 @@
+import errno
+
+import pytest
+
+from renamer import FolderRenamer
+from renamer.backend import _renameat2
+
+from tests import contents, make_files
+
+METHODS = ["renameat2", "link", "rename"]
+
+
+@pytest.fixture
+def renamer(tmp_path):
+    with FolderRenamer(str(tmp_path)) as renamer:
+        yield renamer
+
+
+def use_method(renamer, method):
+    if method == "renameat2" and (_renameat2 is None or renamer.dir_fd is None):
+        pytest.skip("renameat2 is not available here")
+    renamer.method = method
+    renamer.can_exchange = method == "renameat2"
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_rename(tmp_path, renamer, method):
+    use_method(renamer, method)
+    make_files(tmp_path, "a")
+    renamer.rename("a", "b")
+    assert contents(tmp_path) == {"b": "a"}
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_rename_never_overwrites(tmp_path, renamer, method):
+    use_method(renamer, method)
+    make_files(tmp_path, "a", "b")
+    with pytest.raises(FileExistsError):
+        renamer.rename("a", "b")
+    assert contents(tmp_path) == {"a": "a", "b": "b"}
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_case_only_rename(tmp_path, renamer, method):
+    use_method(renamer, method)
+    make_files(tmp_path, "a")
+    renamer.rename("a", "A")
+    assert contents(tmp_path) == {"A": "a"}
+
+
+def test_unsupported_renameat2_falls_back_to_links(tmp_path, renamer, monkeypatch):
+    use_method(renamer, "renameat2")
+
+    def unsupported(from_name, to_name, flags):
+        raise OSError(errno.EINVAL, "unsupported")
+
+    monkeypatch.setattr(renamer, "_renameat2", unsupported)
+    make_files(tmp_path, "a", "b")
+    with pytest.raises(FileExistsError):
+        renamer.rename("a", "b")
+    assert renamer.method == "link"
+    assert contents(tmp_path) == {"a": "a", "b": "b"}
+
+
+def test_unsupported_links_fall_back_to_checked_rename(tmp_path, renamer, monkeypatch):
+    use_method(renamer, "link")
+
+    def unsupported(*args, **kwargs):
+        raise OSError(errno.EPERM, "unsupported")
+
+    monkeypatch.setattr("os.link", unsupported)
+    make_files(tmp_path, "a", "b")
+    with pytest.raises(FileExistsError):
+        renamer.rename("a", "b")
+    assert renamer.method == "rename"
+    assert contents(tmp_path) == {"a": "a", "b": "b"}
+    renamer.rename("a", "c")
+    assert contents(tmp_path) == {"b": "b", "c": "a"}
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_exchange(tmp_path, renamer, method):
+    use_method(renamer, method)
+    make_files(tmp_path, "a", "b")
+    swapped = renamer.exchange("a", "b")
+    assert swapped == (method == "renameat2")
+    assert contents(tmp_path) == ({"a": "b", "b": "a"} if swapped else {"a": "a", "b": "b"})
+
+
+def test_identity_follows_the_file(tmp_path, renamer):
+    make_files(tmp_path, "a", "b")
+    identity = renamer.identity("a")
+    renamer.rename("a", "c")
+    assert renamer.identity("c") == identity != renamer.identity("b")
+    assert renamer.identity("a") is None
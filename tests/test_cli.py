@@ -0,0 +1,163 @@
+import pytest
+
+from renamer import RenameJournal, plan_mapping
+from renamer.cli import main
+
+from tests import contents, make_files
+from tests.test_journal import interrupt
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    home = tmp_path / "home"
+    monkeypatch.setenv("BATCH_RENAMER_HOME", str(home))
+    return home
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "files"
+    folder.mkdir()
+    return folder
+
+
+def test_dry_run_renames_nothing(folder, capsys):
+    make_files(folder, "IMG_1.jpg", "notes.txt")
+    assert main([str(folder), "--replace", "IMG_", "--with", "holiday_", "--dry-run"]) == 0
+    output = capsys.readouterr().out
+    assert "IMG_1.jpg -> holiday_1.jpg" in output
+    assert "1 file(s) would be renamed." in output
+    assert contents(folder) == {"IMG_1.jpg": "IMG_1.jpg", "notes.txt": "notes.txt"}
+
+
+def test_rename(folder, capsys):
+    make_files(folder, "a.txt", "b.txt")
+    assert main([str(folder), "--prefix", "new_", "--quiet"]) == 0
+    assert capsys.readouterr().out == "2 file(s) renamed.\n"
+    assert contents(folder) == {"new_a.txt": "a.txt", "new_b.txt": "b.txt"}
+
+
+def test_clash_renames_nothing(folder, capsys):
+    make_files(folder, "a.txt", "b.txt")
+    assert main([str(folder), "--replace", "a", "--with", "b"]) == 1
+    assert "already exists" in capsys.readouterr().err
+    assert contents(folder) == {"a.txt": "a.txt", "b.txt": "b.txt"}
+
+
+def test_invalid_rules_exit_with_status_1(folder, capsys):
+    make_files(folder, "a.txt")
+    assert main([str(folder), "--prefix", "a:"]) == 1
+    assert "can't use ':'" in capsys.readouterr().err
+    assert contents(folder) == {"a.txt": "a.txt"}
+
+
+def test_regex_rename(folder, capsys):
+    make_files(folder, "IMG_1.jpg", "img_2.jpg", "IMG_3.png")
+    assert main([str(folder), "--regex", "--ignore-case", "--replace", r"img_(\d)", "--with", r"photo-\1",
+                 "--match", "*.jpg", "--quiet"]) == 0
+    assert capsys.readouterr().out == "2 file(s) renamed.\n"
+    assert contents(folder) == {"photo-1.jpg": "IMG_1.jpg", "photo-2.jpg": "img_2.jpg", "IMG_3.png": "IMG_3.png"}
+
+
+def test_template_rename(folder, capsys):
+    make_files(folder, "b.TXT", "a.txt")
+    assert main([str(folder), "--template", "{counter:03}_{stem|lower}{ext|lower}", "--quiet"]) == 0
+    assert contents(folder) == {"001_a.txt": "a.txt", "002_b.txt": "b.TXT"}
+    assert main([str(folder), "--template", "{nope}"]) == 1
+    assert "Unknown template field" in capsys.readouterr().err
+
+
+def test_duplicates(folder, capsys):
+    make_files(folder, "a.txt", "sub/a.txt", "b.txt")
+    (folder / "b.txt").write_text("a.txt")
+    assert main([str(folder), "--recursive", "--duplicates"]) == 0
+    assert capsys.readouterr().out == "a.txt\nb.txt\n\n1 duplicate file(s) in 1 group(s).\n"
+    assert contents(folder) == {"a.txt": "a.txt", "b.txt": "a.txt", "sub/a.txt": "sub/a.txt"}
+
+
+def test_recursive_rename(folder, capsys):
+    make_files(folder, "a.jpg", "b.txt", "sub/c.jpg", ".git/d.jpg")
+    assert main([str(folder), "--recursive", "--include", "*.jpg", "--exclude", ".git", "--prefix", "x_",
+                 "--quiet"]) == 0
+    assert capsys.readouterr().out == "2 file(s) renamed.\n"
+    assert contents(folder) == {"x_a.jpg": "a.jpg", "b.txt": "b.txt", "sub/x_c.jpg": "sub/c.jpg",
+                                ".git/d.jpg": ".git/d.jpg"}
+
+
+def test_undo(folder, capsys):
+    make_files(folder, "a.txt", "b.txt")
+    assert main([str(folder), "--prefix", "new_", "--quiet"]) == 0
+    assert main(["--undo", "--dry-run"]) == 0
+    assert "new_a.txt -> a.txt" in capsys.readouterr().out
+    assert contents(folder) == {"new_a.txt": "a.txt", "new_b.txt": "b.txt"}
+    assert main(["--undo", "--quiet"]) == 0
+    assert "2 file(s) in" in capsys.readouterr().out
+    assert contents(folder) == {"a.txt": "a.txt", "b.txt": "b.txt"}
+    assert main(["--undo"]) == 1
+    assert "no rename to undo" in capsys.readouterr().err
+
+
+def test_undo_in_a_folder(tmp_path, folder, capsys):
+    other_folder = tmp_path / "other"
+    make_files(folder, "a.txt")
+    make_files(other_folder, "b.txt")
+    assert main([str(folder), "--prefix", "new_", "--quiet"]) == 0
+    assert main([str(other_folder), "--prefix", "new_", "--quiet"]) == 0
+    assert main([str(folder), "--undo", "--quiet"]) == 0
+    assert contents(folder) == {"a.txt": "a.txt"}
+    assert contents(other_folder) == {"new_b.txt": "b.txt"}
+    assert main([str(folder), "--undo"]) == 1
+    assert "no rename to undo" in capsys.readouterr().err
+
+
+def test_dry_run_does_not_recover_interrupted_batches(tmp_path, folder, home, capsys):
+    make_files(folder, "a", "b")
+    journal = RenameJournal(str(home / "journal"))
+    interrupt(journal, plan_mapping(str(folder), [("a", "x"), ("b", "y")], ["a", "b"]), applied_count=1)
+    assert main([str(folder), "--prefix", "new_", "--dry-run"]) == 0
+    assert "recovered on the next run" in capsys.readouterr().err
+    assert contents(folder) == {"x": "a", "b": "b"}
+    # The same goes for several folders at once.
+    other_folder = tmp_path / "other"
+    make_files(other_folder, "c")
+    assert main([str(folder), str(other_folder), "--prefix", "new_", "--dry-run"]) == 0
+    assert contents(folder) == {"x": "a", "b": "b"}
+    assert main([str(folder), "--prefix", "new_"]) == 0
+    assert contents(folder) == {"new_a": "a", "new_b": "b"}
+
+
+def test_no_journal(folder, home, capsys):
+    make_files(folder, "a.txt")
+    assert main([str(folder), "--prefix", "new_", "--quiet", "--no-journal"]) == 0
+    assert contents(folder) == {"new_a.txt": "a.txt"}
+    assert list(RenameJournal(str(home / "journal")).entries()) == []
+    assert main(["--undo", "--no-journal"]) == 1
+    assert "needs the rename journal" in capsys.readouterr().err
+
+
+def test_saved_recipe_renames_several_folders(tmp_path, capsys):
+    recipe_path = tmp_path / "recipe.json"
+    assert main(["--case", "lowercase", "--prefix", "scan_", "--save-recipe", str(recipe_path)]) == 0
+    assert capsys.readouterr().out == f"Recipe saved to {recipe_path}.\n"
+    folders = [tmp_path / "one", tmp_path / "two"]
+    make_files(folders[0], "A.TXT")
+    make_files(folders[1], "B.TXT", "C.TXT")
+    assert main(["--recipe", str(recipe_path), "--jobs", "2", "--quiet"] + [str(folder) for folder in folders]) == 0
+    assert capsys.readouterr().out == "3 file(s) renamed in 2 folder(s).\n"
+    assert contents(folders[0]) == {"scan_a.TXT": "A.TXT"}
+    assert contents(folders[1]) == {"scan_b.TXT": "B.TXT", "scan_c.TXT": "C.TXT"}
+
+
+def test_folder_with_conflicts_is_left_alone(tmp_path, capsys):
+    folders = [tmp_path / "one", tmp_path / "two"]
+    make_files(folders[0], "b.txt")
+    make_files(folders[1], "a.txt", "b.txt")
+    args = [str(folder) for folder in folders] + ["--replace", "b", "--with", "a", "--quiet"]
+    assert main(args + ["--dry-run"]) == 1
+    assert capsys.readouterr().out == "1 file(s) would be renamed in 2 folder(s); folders 1 with conflicts.\n"
+    assert main(args) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "1 file(s) renamed in 1 folder(s); folders 1 with conflicts.\n"
+    assert "b.txt -> a.txt" in captured.err
+    assert contents(folders[0]) == {"a.txt": "b.txt"}
+    assert contents(folders[1]) == {"a.txt": "a.txt", "b.txt": "b.txt"}
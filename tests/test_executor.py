@@ -0,0 +1,151 @@
+import errno
+import threading
+
+import pytest
+
+from renamer import (FolderRenamer, RenameCancelledError, RenameConflictError, RenameError, RenameJournal, RenameTask,
+                     apply_plan, plan_mapping)
+from renamer.journal import JournalWriter
+
+from tests import contents, make_files
+
+
+def run(task):
+    task.start()
+    task._thread.join()
+    return task
+
+
+def make_plan(folder, count):
+    names = [f"{number:03d}" for number in range(count)]
+    make_files(folder, *names)
+    # A long chain plus independent renames, so both ordering and grouping are exercised.
+    renames = [(name, f"{int(name) + 1:03d}") for name in names[:10]] + [(name, "x" + name) for name in names[10:]]
+    return plan_mapping(str(folder), renames, names)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_apply_plan_reports_progress(tmp_path, workers):
+    plan = make_plan(tmp_path, 50)
+    expected = {new_file_name: original_file_name for original_file_name, new_file_name in plan}
+    reports = []
+    apply_plan(plan, workers=workers, progress=lambda applied, total: reports.append((applied, total)))
+    assert reports[-1] == (50, 50)
+    assert contents(tmp_path) == expected
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_failed_rename_is_rolled_back(tmp_path, monkeypatch, workers):
+    plan = make_plan(tmp_path, 50)
+    before = contents(tmp_path)
+    rename = FolderRenamer.rename
+
+    def fail_on_x040(renamer, from_name, to_name):
+        if to_name == "x040":
+            raise PermissionError(errno.EACCES, "Permission denied")
+        rename(renamer, from_name, to_name)
+
+    monkeypatch.setattr(FolderRenamer, "rename", fail_on_x040)
+    with pytest.raises(RenameError, match="restored"):
+        apply_plan(plan, workers=workers)
+    assert contents(tmp_path) == before
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_name_taken_after_planning_is_never_overwritten(tmp_path, workers):
+    plan = make_plan(tmp_path, 50)
+    before = contents(tmp_path)
+    # Another program takes a new name after the plan was made.
+    make_files(tmp_path, "x040")
+    with pytest.raises(RenameConflictError) as error:
+        apply_plan(plan, workers=workers)
+    assert [conflict[:2] for conflict in error.value.conflicts] == [("040", "x040")]
+    assert contents(tmp_path) == dict(before, x040="x040")
+
+
+def test_cancelled_batch_is_rolled_back(tmp_path):
+    folder = tmp_path / "files"
+    plan = make_plan(folder, 50)
+    before = contents(folder)
+    journal = RenameJournal(str(tmp_path / "journal"), group_size=10)
+    cancel_event = threading.Event()
+    # Cancel once the first group is applied.
+    with pytest.raises(RenameCancelledError):
+        apply_plan(plan, journal, progress=lambda applied, total: cancel_event.set(), cancel_event=cancel_event)
+    assert contents(folder) == before
+    [entry] = journal.entries()
+    assert entry.state == "aborted"
+
+
+def test_task_applies_the_plan(tmp_path):
+    plan = make_plan(tmp_path, 20)
+    task = run(RenameTask(plan, workers=2))
+    assert task.done and task.error is None
+    assert task.applied_steps == task.total_steps == len(plan.steps)
+    assert task.result == plan.renames
+
+
+def test_task_reports_rename_errors(tmp_path):
+    make_files(tmp_path, "a")
+    plan = plan_mapping(str(tmp_path), [("a", "b")], ["a"])
+    (tmp_path / "a").unlink()
+    task = run(RenameTask(plan))
+    assert isinstance(task.error, RenameError) and task.result is None
+
+
+def test_task_builds_its_plan_on_the_worker(tmp_path):
+    make_files(tmp_path, "a", "b")
+    threads = []
+
+    def prepare():
+        threads.append(task._thread)
+        return plan_mapping(str(tmp_path), [("a", "b"), ("b", "c")], ["a", "b"])
+
+    task = RenameTask(None, prepare=prepare)
+    assert task.plan is None and task.total_steps == 0
+    run(task)
+    assert threads == [task._thread]
+    assert task.error is None and task.total_steps == 2
+    assert sorted(task.result) == [("a", "b"), ("b", "c")]
+    assert contents(tmp_path) == {"b": "a", "c": "b"}
+
+
+def test_task_reports_a_plan_that_cannot_be_built(tmp_path):
+    make_files(tmp_path, "a", "b")
+    task = run(RenameTask(None, prepare=lambda: plan_mapping(str(tmp_path), [("a", "b")], ["a", "b"])))
+    assert task.plan is None
+    assert isinstance(task.error, RenameConflictError)
+    assert contents(tmp_path) == {"a": "a", "b": "b"}
+
+
+def test_task_with_nothing_to_rename(tmp_path):
+    make_files(tmp_path, "a")
+    task = run(RenameTask(None, prepare=lambda: plan_mapping(str(tmp_path), [], ["a"])))
+    assert task.error is None and task.result == []
+
+
+def test_task_reports_unexpected_errors(tmp_path):
+    def prepare():
+        raise ValueError("broken")
+
+    task = run(RenameTask(None, prepare=prepare))
+    assert isinstance(task.error, ValueError) and task.result is None
+
+
+def test_journal_failure_after_renaming_is_reported(tmp_path, monkeypatch):
+    folder = tmp_path / "files"
+    make_files(folder, "a")
+    journal = RenameJournal(str(tmp_path / "journal"))
+
+    def commit(writer):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(JournalWriter, "commit", commit)
+    with pytest.raises(RenameError, match="were renamed"):
+        apply_plan(plan_mapping(str(folder), [("a", "b")], ["a"]), journal)
+    monkeypatch.undo()
+    assert contents(folder) == {"b": "a"}
+    # The batch was recorded as applied, so the next start finishes it instead of rolling it back.
+    [(entry, action, problems)] = journal.recover()
+    assert action == "finished"
+    assert contents(folder) == {"b": "a"}
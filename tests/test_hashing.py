@@ -0,0 +1,101 @@
+import hashlib
+import threading
+
+import pytest
+
+from renamer import FileModel, RenameCancelledError, ScannedFile, hashing
+from renamer.hashing import DuplicateSearch, digest_files, find_duplicates, hash_file
+from renamer.metadata import MetadataCache
+
+
+def make_model(*names):
+    model = FileModel()
+    model.extend([ScannedFile(name, 0.0, 1, index + 1) for index, name in enumerate(names)])
+    return model
+
+
+def write_files(folder, **files):
+    paths = {}
+    for name, data in files.items():
+        (folder / name).write_bytes(data)
+        paths[name] = str(folder / name)
+    return paths
+
+
+@pytest.mark.parametrize("threshold", [1 << 20, 1])
+def test_hash_file(tmp_path, monkeypatch, threshold):
+    # A low threshold hashes even a small file through a memory map, in several slices.
+    monkeypatch.setattr(hashing, "MMAP_THRESHOLD", threshold)
+    monkeypatch.setattr(hashing, "MMAP_SLICE_SIZE", 7)
+    data = bytes(range(256)) * 10
+    (tmp_path / "a").write_bytes(data)
+    assert hash_file(str(tmp_path / "a")) == hashlib.sha256(data).hexdigest()
+    assert hash_file(str(tmp_path / "missing")) is None
+
+
+def test_digests_are_cached(tmp_path, monkeypatch):
+    paths = write_files(tmp_path, a=b"a", b=b"b")
+    keys = [(1, 1, 1, 1), (1, 2, 1, 1)]
+    cache = MetadataCache(str(tmp_path / "cache.sqlite3"))
+    try:
+        progress = []
+        digests = digest_files([paths["a"], paths["b"]], keys, cache, workers=1,
+                               progress=lambda done, total: progress.append((done, total)))
+        assert digests == [hashlib.sha256(b"a").hexdigest(), hashlib.sha256(b"b").hexdigest()]
+        assert progress == [(0, 2), (1, 2), (2, 2)]
+        monkeypatch.setattr(hashing, "hash_file", lambda path: pytest.fail("hashed a cached file"))
+        assert digest_files([paths["a"], paths["b"]], keys, cache, workers=1) == digests
+    finally:
+        cache.close()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_find_duplicates(tmp_path, monkeypatch, workers):
+    paths = write_files(tmp_path, a=b"same", b=b"other", c=b"same", d=b"unique size", e=b"", f=b"", g=b"longer",
+                        h=b"longer")
+    names = sorted(paths)
+    if workers == 1:
+        hashed = []
+        hash_one = hashing.hash_file
+        monkeypatch.setattr(hashing, "hash_file", lambda path: hashed.append(path) or hash_one(path))
+    groups = find_duplicates([paths[name] for name in names], [(0, 0, 0, 0)] * len(names),
+                             [len((tmp_path / name).read_bytes()) for name in names], workers=workers)
+    assert [[names[position] for position in group] for group in groups] == [["g", "h"], ["a", "c"]]
+    if workers == 1:
+        # Files with a size of their own, and empty files, are never read.
+        assert sorted(hashed) == [paths[name] for name in "acgh"]
+
+
+def test_cancelled_search_raises(tmp_path):
+    paths = write_files(tmp_path, a=b"x", b=b"x")
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(RenameCancelledError):
+        find_duplicates([paths["a"], paths["b"]], [(0, 0, 0, 0)] * 2, [1, 1], workers=1, cancel_event=cancel_event)
+
+
+def test_duplicate_search(tmp_path):
+    write_files(tmp_path, a=b"x", b=b"y", c=b"x")
+    search = DuplicateSearch(str(tmp_path), make_model("a", "b", "c"), [2, 1, 0], workers=1)
+    search.start()
+    search._thread.join()
+    assert search.done and search.error is None
+    assert search.result == [[2, 0]]
+    assert (search.hashed_count, search.total_count) == (3, 3)
+
+
+def test_search_is_not_done_before_it_starts(tmp_path):
+    search = DuplicateSearch(str(tmp_path), make_model("a"), [0])
+    assert not search.done
+
+
+def test_search_reports_unexpected_errors(tmp_path, monkeypatch):
+    def find_duplicates(*args):
+        raise ValueError("broken")
+
+    monkeypatch.setattr(hashing, "find_duplicates", find_duplicates)
+    search = DuplicateSearch(str(tmp_path), make_model("a", "b"), [0, 1])
+    search.start()
+    search._thread.join()
+    assert search.done
+    assert search.result is None and isinstance(search.error, ValueError)
@@ -0,0 +1,99 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from renamer import JobQueue, Recipe, RenameJournal, RenameRules
+
+from tests import contents, make_files
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return RenameJournal(str(tmp_path / "journal"))
+
+
+def make_folders(tmp_path):
+    """
+    Make one folder for each way a job replacing "1" with "2" can end, by that end state.
+    """
+    folders = {state: tmp_path / state for state in ("done", "unchanged", "conflict")}
+    make_files(folders["done"], "a.txt", "x1.txt")
+    make_files(folders["unchanged"], "new_2.txt")
+    make_files(folders["conflict"], "new_1.txt", "new_2.txt")
+    folders["failed"] = tmp_path / "missing"
+    return folders
+
+
+def test_each_folder_is_renamed_on_its_own(tmp_path, journal):
+    folders = make_folders(tmp_path)
+    recipe = Recipe(RenameRules(replace_text="1", new_text="2"))
+    queue = JobQueue(recipe, [str(folder) for folder in folders.values()], journal, workers=2)
+    jobs = queue.run()
+    assert queue.done
+    assert {job.folder_path: job.state for job in jobs} == {str(folder): state for state, folder in folders.items()}
+    assert queue.counts() == {"done": 1, "unchanged": 1, "conflict": 1, "failed": 1}
+    assert contents(folders["done"]) == {"a.txt": "a.txt", "x2.txt": "x1.txt"}
+    assert contents(folders["conflict"]) == {"new_1.txt": "new_1.txt", "new_2.txt": "new_2.txt"}
+    conflict_job = jobs[list(folders).index("conflict")]
+    assert [conflict[:2] for conflict in conflict_job.conflicts] == [("new_1.txt", "new_2.txt")]
+    assert isinstance(jobs[list(folders).index("failed")].error, FileNotFoundError)
+    assert queue.progress() == (4, 4, 1, 1)
+    assert [entry.state for entry in journal.entries()] == ["committed"]
+
+
+def test_folders_are_renamed_in_parallel(tmp_path, journal):
+    folder_paths = []
+    for number in range(8):
+        folder = tmp_path / f"folder{number}"
+        make_files(folder, "a.txt", "b.txt", "c.txt")
+        folder_paths.append(str(folder))
+    queue = JobQueue(Recipe(RenameRules(prefix="new_")), folder_paths, journal, workers=4, rename_workers=2)
+    queue.start()
+    while not queue.done:
+        time.sleep(0.01)
+    assert queue.counts() == {"done": 8}
+    assert queue.progress() == (8, 8, 24, 24)
+    for job in queue.jobs:
+        assert sorted(job.result) == [("a.txt", "new_a.txt"), ("b.txt", "new_b.txt"), ("c.txt", "new_c.txt")]
+        assert set(contents(Path(job.folder_path))) == {"new_a.txt", "new_b.txt", "new_c.txt"}
+    assert len({entry.path for entry in list(journal.entries())}) == 8
+
+
+def test_dry_run_only_plans(tmp_path, journal):
+    folder = tmp_path / "files"
+    make_files(folder, "a.txt", "sub/b.txt")
+    recipe = Recipe(RenameRules(prefix="new_"), recursive=True, exclude=["sub"])
+    queue = JobQueue(recipe, [str(folder)], journal, dry_run=True)
+    [job] = queue.run()
+    assert job.state == "planned"
+    assert list(job.plan) == [("a.txt", "new_a.txt")]
+    assert job.result is None
+    assert contents(folder) == {"a.txt": "a.txt", "sub/b.txt": "sub/b.txt"}
+    assert list(journal.entries()) == []
+
+
+def test_cancelled_queue_renames_nothing(tmp_path, journal):
+    folder = tmp_path / "files"
+    make_files(folder, "a.txt")
+    queue = JobQueue(Recipe(RenameRules(prefix="new_")), [str(folder)], journal)
+    queue.cancel()
+    queue.run()
+    assert queue.cancelled
+    assert queue.counts() == {"cancelled": 1}
+    assert contents(folder) == {"a.txt": "a.txt"}
+
+
+def test_unexpected_errors_finish_the_job(tmp_path, monkeypatch):
+    folder = tmp_path / "files"
+    make_files(folder, "a.txt")
+
+    def fail(*args):
+        raise ValueError("broken")
+
+    monkeypatch.setattr("renamer.jobs.plan_renames", fail)
+    queue = JobQueue(Recipe(RenameRules(prefix="new_")), [str(folder)])
+    [job] = queue.run()
+    assert job.state == "failed"
+    assert str(job.error) == "broken"
+    assert queue.done
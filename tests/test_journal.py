@@ -0,0 +1,225 @@
+import os
+
+import pytest
+
+from renamer import FolderRenamer, RenameError, RenameJournal, apply_plan, plan_mapping
+from renamer import executor
+from renamer.executor import step_identities
+
+from tests import contents, make_files
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "files"
+    folder.mkdir()
+    return folder
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return RenameJournal(str(tmp_path / "journal"))
+
+
+def interrupt(journal, plan, applied_count, logged_count=None, applied=False):
+    """
+    Record a batch and apply its first steps, then stop as a crash would, before the commit record.
+    """
+    writer = journal.begin(plan)
+    steps = plan.steps[:logged_count]
+    with FolderRenamer(plan.folder_path) as renamer:
+        identities = [identity for chain in plan.chains for identity in step_identities(renamer, chain)]
+        writer.log_steps(steps, identities[:len(steps)])
+        for from_name, to_name in steps[:applied_count]:
+            renamer.rename(from_name, to_name)
+    if applied:
+        writer.applied()
+    writer.close()
+    return writer
+
+
+def test_partly_recorded_batch_is_rolled_back(folder, journal):
+    make_files(folder, "a", "b", "c")
+    plan = plan_mapping(str(folder), [("a", "x"), ("b", "y"), ("c", "z")], ["a", "b", "c"])
+    interrupt(journal, plan, applied_count=2, logged_count=2)
+    [(entry, action, problems)] = journal.recover()
+    assert (action, problems) == ("rolled back", 0)
+    assert contents(folder) == {"a": "a", "b": "b", "c": "c"}
+    assert journal.recover() == []
+
+
+@pytest.mark.parametrize("applied_count", [0, 1, 2])
+def test_interrupted_chain_is_rolled_back(folder, journal, applied_count):
+    make_files(folder, "a", "b")
+    plan = plan_mapping(str(folder), [("a", "b"), ("b", "c")], ["a", "b"])
+    # Every step is recorded, but the batch never reached its applied record.
+    interrupt(journal, plan, applied_count)
+    [(entry, action, problems)] = journal.recover()
+    assert (action, problems) == ("rolled back", 0)
+    assert contents(folder) == {"a": "a", "b": "b"}
+
+
+@pytest.mark.parametrize("applied_count", [0, 1, 2, 3, 4])
+def test_interrupted_cycle_is_rolled_back(folder, journal, applied_count):
+    make_files(folder, "a", "b", "c")
+    plan = plan_mapping(str(folder), [("a", "b"), ("b", "c"), ("c", "a")], ["a", "b", "c"])
+    interrupt(journal, plan, applied_count)
+    [(entry, action, problems)] = journal.recover()
+    assert (action, problems) == ("rolled back", 0)
+    assert contents(folder) == {"a": "a", "b": "b", "c": "c"}
+
+
+@pytest.mark.parametrize("renames, expected", [
+    ([("a", "b"), ("b", "c")], {"b": "a", "c": "b"}),
+    ([("a", "b"), ("b", "c"), ("c", "a")], {"a": "c", "b": "a", "c": "b"}),
+])
+def test_applied_batch_is_finished(folder, journal, renames, expected):
+    names = [original_file_name for original_file_name, new_file_name in renames]
+    make_files(folder, *names)
+    plan = plan_mapping(str(folder), renames, names)
+    interrupt(journal, plan, len(plan.steps), applied=True)
+    [(entry, action, problems)] = journal.recover()
+    assert (action, problems) == ("finished", 0)
+    assert contents(folder) == expected
+    assert journal.last_undoable().batch_id == entry.batch_id
+
+
+def test_applied_undo_marks_the_batch_it_undid(folder, journal):
+    make_files(folder, "a")
+    apply_plan(plan_mapping(str(folder), [("a", "b")], ["a"]), journal)
+    entry, plan = journal.plan_undo()
+    writer = journal.begin(plan, entry.batch_id)
+    writer.log_steps(plan.steps)
+    (folder / "b").rename(folder / "a")
+    writer.applied()
+    writer.close()
+    [(undo_entry, action, problems)] = journal.recover()
+    assert (action, problems) == ("finished", 0)
+    assert contents(folder) == {"a": "a"}
+    with pytest.raises(RenameError):
+        journal.plan_undo()
+
+
+@pytest.mark.parametrize("applied_count", [0, 1, 2, 3, 4])
+def test_cycle_of_partly_recorded_batch_is_rolled_back(folder, journal, applied_count):
+    make_files(folder, "a", "b", "c", "d")
+    plan = plan_mapping(str(folder), [("a", "b"), ("b", "c"), ("c", "a"), ("d", "e")], ["a", "b", "c", "d"])
+    # Put the cycle first, so it is recorded in full while the last rename is not.
+    plan.chains.sort(key=len, reverse=True)
+    plan.steps = [step for chain in plan.chains for step in chain]
+    interrupt(journal, plan, applied_count, logged_count=4)
+    [(entry, action, problems)] = journal.recover()
+    assert (action, problems) == ("rolled back", 0)
+    assert contents(folder) == {"a": "a", "b": "b", "c": "c", "d": "d"}
+
+
+@pytest.mark.parametrize("logged_count, applied, action, expected", [
+    (None, True, "finished", {"a": "b", "b": "a", "d": "c"}),
+    (None, False, "rolled back", {"a": "a", "b": "b", "c": "c"}),
+    (3, False, "rolled back", {"a": "a", "b": "b", "c": "c"}),
+])
+def test_swap_made_in_one_step_is_recovered(folder, journal, logged_count, applied, action, expected):
+    make_files(folder, "a", "b", "c")
+    plan = plan_mapping(str(folder), [("a", "b"), ("b", "a"), ("c", "d")], ["a", "b", "c"])
+    # Put the swap first, so it is recorded in full while the last rename is not.
+    plan.chains.sort(key=len, reverse=True)
+    plan.steps = [step for chain in plan.chains for step in chain]
+    writer = journal.begin(plan)
+    steps = plan.steps[:logged_count]
+    with FolderRenamer(plan.folder_path) as renamer:
+        if not renamer.can_exchange:
+            writer.close()
+            pytest.skip("swapping two names in one step is not supported here")
+        identities = [identity for chain in plan.chains for identity in step_identities(renamer, chain)]
+        writer.log_steps(steps, identities[:len(steps)])
+        assert renamer.exchange("a", "b")
+        if applied:
+            renamer.rename("c", "d")
+            writer.applied()
+    writer.close()
+    [(entry, recovered_action, problems)] = journal.recover()
+    assert (recovered_action, problems) == (action, 0)
+    assert contents(folder) == expected
+
+
+def test_batch_being_applied_is_not_recovered(folder, journal):
+    make_files(folder, "a")
+    plan = plan_mapping(str(folder), [("a", "b")], ["a"])
+    writer = journal.begin(plan)
+    writer.log_steps(plan.steps)
+    try:
+        assert journal.recover() == []
+    finally:
+        writer.close()
+    [(entry, action, problems)] = journal.recover()
+    assert action == "rolled back"
+
+
+def test_failed_rename_is_rolled_back_and_aborted(folder, journal):
+    make_files(folder, "a", "c")
+    plan = plan_mapping(str(folder), [("a", "b"), ("c", "d")], ["a", "c"])
+    # Another program takes a new name after the plan was made.
+    (folder / "d").mkdir()
+    (folder / "d" / "e").write_text("other")
+    with pytest.raises(RenameError):
+        apply_plan(plan, journal)
+    assert contents(folder) == {"a": "a", "c": "c", "d/e": "other"}
+    [entry] = journal.entries()
+    assert entry.state == "aborted"
+    assert journal.recover() == []
+
+
+def test_undo_restores_names(folder, journal):
+    make_files(folder, "a", "b")
+    apply_plan(plan_mapping(str(folder), [("a", "b"), ("b", "a")], ["a", "b"]), journal)
+    entry, plan = journal.plan_undo()
+    apply_plan(plan, journal, undoes=entry.batch_id)
+    assert contents(folder) == {"a": "a", "b": "b"}
+    with pytest.raises(RenameError):
+        journal.plan_undo()
+
+
+def test_undo_is_limited_to_the_folder_given(tmp_path, folder, journal):
+    other_folder = tmp_path / "other"
+    other_folder.mkdir()
+    make_files(folder, "a")
+    make_files(other_folder, "x")
+    apply_plan(plan_mapping(str(folder), [("a", "b")], ["a"]), journal)
+    apply_plan(plan_mapping(str(other_folder), [("x", "y")], ["x"]), journal)
+    entry, plan = journal.plan_undo(str(folder))
+    assert entry.folder_path == os.path.abspath(folder)
+    assert plan.renames == [("b", "a")]
+    with pytest.raises(RenameError):
+        journal.plan_undo(str(tmp_path))
+
+
+def test_undo_refuses_when_a_renamed_file_is_gone(folder, journal):
+    make_files(folder, "a")
+    apply_plan(plan_mapping(str(folder), [("a", "b")], ["a"]), journal)
+    (folder / "b").unlink()
+    with pytest.raises(RenameError):
+        journal.plan_undo()
+
+
+def test_only_recent_batches_are_kept(folder, tmp_path):
+    journal = RenameJournal(str(tmp_path / "journal"), history=2)
+    make_files(folder, "a0")
+    for number in range(3):
+        apply_plan(plan_mapping(str(folder), [(f"a{number}", f"a{number + 1}")], [f"a{number}"]), journal)
+    assert [entry.renames() for entry in journal.entries()] == [[("a1", "a2")], [("a2", "a3")]]
+
+
+def test_batch_whose_rollback_failed_is_rolled_back_later(folder, journal, monkeypatch):
+    make_files(folder, "a", "c")
+    plan = plan_mapping(str(folder), [("a", "b"), ("c", "d")], ["a", "c"])
+    # Another program takes a new name after the plan was made, and restoring the renamed file fails too.
+    (folder / "d").write_text("other")
+    monkeypatch.setattr(executor, "rollback_steps", lambda renamer, applied_steps: False)
+    with pytest.raises(RenameError):
+        apply_plan(plan, journal)
+    monkeypatch.undo()
+    assert contents(folder) == {"b": "a", "c": "c", "d": "other"}
+    [(entry, action, problems)] = journal.recover()
+    assert (entry.outcome, action, problems) == ("failed", "rolled back", 0)
+    assert contents(folder) == {"a": "a", "c": "c", "d": "other"}
+    assert journal.last_undoable() is None
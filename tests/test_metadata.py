@@ -0,0 +1,169 @@
+import hashlib
+import os
+import struct
+import time
+
+import pytest
+
+from renamer import FileModel, RenameConflictError, RenameRules, ScannedFile, plan_renames
+from renamer import metadata as metadata_module
+from renamer.metadata import FolderMetadata, MetadataCache, MetadataReader, extract_metadata, metadata_key
+
+
+def exif_jpeg(camera, taken):
+    """
+    Build a JPEG header holding an EXIF segment with a camera model and a capture date. The camera model must be
+    longer than 3 characters, since EXIF stores shorter strings inside the entry itself.
+    """
+    camera_bytes = camera.encode() + b"\0"
+    taken_bytes = taken.encode() + b"\0"
+    # IFD0 (2 entries) starts at 8, the EXIF IFD (1 entry) at 38, and the strings follow at 56.
+    tiff = b"II*\0" + struct.pack("<I", 8)
+    tiff += struct.pack("<H", 2) + struct.pack("<HHII", 0x0110, 2, len(camera_bytes), 56)
+    tiff += struct.pack("<HHII", 0x8769, 4, 1, 38) + struct.pack("<I", 0)
+    tiff += struct.pack("<H", 1) + struct.pack("<HHII", 0x9003, 2, len(taken_bytes), 56 + len(camera_bytes))
+    tiff += struct.pack("<I", 0) + camera_bytes + taken_bytes
+    segment = b"Exif\0\0" + tiff
+    # An APP0 segment comes first, as in most JPEG files.
+    return (b"\xff\xd8" + b"\xff\xe0" + struct.pack(">H", 4) + b"JF"
+            + b"\xff\xe1" + struct.pack(">H", len(segment) + 2) + segment + b"\xff\xda")
+
+
+def id3v2(**frames):
+    body = b"".join(frame_id.encode() + struct.pack(">I", len(text) + 1) + b"\0\0\0" + text.encode("latin-1")
+                    for frame_id, text in frames.items())
+    size = len(body)
+    return b"ID3\3\0\0" + bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]) + body
+
+
+def id3v1(title, artist, album, year, track):
+    def field(text, length):
+        return text.encode("latin-1").ljust(length, b"\0")
+
+    return (b"TAG" + field(title, 30) + field(artist, 30) + field(album, 30) + field(year, 4) + field("", 28)
+            + bytes([0, track, 0]))
+
+
+def test_exif_is_read_from_a_jpeg(tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(exif_jpeg("Pixel 8: Pro", "2024:05:06 14:30:00") + b"\0" * 100)
+    assert extract_metadata(str(path)) == {
+        "camera": "Pixel 8_ Pro", "taken": time.mktime((2024, 5, 6, 14, 30, 0, 0, 0, -1))}
+
+
+def test_id3_tags_are_read(tmp_path):
+    path = tmp_path / "song"
+    path.write_bytes(id3v2(TIT2="Song", TPE1="AC/DC", TRCK="3/12", TYER="1980") + b"\0" * 100)
+    assert extract_metadata(str(path)) == {"title": "Song", "artist": "AC_DC", "track": 3, "year": 1980}
+    path = tmp_path / "old.mp3"
+    path.write_bytes(b"\0" * 200 + id3v1("Title", "Artist", "Album", "1999", 7))
+    assert extract_metadata(str(path)) == {"title": "Title", "artist": "Artist", "album": "Album", "year": 1999,
+                                           "track": 7}
+
+
+@pytest.mark.parametrize("data", [b"", b"\xff\xd8", b"\xff\xd8\xff\xe1\0\x10Exif\0\0II*\0", b"ID3\3\0\0\0\0\0\x7f",
+                                  b"II*\0\xff\xff\xff\xff", b"plain text"])
+def test_broken_or_missing_metadata_gives_nothing(tmp_path, data):
+    path = tmp_path / "broken.mp3"
+    path.write_bytes(data)
+    assert extract_metadata(str(path)) == {}
+
+
+def test_cache_is_keyed_by_file_identity(tmp_path):
+    cache = MetadataCache(str(tmp_path / "cache.sqlite3"))
+    try:
+        cache.store([((1, 2, 10, 100), {"camera": "X"}), ((1, 0, 10, 100), {"camera": "no inode"})])
+        assert cache.lookup((1, 2, 10, 100)) == {"camera": "X"}
+        # A file that changed since is read again.
+        assert cache.lookup((1, 2, 11, 100)) is None
+        assert cache.lookup((1, 2, 10, 101)) is None
+        assert cache.lookup((1, 0, 10, 100)) is None
+        cache.store([((1, 2, 11, 100), {"camera": "Y"})])
+        assert cache.lookup((1, 2, 11, 100)) == {"camera": "Y"}
+        assert cache.lookup((1, 2, 10, 100)) is None
+    finally:
+        cache.close()
+
+
+def test_reader_only_extracts_files_missing_from_the_cache(tmp_path, monkeypatch):
+    paths = []
+    for name in ("a.mp3", "b.mp3"):
+        path = tmp_path / name
+        path.write_bytes(id3v2(TIT2=name))
+        paths.append(str(path))
+    keys = [metadata_key(os.stat(path)) for path in paths]
+    reader = MetadataReader(MetadataCache(str(tmp_path / "cache.sqlite3")), workers=2)
+    try:
+        reader.cache.store([(keys[0], {"title": "cached"})])
+        extracted = []
+        extract = metadata_module.extract_metadata
+        monkeypatch.setattr(metadata_module, "extract_metadata", lambda path: extracted.append(path) or extract(path))
+        assert reader.read_many(paths, keys) == [{"title": "cached"}, {"title": "b.mp3"}]
+        assert reader.read_many(paths, keys) == [{"title": "cached"}, {"title": "b.mp3"}]
+        assert extracted == [paths[1]]
+    finally:
+        reader.close()
+
+
+def test_folder_metadata_is_read_in_the_background(tmp_path):
+    (tmp_path / "a.mp3").write_bytes(id3v2(TPE1="Artist"))
+    stat_result = os.stat(tmp_path / "a.mp3")
+    model = FileModel()
+    model.extend([ScannedFile("a.mp3", stat_result.st_mtime, stat_result.st_size, stat_result.st_ino,
+                              stat_result.st_mtime_ns, stat_result.st_dev)])
+    reader = MetadataReader(None, workers=1)
+    metadata = FolderMetadata(str(tmp_path), model, reader)
+    try:
+        assert metadata.get(0) is None
+        reader._pool.shutdown(wait=True)
+        assert metadata.take_ready() == [0]
+        assert metadata.get(0) == {"artist": "Artist"}
+    finally:
+        reader.close()
+
+
+class FailingReader(MetadataReader):
+    def read(self, path, key, digest=False):
+        raise PermissionError(path)
+
+
+@pytest.mark.parametrize("digest, expected", [(False, {}), (True, {"hash": ""})])
+def test_unreadable_file_is_not_left_pending(tmp_path, digest, expected):
+    model = FileModel()
+    model.extend([ScannedFile("a.jpg", 0.0, 0, 1)])
+    reader = FailingReader(None, workers=1)
+    metadata = FolderMetadata(str(tmp_path), model, reader)
+    try:
+        assert metadata.get(0, digest) is None
+        reader._pool.shutdown(wait=True)
+        assert metadata.take_ready() == [0]
+        assert metadata.get(0, digest) == expected
+    finally:
+        reader.close()
+
+
+def test_template_uses_metadata(tmp_path, monkeypatch):
+    monkeypatch.setenv("BATCH_RENAMER_HOME", str(tmp_path / "home"))
+    folder = tmp_path / "files"
+    folder.mkdir()
+    (folder / "a.jpg").write_bytes(exif_jpeg("Cam One", "2024:05:06 14:30:00"))
+    (folder / "b.mp3").write_bytes(id3v2(TPE1="Band", TRCK="4"))
+    rules = RenameRules(template="{taken:%Y%m%d}_{camera|lower}{artist}{track:02}{ext}")
+    plan = plan_renames(str(folder), ["a.jpg", "b.mp3"], rules)
+    year = time.strftime("%Y%m%d", time.localtime(os.stat(folder / "b.mp3").st_mtime))
+    assert plan.renames == [("a.jpg", "20240506_cam one00.jpg"), ("b.mp3", f"{year}_Band04.mp3")]
+
+
+def test_template_uses_content_digests(tmp_path, monkeypatch):
+    monkeypatch.setenv("BATCH_RENAMER_HOME", str(tmp_path / "home"))
+    folder = tmp_path / "files"
+    folder.mkdir()
+    (folder / "a.txt").write_bytes(b"a")
+    (folder / "b.txt").write_bytes(b"a")
+    (folder / "c.txt").write_bytes(b"c")
+    rules = RenameRules(template="{hash[:8]}{ext}")
+    plan = plan_renames(str(folder), ["c.txt"], rules)
+    assert plan.renames == [("c.txt", hashlib.sha256(b"c").hexdigest()[:8] + ".txt")]
+    # Identical files would get the same name.
+    with pytest.raises(RenameConflictError):
+        plan_renames(str(folder), ["a.txt", "b.txt"], rules)
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from renamer import FileModel, ScannedFile, Selection
+from renamer.model import natural_key
+
+
+def make_model(*files):
+    model = FileModel()
+    model.extend([ScannedFile(name, float(mtime), size, inode) for inode, (name, mtime, size) in enumerate(files)])
+    return model
+
+
+def test_files_are_listed_in_scan_order():
+    model = make_model(("b.txt", 2, 20), ("a.txt", 1, 10))
+    model.extend([ScannedFile("c.txt", 3.0, 30, 2)])
+    assert len(model) == 3
+    assert [model.name(model.index_at(position)) for position in range(3)] == ["b.txt", "a.txt", "c.txt"]
+
+
+def test_sorting_only_changes_the_display_order():
+    model = make_model(("b.txt", 2, 20), ("a.txt", 1, 30), ("c.txt", 3, 10))
+    model.sort(lambda index: model.sizes[index], reverse=True)
+    assert [model.index_at(position) for position in range(3)] == [1, 0, 2]
+    assert [model.name(index) for index in range(3)] == ["b.txt", "a.txt", "c.txt"]
+
+
+def test_set_order_displays_only_some_files():
+    model = make_model(("b.txt", 2, 20), ("a.txt", 1, 30), ("c.txt", 3, 10))
+    model.set_order([2, 0])
+    assert len(model) == 2
+    model.sort(lambda index: model.names[index])
+    assert [model.index_at(position) for position in range(2)] == [0, 2]
+    model.reset_order()
+    assert [model.index_at(position) for position in range(3)] == [0, 1, 2]
+
+
+def test_displayed_files_as_index_runs():
+    model = make_model(*[(name, 0, 0) for name in "abcdef"])
+    assert model.in_scan_order
+    assert model.index_runs(1, 5) == [(1, 5)]
+    assert model.indices_in_order(Selection([4, 1])) == [1, 4]
+    model.sort(lambda index: "cadbfe".index(model.names[index]))
+    assert not model.in_scan_order
+    assert model.index_runs(0, 3) == [(0, 1), (2, 4)]
+    assert model.index_runs(0, 6) == [(0, 6)]
+    assert model.indices_in_order(Selection([0, 1, 2])) == [2, 0, 1]
+    model.reset_order()
+    assert model.in_scan_order
+
+
+def test_names_are_split_at_the_extension():
+    model = make_model(("archive.tar.gz", 0, 0), ("README", 0, 0), (".hidden", 0, 0))
+    assert [model.split(index) for index in range(3)] == [("archive.tar", ".gz"), ("README", ""), (".hidden", "")]
+
+
+def test_names_in_subfolders_are_split_after_the_folder():
+    model = make_model((os.path.join("sub.d", "README"), 0, 0), (os.path.join("a", "b", "c.txt"), 0, 0))
+    assert model.split(0) == ("README", "")
+    assert model.directory(0) == "sub.d" + os.sep
+    assert model.split(1) == ("c", ".txt")
+    assert model.directory(1) == os.path.join("a", "b", "")
+
+
+def test_renames_are_patched_in_place():
+    model = make_model(("b.txt", 2, 20), ("a.txt", 1, 30), ("c.txt", 3, 10))
+    model.sort(lambda index: model.sizes[index])
+    renamed = model.apply_renames([("a.txt", "c.txt"), ("c.txt", "d.tar.gz"), ("gone.txt", "x.txt")], candidates=[1])
+    assert renamed == [1, 2]
+    assert model.names == ["b.txt", "c.txt", "d.tar.gz"]
+    assert model.split(2) == ("d.tar", ".gz")
+    assert [model.index_at(position) for position in range(3)] == [2, 0, 1]
+    assert list(model.sizes) == [20, 30, 10]
+
+
+def test_natural_key():
+    names = ["file10.txt", "File2.txt", "file2b.txt", "file02.txt", "file1.txt", "a100b2", "a100b10", "a99", "b",
+             "file", "123", "12a"]
+    assert sorted(names, key=natural_key) == ["12a", "123", "a99", "a100b2", "a100b10", "b", "file", "file1.txt",
+                                              "File2.txt", "file02.txt", "file2b.txt", "file10.txt"]
+    # Numbers longer than any before still sort after shorter ones.
+    assert natural_key("x" + "9" * 30) < natural_key("x1" + "0" * 30)
+
+
+def test_sort_by_several_columns():
+    model = make_model(("b.TXT", 1, 10), ("a.txt", 2, 10), ("c.jpg", 3, 5), ("d.JPG", 4, 10), ("e", 5, 5))
+    model.sort_by([("extension", False), ("size", True)])
+    assert [model.name(index) for index in model.order] == ["e", "d.JPG", "c.jpg", "b.TXT", "a.txt"]
+    model.sort_by([("size", False), ("date", True)])
+    assert [model.name(index) for index in model.order] == ["e", "c.jpg", "d.JPG", "a.txt", "b.TXT"]
+    with pytest.raises(ValueError):
+        model.sort_by([("colour", False)])
+
+
+def test_equal_keys_keep_their_order():
+    model = make_model(("x10", 0, 0), ("X10", 0, 0), ("x010", 0, 0), ("x9", 0, 0))
+    model.sort_by([("name", False)])
+    assert list(model.order) == [3, 0, 1, 2]
+    model.sort_by([("name", True)])
+    assert list(model.order) == [0, 1, 2, 3]
+
+
+def test_renamed_files_are_sorted_by_their_new_name():
+    model = make_model(("a1.txt", 0, 0), ("a2.txt", 0, 0), ("a3.txt", 0, 0))
+    model.sort_by([("name", False), ("extension", False)])
+    model.apply_renames([("a1.txt", "a10.jpg")])
+    model.extend([ScannedFile("a0.png", 0.0, 0, 3)])
+    model.sort_by([("extension", False), ("name", False)])
+    assert [model.name(index) for index in model.order] == ["a10.jpg", "a0.png", "a2.txt", "a3.txt"]
+    model.sort_by([("name", False)])
+    assert [model.name(index) for index in model.order] == ["a0.png", "a2.txt", "a3.txt", "a10.jpg"]
@@ -0,0 +1,142 @@
+import os
+
+import pytest
+
+from renamer import RenameConflictError, RenameError, RenameRules, apply_plan, plan_mapping, plan_renames
+
+from tests import contents, make_files
+
+
+def test_duplicate_targets_are_rejected(tmp_path):
+    make_files(tmp_path, "a.txt", "b.txt")
+    with pytest.raises(RenameConflictError) as error:
+        plan_mapping(str(tmp_path), [("a.txt", "c.txt"), ("b.txt", "c.txt")], ["a.txt", "b.txt"])
+    assert [(original, new) for original, new, reason in error.value.conflicts] == [("b.txt", "c.txt")]
+
+
+def test_clash_with_existing_file_is_rejected(tmp_path):
+    make_files(tmp_path, "a.txt", "c.txt")
+    with pytest.raises(RenameConflictError) as error:
+        plan_mapping(str(tmp_path), [("a.txt", "c.txt")], ["a.txt", "c.txt"])
+    assert error.value.conflicts[0][:2] == ("a.txt", "c.txt")
+    assert contents(tmp_path) == {"a.txt": "a.txt", "c.txt": "c.txt"}
+
+
+def test_existing_file_renamed_away_is_not_a_clash(tmp_path):
+    make_files(tmp_path, "a", "b")
+    plan = plan_mapping(str(tmp_path), [("a", "b"), ("b", "c")], ["a", "b"])
+    # b has to move before a can take its name.
+    assert plan.steps == [("b", "c"), ("a", "b")]
+    apply_plan(plan)
+    assert contents(tmp_path) == {"b": "a", "c": "b"}
+
+
+def test_cycle_goes_through_a_temporary_name(tmp_path):
+    make_files(tmp_path, "a", "b", "c")
+    plan = plan_mapping(str(tmp_path), [("a", "b"), ("b", "c"), ("c", "a")], ["a", "b", "c"])
+    assert len(plan.steps) == 4
+    temporary_name = plan.steps[0][1]
+    assert plan.steps[0][0] in ("a", "b", "c") and temporary_name == plan.steps[-1][0]
+    assert temporary_name not in ("a", "b", "c")
+    apply_plan(plan)
+    assert contents(tmp_path) == {"a": "c", "b": "a", "c": "b"}
+
+
+def test_swap(tmp_path):
+    make_files(tmp_path, "a", "b")
+    plan = plan_mapping(str(tmp_path), [("a", "b"), ("b", "a")], ["a", "b"])
+    assert len(plan.steps) == 3
+    apply_plan(plan)
+    assert contents(tmp_path) == {"a": "b", "b": "a"}
+
+
+def test_case_only_rename(tmp_path):
+    make_files(tmp_path, "Photo.JPG")
+    plan = plan_mapping(str(tmp_path), [("Photo.JPG", "photo.jpg")], ["Photo.JPG"])
+    assert plan.steps == [("Photo.JPG", "photo.jpg")]
+    apply_plan(plan)
+    assert contents(tmp_path) == {"photo.jpg": "Photo.JPG"}
+
+
+@pytest.mark.parametrize("new_file_name", ["sub/b.txt", "../b.txt", "b\0.txt", "", ".", ".."])
+def test_invalid_new_names_are_rejected(tmp_path, new_file_name):
+    make_files(tmp_path, "a.txt")
+    with pytest.raises(RenameError):
+        plan_mapping(str(tmp_path), [("a.txt", new_file_name)], ["a.txt"])
+
+
+def test_characters_kept_from_the_original_name_are_allowed(tmp_path):
+    make_files(tmp_path, "a\".txt")
+    plan = plan_mapping(str(tmp_path), [("a\".txt", "2024_a\".txt")], ["a\".txt"])
+    apply_plan(plan)
+    assert contents(tmp_path) == {"2024_a\".txt": "a\".txt"}
+
+
+def test_rejected_batch_leaves_files_untouched(tmp_path):
+    make_files(tmp_path, "a", "b", "c")
+    with pytest.raises(RenameConflictError):
+        plan_mapping(str(tmp_path), [("a", "x"), ("b", "y"), ("c", "x")], ["a", "b", "c"])
+    assert contents(tmp_path) == {"a": "a", "b": "b", "c": "c"}
+
+
+def test_files_in_subfolders_stay_in_their_folder(tmp_path):
+    make_files(tmp_path, "sub/a.txt")
+    name = os.path.join("sub", "a.txt")
+    with pytest.raises(RenameError):
+        plan_mapping(str(tmp_path), [(name, "a.txt")], [name])
+    plan = plan_mapping(str(tmp_path), [(name, os.path.join("sub", "b.txt"))], [name])
+    apply_plan(plan)
+    assert contents(tmp_path) == {"sub/b.txt": "sub/a.txt"}
+
+
+def test_rules_only_change_the_base_name(tmp_path):
+    make_files(tmp_path, "sub/IMG_1.jpg", "IMG_2.jpg")
+    names = [os.path.join("sub", "IMG_1.jpg"), "IMG_2.jpg"]
+    plan = plan_renames(str(tmp_path), names, RenameRules(prefix="img_", case_conversion="lowercase"))
+    assert plan.renames == [(names[0], os.path.join("sub", "img_img_1.jpg")), ("IMG_2.jpg", "img_img_2.jpg")]
+
+
+def test_clash_with_file_on_disk_is_rejected_without_existing_files(tmp_path):
+    make_files(tmp_path, "a.txt", "c.txt", "sub/d.txt", "other/e.txt")
+    with pytest.raises(RenameConflictError):
+        plan_mapping(str(tmp_path), [("a.txt", "c.txt")])
+    # Only the folders holding renamed files are checked.
+    plan = plan_mapping(str(tmp_path), [(os.path.join("sub", "d.txt"), os.path.join("sub", "e.txt"))])
+    assert plan.renames == [(os.path.join("sub", "d.txt"), os.path.join("sub", "e.txt"))]
+
+
+def test_temporary_name_avoids_files_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "getpid", lambda: 1)
+    make_files(tmp_path, "a", "b", ".batch-renamer-1-0.tmp")
+    # The names given leave out the hidden file, as a filtered scan would.
+    plan = plan_mapping(str(tmp_path), [("a", "b"), ("b", "a")], ["a", "b"])
+    assert plan.chains[0][0] == ("a", ".batch-renamer-1-1.tmp")
+    apply_plan(plan)
+    assert contents(tmp_path) == {"a": "b", "b": "a", ".batch-renamer-1-0.tmp": ".batch-renamer-1-0.tmp"}
+
+
+def test_cycle_in_a_subfolder_uses_a_temporary_name_there(tmp_path):
+    make_files(tmp_path, "sub/a", "sub/b")
+    a, b = os.path.join("sub", "a"), os.path.join("sub", "b")
+    plan = plan_mapping(str(tmp_path), [(a, b), (b, a)], [a, b])
+    assert os.path.dirname(plan.steps[0][1]) == "sub"
+    apply_plan(plan)
+    assert contents(tmp_path) == {"sub/a": "sub/b", "sub/b": "sub/a"}
+
+
+def test_template_counts_files_in_the_order_given(tmp_path):
+    make_files(tmp_path, "b.txt", "a.txt", "c.txt")
+    for name in ("a.txt", "c.txt"):
+        os.utime(tmp_path / name, (0, 86400 * 500))
+    rules = RenameRules(template="{counter:02}_{date:%Y}_{size}_{stem}{ext}")
+    plan = plan_renames(str(tmp_path), ["c.txt", "a.txt"], rules)
+    assert plan.renames == [("c.txt", "01_1971_5_c.txt"), ("a.txt", "02_1971_5_a.txt")]
+    plan = plan_renames(str(tmp_path), ["c.txt", "a.txt"], rules, file_stats=[(0.0, 1), (0.0, 2)])
+    assert [new_file_name[8:] for original_file_name, new_file_name in plan] == ["1_c.txt", "2_a.txt"]
+
+
+def test_counter_only_numbers_files_matching_the_pattern(tmp_path):
+    names = ["w.txt", "x.jpg", "y.txt", "z.jpg"]
+    make_files(tmp_path, *names)
+    plan = plan_renames(str(tmp_path), names, RenameRules(template="{counter}{ext}", file_pattern="*.jpg"))
+    assert sorted(plan.renames) == [("x.jpg", "1.jpg"), ("z.jpg", "2.jpg")]
@@ -0,0 +1,122 @@
+from renamer import FileModel, PreviewEngine, RenameRules, ScannedFile, Selection
+
+
+def make_engine(names, rules, cache_size=100, sequence=None):
+    model = FileModel()
+    model.extend([ScannedFile(name, 0.0, 0, index) for index, name in enumerate(names)])
+    engine = PreviewEngine(model, cache_size=cache_size, sequence=sequence)
+    engine.set_rules(rules)
+    return engine
+
+
+def computed_rows(engine, rows):
+    """
+    Preview the rows, returning the ones that had to be computed rather than taken from the cache.
+    """
+    computed = []
+    transform = engine.transform
+    for row in rows:
+        engine.transform = lambda *args, row=row: computed.append(row) or transform(*args)
+        engine.preview(row)
+    engine.transform = transform
+    return computed
+
+
+def test_previews_are_computed_once():
+    engine = make_engine(["a.txt", "b.txt"], RenameRules(prefix="x_"))
+    assert [engine.preview(index) for index in range(2)] == ["x_a.txt", "x_b.txt"]
+    assert computed_rows(engine, range(2)) == []
+
+
+def test_changing_the_rules_recomputes_every_row():
+    engine = make_engine(["a.txt", "b.txt"], RenameRules(prefix="x_"))
+    computed_rows(engine, range(2))
+    assert not engine.set_rules(RenameRules(prefix="x_"))
+    assert computed_rows(engine, range(2)) == []
+    assert engine.set_rules(RenameRules(prefix="y_"))
+    assert computed_rows(engine, range(2)) == [0, 1]
+    assert engine.preview(1) == "y_b.txt"
+
+
+def test_invalidate_recomputes_only_the_rows_given():
+    engine = make_engine(["a.txt", "b.txt", "c.txt"], RenameRules(suffix="_1"))
+    computed_rows(engine, range(3))
+    engine.invalidate([1])
+    assert computed_rows(engine, range(3)) == [1]
+    engine.invalidate()
+    assert computed_rows(engine, range(3)) == [0, 1, 2]
+
+
+def test_full_cache_is_emptied():
+    engine = make_engine(["a", "b", "c"], RenameRules(prefix="p"), cache_size=2)
+    assert computed_rows(engine, [0, 1, 2, 0]) == [0, 1, 2, 0]
+
+
+def test_counter_follows_the_sequence():
+    order = [2, 0, 1]
+    engine = make_engine(["a.txt", "b.txt", "c.txt"], RenameRules(template="{counter}_{stem}{ext}"),
+                         sequence=lambda: order)
+    assert [engine.preview(index) for index in range(3)] == ["2_a.txt", "3_b.txt", "1_c.txt"]
+    order = [1]
+    engine.sequence_changed()
+    assert computed_rows(engine, range(3)) == [0, 1, 2]
+    assert [engine.preview(index) for index in range(3)] == ["1_a.txt", "1_b.txt", "1_c.txt"]
+
+
+def test_sequence_changes_keep_previews_without_a_counter():
+    engine = make_engine(["a.txt", "b.txt"], RenameRules(template="{stem|upper}{ext}"), sequence=lambda: [])
+    computed_rows(engine, range(2))
+    engine.sequence_changed()
+    assert computed_rows(engine, range(2)) == []
+
+
+def test_counter_only_numbers_files_matching_the_pattern():
+    names = ["w.txt", "x.jpg", "y.txt", "z.jpg"]
+    engine = make_engine(names, RenameRules(template="{counter}{ext}", file_pattern="*.jpg"),
+                         sequence=lambda: range(len(names)))
+    assert [engine.preview(index) for index in range(len(names))] == ["w.txt", "1.jpg", "y.txt", "2.jpg"]
+
+
+def make_selection_engine(names, selection, template):
+    engine = make_engine(names, RenameRules(template=template),
+                         sequence=lambda: engine.model.indices_in_order(selection))
+    return engine
+
+
+def test_selection_change_recomputes_only_the_counters_after_it():
+    selection = Selection(range(6))
+    engine = make_selection_engine(list("abcdef"), selection, "{counter}_{name}")
+    selection.take_changes()
+    computed_rows(engine, range(6))
+    selection.remove_range(3, 4)
+    engine.selection_changed(*selection.take_changes())
+    assert computed_rows(engine, range(6)) == [3, 4, 5]
+    assert [engine.preview(index) for index in (2, 4, 5)] == ["3_c", "4_e", "5_f"]
+
+
+def test_selection_change_out_of_scan_order_recomputes_every_counter():
+    selection = Selection(range(4))
+    engine = make_selection_engine(list("abcd"), selection, "{counter}_{name}")
+    engine.model.sort(lambda index: -index)
+    computed_rows(engine, range(4))
+    selection.remove_range(3, 4)
+    engine.selection_changed(*selection.take_changes())
+    assert computed_rows(engine, range(4)) == [0, 1, 2, 3]
+    assert engine.preview(0) == "3_a"
+
+
+def test_selection_change_keeps_previews_without_a_counter():
+    selection = Selection(range(4))
+    engine = make_selection_engine(list("abcd"), selection, "{name|upper}")
+    computed_rows(engine, range(4))
+    selection.remove_range(0, 2)
+    engine.selection_changed(*selection.take_changes())
+    assert computed_rows(engine, range(4)) == []
+
+
+def test_empty_selection_change_keeps_every_preview():
+    selection = Selection(range(4))
+    engine = make_selection_engine(list("abcd"), selection, "{counter}_{name}")
+    computed_rows(engine, range(4))
+    engine.selection_changed(Selection(), Selection())
+    assert computed_rows(engine, range(4)) == []
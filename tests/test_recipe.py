@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from renamer import Recipe, RenameError, RenameRules
+
+
+def test_saved_recipe_loads_back(tmp_path):
+    rules = RenameRules(replace_text=r"IMG_(\d+)", new_text=r"photo_\1", case_conversion="lowercase", prefix="a_",
+                        suffix="_z", use_regex=True, ignore_case=True, file_pattern="*.jpg", template="{stem}{ext}")
+    recipe = Recipe(rules, recursive=True, include=["*.jpg"], exclude=[".git"])
+    path = tmp_path / "recipe.json"
+    recipe.save(str(path))
+    loaded = Recipe.load(str(path))
+    assert loaded == recipe
+    assert loaded.rules == rules
+    assert loaded.rules.apply("IMG_12.jpg") == "a_photo_12_z.jpg"
+    assert (loaded.recursive, loaded.include, loaded.exclude) == (True, ["*.jpg"], [".git"])
+
+
+def test_missing_fields_keep_their_default():
+    recipe = Recipe.from_dict({"rules": {"prefix": "new_"}})
+    assert recipe == Recipe(RenameRules(prefix="new_"))
+    assert recipe.path_filter() is None
+
+
+@pytest.mark.parametrize("data", [
+    [],
+    {"rules": []},
+    {"version": 2, "rules": {}},
+    {"version": "1", "rules": {}},
+    {"rules": {"colour": "red"}},
+    {"rules": {"prefix": 1}},
+    {"rules": {"use_regex": "yes"}},
+    {"rules": {}, "include": "*.jpg"},
+    {"rules": {}, "exclude": [1]},
+    {"rules": {"replace_text": "(", "use_regex": True}},
+])
+def test_invalid_recipes_are_rejected(data):
+    with pytest.raises(RenameError):
+        Recipe.from_dict(data)
+
+
+def test_a_file_that_is_not_json_is_rejected(tmp_path):
+    path = tmp_path / "recipe.json"
+    path.write_text("prefix = new_", encoding="utf-8")
+    with pytest.raises(RenameError):
+        Recipe.load(str(path))
+
+
+def test_saved_recipe_is_versioned_json(tmp_path):
+    path = tmp_path / "recipe.json"
+    Recipe(RenameRules(suffix="_old")).save(str(path))
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["version"] == 1
+    assert data["rules"]["suffix"] == "_old"
@@ -0,0 +1,75 @@
+import re
+
+import pytest
+
+from renamer import RenameError, RenameRules
+from renamer.rules import compile_template
+
+
+def test_rules_apply_in_order():
+    rules = RenameRules(replace_text="img", new_text="photo", case_conversion="lowercase", prefix="2024_",
+                        suffix="_edit")
+    assert rules.apply("IMG_01.JPG") == "2024_photo_01_edit.JPG"
+
+
+def test_extension_is_left_alone():
+    assert RenameRules(case_conversion="uppercase").apply("notes.v2.txt") == "NOTES.V2.txt"
+
+
+@pytest.mark.parametrize("option", ["new_text", "prefix", "suffix"])
+@pytest.mark.parametrize("text", ["a/b", "a:b", "what?"])
+def test_invalid_characters_are_rejected(option, text):
+    with pytest.raises(RenameError):
+        RenameRules(replace_text="x", **{option: text}).validate()
+
+
+def test_unknown_case_conversion_is_rejected():
+    with pytest.raises(RenameError):
+        RenameRules(case_conversion="sponge").validate()
+
+
+@pytest.mark.parametrize("replace_text, new_text, expected", [
+    (r"IMG_(\d+)", r"photo-\1", "photo-0042.JPG"),
+    (r"(?P<kind>[A-Z]+)_(?P<number>\d+)", r"\g<number>_\g<kind>", "0042_IMG.JPG"),
+    (r"(?i)img", "pic", "pic_0042.JPG"),
+    (r"\d", "#", "IMG_####.JPG"),
+    (r"(\d)(\d)", r"{\2\1}", "IMG_{00}{24}.JPG"),
+])
+def test_regex_replace(replace_text, new_text, expected):
+    assert RenameRules(replace_text=replace_text, new_text=new_text, use_regex=True).apply("IMG_0042.JPG") == expected
+
+
+def test_ignore_case():
+    assert RenameRules(replace_text="img", new_text="pic", ignore_case=True).apply("IMG_1_Img.jpg") == "pic_1_pic.jpg"
+    assert RenameRules(replace_text="i.g", new_text="x", ignore_case=True).apply("IMG_ixg.jpg") == "IMG_ixg.jpg"
+    assert RenameRules(replace_text="i.g", new_text="x", ignore_case=True, use_regex=True).apply("IMG.jpg") == "x.jpg"
+
+
+def test_only_files_matching_the_pattern_are_renamed():
+    rules = RenameRules(prefix="x_", file_pattern="*.jpg; IMG_*")
+    assert [rules.apply(name) for name in ["a.jpg", "IMG_1.png", "b.png"]] == ["x_a.jpg", "x_IMG_1.png", "b.png"]
+
+
+@pytest.mark.parametrize("replace_text, new_text", [("(", ""), (r"(\d)", r"\2"), (r"(\d)", r"\g<name>")])
+def test_invalid_regex_is_rejected(replace_text, new_text):
+    with pytest.raises(RenameError):
+        RenameRules(replace_text=replace_text, new_text=new_text, use_regex=True).validate()
+
+
+@pytest.mark.parametrize("new_text", [r"photo-\1", r"\g<number>_x", r"a\tb", r"\g<0>"])
+def test_valid_regex_replacements(new_text):
+    RenameRules(replace_text=r"(?P<number>\d+)", new_text=new_text, use_regex=True).validate()
+
+
+@pytest.mark.parametrize("new_text", [r"a\\b", r"\134", r"x:\1", r"\1|"])
+def test_replacements_producing_invalid_characters_are_rejected(new_text):
+    with pytest.raises(RenameError):
+        RenameRules(replace_text=r"(\d+)", new_text=new_text, use_regex=True).validate()
+
+
+@pytest.mark.parametrize("template", [r"\1-\2", r"\g<2>{x}\g<first>", r"a\\b\1", r"\n\1", "plain"])
+def test_compiled_template_matches_re(template):
+    regex = re.compile(r"(?P<first>\w)(\w)?(\d)?")
+    replacement = compile_template(regex, template)
+    for name in ["ab", "a", "a1", "xy9z"]:
+        assert regex.sub(replacement, name) == regex.sub(template, name)
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from renamer import FolderScan, PathFilter, list_files, scan_folder, walk_folder
+
+from tests import make_files
+
+
+def drain(scan):
+    scan.start()
+    rows = []
+    while not scan.done:
+        batch = scan.next_batch()
+        if batch is not None:
+            rows.extend(batch)
+    return rows
+
+
+def test_scan_lists_files_in_batches(tmp_path):
+    make_files(tmp_path, "a.txt", "b.txt", "c.txt", "sub/d.txt")
+    batches = list(scan_folder(str(tmp_path), batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 1]
+    scanned = {scanned_file.name: scanned_file for batch in batches for scanned_file in batch}
+    assert sorted(scanned) == ["a.txt", "b.txt", "c.txt"]
+    stat_result = os.stat(tmp_path / "a.txt")
+    assert scanned["a.txt"].size == stat_result.st_size == 5
+    assert scanned["a.txt"].inode == stat_result.st_ino
+    assert scanned["a.txt"].mtime == stat_result.st_mtime
+
+
+def test_folder_scan_hands_over_rows(tmp_path):
+    make_files(tmp_path, "a.txt", "b.txt", "c.txt")
+    scan = FolderScan(str(tmp_path), row_factory=lambda scanned_file: scanned_file.name, batch_size=1)
+    assert sorted(drain(scan)) == ["a.txt", "b.txt", "c.txt"]
+    assert scan.scanned_count == 3 and scan.error is None
+
+
+def test_folder_scan_reports_a_missing_folder(tmp_path):
+    scan = FolderScan(str(tmp_path / "missing"))
+    assert drain(scan) == []
+    assert isinstance(scan.error, FileNotFoundError)
+
+
+def make_tree(folder):
+    make_files(folder, "a.jpg", "b.txt", "sub/c.jpg", "sub/deep/d.jpg", "sub/deep/e.txt", ".git/f.jpg", "skip/g.jpg")
+
+
+def walked_names(folder, **options):
+    return sorted(scanned_file.name for batch in walk_folder(str(folder), **options) for scanned_file in batch)
+
+
+def test_walk_lists_relative_paths(tmp_path):
+    make_tree(tmp_path)
+    assert walked_names(tmp_path, batch_size=1, workers=4) == sorted([
+        "a.jpg", "b.txt", os.path.join("sub", "c.jpg"), os.path.join("sub", "deep", "d.jpg"),
+        os.path.join("sub", "deep", "e.txt"), os.path.join(".git", "f.jpg"), os.path.join("skip", "g.jpg"),
+    ])
+
+
+def test_walk_applies_include_and_exclude_patterns(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    scanned_directories = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scanned_directories.append(path) or scandir(path))
+    path_filter = PathFilter(include=["*.jpg"], exclude=[".git", "skip", os.path.join("sub", "deep", "d.jpg")])
+    assert walked_names(tmp_path, path_filter=path_filter) == ["a.jpg", os.path.join("sub", "c.jpg")]
+    # Excluded folders are never read.
+    assert not any(path.endswith((".git", "skip")) for path in scanned_directories)
+
+
+def test_list_files_recursive(tmp_path):
+    make_tree(tmp_path)
+    path_filter = PathFilter(include=["*.txt"])
+    assert sorted(list_files(str(tmp_path), recursive=True, path_filter=path_filter)) == [
+        "b.txt", os.path.join("sub", "deep", "e.txt")]
+    assert list_files(str(tmp_path), path_filter=path_filter) == ["b.txt"]
+
+
+def test_walk_skips_unreadable_subfolders(tmp_path, monkeypatch):
+    make_files(tmp_path, "a.txt", "locked/b.txt", "open/c.txt")
+    scandir = os.scandir
+
+    def locked_scandir(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError(13, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", locked_scandir)
+    assert walked_names(tmp_path) == ["a.txt", os.path.join("open", "c.txt")]
+
+
+def test_walk_reports_a_missing_folder(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        walked_names(tmp_path / "missing")
+
+
+def test_recursive_folder_scan(tmp_path):
+    make_tree(tmp_path)
+    scan = FolderScan(str(tmp_path), row_factory=lambda scanned_file: scanned_file.name, recursive=True,
+                      path_filter=PathFilter(exclude=[".git", "skip"]))
+    assert sorted(drain(scan)) == walked_names(tmp_path, path_filter=PathFilter(exclude=[".git", "skip"]))
+    assert scan.scanned_count == 5
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from renamer import FileModel, NameIndex, ScannedFile
+
+
+def make_index(*names):
+    model = FileModel()
+    model.extend([ScannedFile(name, 0.0, 0, index) for index, name in enumerate(names)])
+    return NameIndex(model)
+
+
+def scan(names, text):
+    """
+    Search the way the index must, by checking every name.
+    """
+    words = text.lower().split()
+    return {index for index, name in enumerate(names) if all(word in name.lower() for word in words)}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", {0, 1, 2, 3}),
+    ("   ", {0, 1, 2, 3}),
+    ("a", {0, 1}),
+    ("x", {1}),
+    ("q", set()),
+    ("ho", {0, 1}),
+    (".j", {0, 2}),
+    ("hol", {0, 1}),
+    ("holiday", {0, 1}),
+    ("holidays", set()),
+    ("img 0", {0, 2}),
+    ("0 img", {0, 2}),
+])
+def test_search(text, expected):
+    index = make_index("Holiday_IMG_01.jpg", "holiday.txt", "IMG_02.JPG", "notes")
+    assert index.search(text) == expected
+
+
+def test_search_ignores_case():
+    index = make_index("ÄBC.TXT", "äbc.txt", "Straße")
+    assert index.search("äbc") == index.search("ÄBC") == {0, 1}
+    assert index.search("STRASSE") == set()
+    assert index.search("Straße") == {2}
+
+
+def test_typing_narrows_the_previous_matches():
+    index = make_index("abcd", "abce", "xabc", "bcd")
+    assert [index.search(text) for text in ("a", "ab", "abc", "abcd", "abc", "bcd")] == [
+        {0, 1, 2}, {0, 1, 2}, {0, 1, 2}, {0}, {0, 1, 2}, {0, 3}]
+
+
+def test_files_added_and_renamed_are_found():
+    index = make_index("alpha")
+    assert index.search("beta") == set()
+    index.model.extend([ScannedFile("beta", 0.0, 0, 1)])
+    assert index.search("beta") == {1}
+    index.model.rename(0, "gamma")
+    index.update([0])
+    assert index.search("gam") == {0}
+    # The old name's trigrams are left behind, but its file no longer matches.
+    assert index.search("alpha") == set()
+    index.clear()
+    index.model.clear()
+    assert index.search("") == set()
+
+
+def test_search_matches_a_plain_scan():
+    generator = random.Random(1234)
+    names = ["".join(generator.choice("abcAB._ 1") for _ in range(generator.randint(0, 12))) for _ in range(2000)]
+    index = make_index(*names)
+    for _ in range(300):
+        name = generator.choice(names)
+        start = generator.randint(0, len(name))
+        text = name[start:start + generator.randint(1, 5)]
+        if generator.random() < 0.2:
+            text += " " + generator.choice("abc1.")
+        if generator.random() < 0.3:
+            text = text.swapcase()
+        assert index.search(text) == scan(names, text), text
+
+
+@pytest.mark.parametrize("matches", [{1}, {0, 1, 3}])
+def test_filter_keeps_the_display_order(matches):
+    model = make_index("d", "c", "b", "a").model
+    model.sort(lambda index: model.names[index])
+    model.set_filter(matches)
+    assert list(model.order) == sorted(matches, key=lambda index: model.names[index])
+    model.set_filter(None)
+    assert list(model.order) == [3, 2, 1, 0]
+
+
+def test_filter_leaves_out_hidden_files():
+    model = make_index(*"abcdefghijklmnopqrstuvwxyz").model
+    model.set_order([25, 24, 0])
+    model.set_filter({0, 1, 25})
+    assert list(model.order) == [25, 0]
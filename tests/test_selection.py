@@ -0,0 +1,139 @@
+import random
+
+import pytest
+
+from renamer import Selection
+from renamer.selection import runs
+
+
+def changes(selection):
+    added, removed = selection.take_changes()
+    return added.ranges(), removed.ranges()
+
+
+@pytest.mark.parametrize("ranges, expected", [
+    ([(0, 2), (2, 4)], [(0, 4)]),
+    ([(2, 4), (0, 2)], [(0, 4)]),
+    ([(0, 3), (2, 5)], [(0, 5)]),
+    ([(0, 2), (4, 6), (1, 5)], [(0, 6)]),
+    ([(0, 2), (4, 6), (8, 9), (2, 8)], [(0, 9)]),
+    ([(0, 2), (5, 6)], [(0, 2), (5, 6)]),
+    ([(1, 5), (2, 3)], [(1, 5)]),
+    ([(3, 3), (5, 4)], []),
+])
+def test_added_ranges_are_merged(ranges, expected):
+    selection = Selection()
+    for start, stop in ranges:
+        selection.add_range(start, stop)
+    assert selection.ranges() == expected
+    assert len(selection) == sum(stop - start for start, stop in expected)
+
+
+@pytest.mark.parametrize("start, stop, expected, removed", [
+    (0, 2, [(2, 5), (8, 10)], []),
+    (2, 5, [(8, 10)], [(2, 5)]),
+    (3, 4, [(2, 3), (4, 5), (8, 10)], [(3, 4)]),
+    (4, 9, [(2, 4), (9, 10)], [(4, 5), (8, 9)]),
+    (5, 8, [(2, 5), (8, 10)], []),
+    (0, 20, [], [(2, 5), (8, 10)]),
+    (4, 4, [(2, 5), (8, 10)], []),
+])
+def test_removed_ranges_are_split(start, stop, expected, removed):
+    selection = Selection()
+    selection.add_range(2, 5)
+    selection.add_range(8, 10)
+    assert selection.remove_range(start, stop) == removed
+    assert selection.ranges() == expected
+    assert len(selection) == sum(range_stop - range_start for range_start, range_stop in expected)
+
+
+def test_membership_and_toggle():
+    selection = Selection([1, 2, 3, 7])
+    assert selection.ranges() == [(1, 4), (7, 8)]
+    assert [index in selection for index in range(9)] == [False, True, True, True, False, False, False, True, False]
+    selection.toggle(2)
+    selection.toggle(5)
+    selection.toggle(6)
+    assert selection.ranges() == [(1, 2), (3, 4), (5, 8)]
+    assert list(selection) == [1, 3, 5, 6, 7]
+
+
+def test_changes_record_only_what_changed():
+    selection = Selection(range(10))
+    assert changes(selection) == ([(0, 10)], [])
+    assert changes(selection) == ([], [])
+    selection.add_range(5, 15)
+    selection.remove_range(0, 2)
+    assert changes(selection) == ([(10, 15)], [(0, 2)])
+    # Changes that undo each other cancel out.
+    selection.toggle(3)
+    selection.toggle(3)
+    selection.remove_range(12, 20)
+    selection.add_range(12, 14)
+    assert changes(selection) == ([], [(14, 15)])
+    selection.clear()
+    assert changes(selection) == ([], [(2, 14)])
+    assert not selection
+
+
+def test_replace_records_the_difference():
+    selection = Selection([1, 2, 3, 8, 9])
+    selection.take_changes()
+    selection.replace([(2, 5), (9, 10)])
+    assert selection.ranges() == [(2, 5), (9, 10)]
+    assert changes(selection) == ([(4, 5)], [(1, 2), (8, 9)])
+
+
+def test_copy_and_update():
+    selection = Selection([1, 2, 5])
+    copy = selection.copy()
+    selection.clear()
+    assert copy.ranges() == [(1, 3), (5, 6)] and len(copy) == 3
+    selection.update(copy)
+    assert selection.ranges() == copy.ranges()
+
+
+def test_clip():
+    selection = Selection([2, 3, 4, 8])
+    assert selection.clip(0, 10) == [(2, 5), (8, 9)]
+    assert selection.clip(3, 9, inside=False) == [(5, 8)]
+    assert selection.clip(0, 2, inside=False) == [(0, 2)]
+
+
+def test_runs():
+    assert runs([]) == []
+    assert runs([0, 1, 2, 4, 6, 7]) == [(0, 3), (4, 5), (6, 8)]
+
+
+def test_random_changes_match_a_set():
+    generator = random.Random(42)
+    selection = Selection()
+    expected = set()
+    before = set()
+    for step in range(2000):
+        start = generator.randrange(60)
+        stop = start + generator.randrange(8)
+        action = generator.randrange(4)
+        if action == 0:
+            selection.add_range(start, stop)
+            expected.update(range(start, stop))
+        elif action == 1:
+            selection.remove_range(start, stop)
+            expected.difference_update(range(start, stop))
+        elif action == 2:
+            selection.toggle(start)
+            expected.symmetric_difference_update({start})
+        elif generator.random() < 0.5:
+            indices = generator.sample(range(60), 5)
+            selection.add_indices(indices)
+            expected.update(indices)
+        else:
+            indices = generator.sample(range(60), 5)
+            selection.remove_indices(indices)
+            expected.difference_update(indices)
+        assert set(selection) == expected and len(selection) == len(expected)
+        assert all(stop < start for stop, start in zip(selection.stops, selection.starts[1:]))
+        if step % 7 == 0:
+            added, removed = selection.take_changes()
+            assert (set(added), set(removed)) == (expected - before, before - expected)
+            before = set(expected)
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from renamer import NameTemplate, RenameError
+
+
+def render(text, stem="IMG_0042", ext=".JPG", number=0, mtime=0.0, size=0):
+    return NameTemplate(text).compile()(stem, ext, number, mtime, size)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("{stem}{ext}", "IMG_0042.JPG"),
+    ("{name}", "IMG_0042.JPG"),
+    ("{counter}_{stem}", "3_IMG_0042"),
+    ("{counter:04}", "0003"),
+    ("{counter(100, 10)}", "120"),
+    ("{counter(0)|upper}", "2"),
+    ("{size:,}", "1,234,567"),
+    ("{stem[4:]}{ext|lower}", "0042.jpg"),
+    ("{stem[-2:]|lower}", "42"),
+    ("{counter[1:]:>6}", "    3"),
+    ("{stem|lower|title}", "Img_0042"),
+    ("{{{stem}}}", "{IMG_0042}"),
+    ("a's \"{stem}\" {{x}}\\", "a's \"IMG_0042\" {x}\\"),
+])
+def test_fields(text, expected):
+    assert render(text, number=2, size=1234567) == expected
+
+
+def test_date_field():
+    mtime = time.mktime((2024, 5, 17, 13, 45, 30, 0, 0, -1))
+    assert render("{date}", mtime=mtime) == "2024-05-17"
+    assert render("{date:%Y%m%d_%H%M%S}", mtime=mtime) == "20240517_134530"
+    # Dates are cached per time slot, so seconds apart in the same slot must still show their own seconds.
+    template = NameTemplate("{date:%H%M%S}|{date:%H}").compile()
+    assert [template("", "", 0, mtime + offset) for offset in (0, 1, 61)] == [
+        "134530|13", "134531|13", "134631|13"]
+
+
+@pytest.mark.parametrize("text", [
+    "{", "}", "{stem", "{nope}", "{stem!r}", "{stem|shout}", "{stem(1)}", "{counter(a)}", "{counter(1, 2, 3)}",
+    "{size:q}", "{stem[x]}",
+])
+def test_invalid_templates_are_rejected(text):
+    with pytest.raises(RenameError):
+        NameTemplate(text)
+
+
+def test_template_text_never_becomes_code():
+    text = "{stem}__import__('os').remove('x'){{0}}{counter:{{x}}}"
+    with pytest.raises(RenameError):
+        NameTemplate(text)
+    assert render("\"+str(1/0)+\"{stem}") == "\"+str(1/0)+\"IMG_0042"
+
+
+def test_batch_matches_single_names():
+    template = NameTemplate("{date:%Y}_{counter:03}_{stem|lower}_{size}{ext}")
+    stems, exts = ["A", "B", "C"], [".x", ".y", ""]
+    mtimes, sizes = [0.0, 1e9, 2e9], [1, 22, 333]
+    single = template.compile()
+    assert template.compile_batch()(stems, exts, mtimes, sizes) == [
+        single(stem, ext, number, mtime, size)
+        for number, (stem, ext, mtime, size) in enumerate(zip(stems, exts, mtimes, sizes))]
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from renamer import Tracer, tracer
+from renamer.cli import main
+from renamer.trace import NULL_SPAN
+
+from tests import contents, make_files
+
+
+@pytest.fixture
+def shared_tracer():
+    yield tracer
+    tracer.disable()
+    tracer.clear()
+
+
+def test_nothing_is_recorded_while_off():
+    recorder = Tracer()
+    assert recorder.span("scan") is NULL_SPAN
+    with recorder.span("scan") as span:
+        span.items = 3
+    assert recorder.start() is None
+    recorder.stop("plan", None, 3)
+    assert list(recorder.events) == []
+
+
+def test_spans_and_marks_are_recorded():
+    recorder = Tracer()
+    recorder.enable()
+    with recorder.span("scan") as span:
+        span.items = 3
+    mark = recorder.start()
+    recorder.stop("plan", mark, 2)
+    assert [(event.name, event.items) for event in recorder.events] == [("scan", 3), ("plan", 2)]
+    assert all(event.duration_ns >= 0 for event in recorder.events)
+    assert recorder.events[0].start_ns <= recorder.events[1].start_ns
+
+
+def test_a_phase_started_while_off_is_not_recorded():
+    recorder = Tracer()
+    mark = recorder.start()
+    recorder.enable()
+    recorder.stop("plan", mark)
+    assert list(recorder.events) == []
+
+
+def test_only_the_most_recent_events_are_kept():
+    recorder = Tracer(capacity=3)
+    recorder.enable()
+    for index in range(5):
+        recorder.stop(f"phase {index}", recorder.start())
+    assert [event.name for event in recorder.events] == ["phase 2", "phase 3", "phase 4"]
+    recorder.enable(capacity=2)
+    assert [event.name for event in recorder.events] == ["phase 3", "phase 4"]
+    recorder.stop("phase 5", recorder.start())
+    assert [event.name for event in recorder.events] == ["phase 4", "phase 5"]
+
+
+def test_events_are_kept_when_recording_stops():
+    recorder = Tracer()
+    recorder.enable()
+    recorder.stop("scan", recorder.start())
+    recorder.disable()
+    recorder.stop("plan", recorder.start())
+    assert [event.name for event in recorder.events] == ["scan"]
+    recorder.clear()
+    assert list(recorder.events) == []
+
+
+def test_summary():
+    recorder = Tracer()
+    recorder.enable()
+    for name, items in [("scan", 10), ("sort", 4), ("scan", 5)]:
+        recorder.stop(name, recorder.start(), items)
+    summary = recorder.summary()
+    assert list(summary) == ["scan", "sort"]
+    assert summary["scan"]["count"] == 2
+    assert summary["scan"]["items"] == 15
+    assert summary["sort"]["count"] == 1
+    assert summary["scan"]["total_ms"] >= summary["scan"]["last_ms"] >= 0
+
+
+def test_export_chrome_trace(tmp_path):
+    recorder = Tracer()
+    recorder.enable()
+    recorder.stop("scan", recorder.start(), 7)
+    with recorder.span("sort", 2):
+        pass
+    path = tmp_path / "trace.json"
+    assert recorder.export_chrome_trace(str(path)) == 2
+    trace = json.loads(path.read_text(encoding="utf-8"))
+    phases = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [(event["name"], event["args"]["items"]) for event in phases] == [("scan", 7), ("sort", 2)]
+    for event, recorded in zip(phases, recorder.events):
+        assert event["ts"] == recorded.start_ns / 1000
+        assert event["dur"] == recorded.duration_ns / 1000
+        assert event["tid"] == recorded.thread_id
+    threads = [event for event in trace["traceEvents"] if event["ph"] == "M"]
+    assert [(event["name"], event["args"]["name"]) for event in threads] == [
+        ("thread_name", recorder.events[0].thread_name)]
+
+
+def test_cli_saves_a_trace(tmp_path, shared_tracer, monkeypatch):
+    monkeypatch.setenv("BATCH_RENAMER_HOME", str(tmp_path / "home"))
+    folder = tmp_path / "files"
+    make_files(folder, "a.txt", "b.txt")
+    path = tmp_path / "trace.json"
+    assert main([str(folder), "--prefix", "new_", "--quiet", "--trace", str(path)]) == 0
+    assert contents(folder) == {"new_a.txt": "a.txt", "new_b.txt": "b.txt"}
+    names = {event["name"] for event in json.loads(path.read_text(encoding="utf-8"))["traceEvents"]}
+    assert {"scan", "plan", "rename"} <= names